@@ -1,9 +1,20 @@
+import os
 from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
 from routes import register_routes
 from services.llm_service import LLMService
+from services.assistant_registry import AssistantRegistry
 from services.file_service import FileService
+from services.attachment_executor import AttachmentExecutor
+from services.conversation_store import ConversationStore
+from services.blob_store import BlobStore
+from services.request_limits import RequestLimits
+from services.job_queue import JobQueue
+from services.admission_controller import AdmissionController
+from services.response_optimizer import ResponseOptimizer
+from services.json_codec import JSONProvider
+from services.profiling import ProfilingTools
 import logging
 
 # Configure logging
@@ -13,7 +24,18 @@ logger = logging.getLogger(__name__)
 def create_app():
     logger.info("Creating Flask app")
     app = Flask(__name__, static_folder='static', static_url_path='/static')
+    app.json = JSONProvider(app)
     CORS(app)
+    request_limits = RequestLimits(
+        max_content_length=int(os.getenv('MAX_CONTENT_LENGTH', 32 * 1024 * 1024)),
+        max_attachments=int(os.getenv('MAX_ATTACHMENTS', 10)),
+        max_attachment_bytes=int(os.getenv('ATTACHMENT_MAX_BYTES', 20 * 1024 * 1024))
+    )
+    request_limits.init_app(app)
+    ResponseOptimizer(
+        min_size=int(os.getenv('COMPRESS_MIN_SIZE', 1024)),
+        compress_level=int(os.getenv('COMPRESS_LEVEL', 6))
+    ).init_app(app)
     
     try:
         logger.info("Loading environment variables")
@@ -23,10 +45,52 @@ def create_app():
 
     # Initialize services
     try:
+        db_path = os.getenv('LLM_HELPER_DB', 'llm_helper.db')
         logger.info("Initializing LLM service")
-        llm_service = LLMService()
+        llm_service = LLMService(registry=AssistantRegistry(db_path))
         logger.info("Initializing File service")
-        file_service = FileService()
+        attachment_executor = AttachmentExecutor(
+            max_workers=int(os.getenv('ATTACHMENT_WORKERS', 0)) or None,
+            timeout=float(os.getenv('ATTACHMENT_TIMEOUT', 30)),
+            max_file_bytes=int(os.getenv('ATTACHMENT_MAX_BYTES', 20 * 1024 * 1024))
+        )
+        file_service = FileService(executor=attachment_executor)
+        logger.info("Initializing Conversation store")
+        conversation_store = ConversationStore(db_path)
+        logger.info("Initializing Blob store")
+        blob_dir = os.getenv('BLOB_STORE_DIR')
+        if blob_dir is None and db_path != ':memory:':
+            # Next to the conversation database, so the blob_refs stored in it survive a restart.
+            blob_dir = os.path.splitext(db_path)[0] + '_blobs'
+        blob_store = BlobStore(
+            max_memory_bytes=int(os.getenv('BLOB_STORE_MEMORY_BYTES', 64 * 1024 * 1024)),
+            spill_dir=blob_dir,
+            persistent=blob_dir is not None
+        )
+        logger.info("Initializing Job queue")
+        job_queue = JobQueue(
+            max_workers=int(os.getenv('JOB_WORKERS', 4)),
+            max_queued=int(os.getenv('JOB_QUEUE_SIZE', 32))
+        )
+        admission = AdmissionController(
+            limits={
+                'openai': int(os.getenv('OPENAI_MAX_CONCURRENCY', 8)),
+                'anthropic': int(os.getenv('ANTHROPIC_MAX_CONCURRENCY', 8))
+            },
+            max_queue=int(os.getenv('ADMISSION_QUEUE_SIZE', 16)),
+            max_wait=float(os.getenv('ADMISSION_MAX_WAIT', 10))
+        )
+        profiling = None
+        if os.getenv('ENABLE_PROFILING', '').lower() in ('1', 'true', 'yes'):
+            if os.getenv('ADMIN_TOKEN'):
+                logger.warning("Profiling endpoints enabled under /admin")
+                profiling = ProfilingTools(
+                    os.getenv('ADMIN_TOKEN'),
+                    interval=float(os.getenv('PROFILE_INTERVAL', 0.01)),
+                    max_seconds=float(os.getenv('PROFILE_MAX_SECONDS', 300))
+                )
+            else:
+                logger.warning("ENABLE_PROFILING is set but ADMIN_TOKEN is not; profiling endpoints disabled")
     except Exception as e:
         logger.critical(f"Service initialization failed: {e}", exc_info=True)
         raise
@@ -34,7 +98,7 @@ def create_app():
     # Register routes
     try:
         logger.info("Registering routes")
-        register_routes(app, llm_service, file_service)
+        register_routes(app, llm_service, file_service, conversation_store, blob_store, request_limits, job_queue, admission, profiling)
     except Exception as e:
         logger.error(f"Error registering routes: {e}", exc_info=True)
         raise
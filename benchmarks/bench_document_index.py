@@ -0,0 +1,40 @@
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from services.document_index import DocumentIndex
+
+def make_document(size_chars, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(20000)]
+    lines = []
+    length = 0
+    while length < size_chars:
+        line = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(5, 20)))
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+def main():
+    for size_mb in (1, 5, 10):
+        text = make_document(size_mb * 1024 * 1024, seed=size_mb)
+        index = DocumentIndex()
+
+        start = time.perf_counter()
+        index.add_document(f"{size_mb}mb.txt", text)
+        build_seconds = time.perf_counter() - start
+
+        rng = random.Random(42)
+        queries = [" ".join(f"term{rng.randint(0, 19999)}" for _ in range(6)) for _ in range(200)]
+        start = time.perf_counter()
+        for query in queries:
+            index.retrieve(query, token_budget=3000)
+        retrieve_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        print(f"{size_mb:>3} MB: {len(index)} chunks, build {build_seconds:.2f}s, retrieve {retrieve_ms:.2f} ms/query")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from services.message import Message
+
+def make_rows(count, seed=0):
+    # Serialized like ConversationStore rows, so every load produces fresh role/type strings.
+    rng = random.Random(seed)
+    rows = []
+    for index in range(count):
+        role = 'user' if index % 2 == 0 else 'assistant'
+        content = [{"type": "text", "text": " ".join(f"word{rng.randint(0, 5000)}" for _ in range(rng.randint(5, 40)))}]
+        if role == 'user' and index % 10 == 0:
+            content.append({"type": "text", "name": f"notes{index}.txt", "blob_ref": f"{rng.getrandbits(256):064x}"})
+        rows.append(json.dumps({"role": role, "content": content}))
+    return rows
+
+def measure(rows, build):
+    gc.collect()
+    tracemalloc.start()
+    history = [build(json.loads(row)) for row in rows]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del history
+    return current / len(rows)
+
+def main():
+    for count in (1000, 10000, 100000):
+        rows = make_rows(count, seed=count)
+        as_dicts = measure(rows, lambda message: message)
+        as_messages = measure(rows, Message.from_dict)
+        print(f"{count:>7} messages: dicts {as_dicts:.0f} B/message, "
+              f"Message {as_messages:.0f} B/message ({1 - as_messages / as_dicts:.0%} smaller)")
+
+if __name__ == '__main__':
+    main()
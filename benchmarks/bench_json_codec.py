@@ -0,0 +1,42 @@
+import base64
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from services import json_codec
+
+def make_payload(attachment_mb):
+    # Shaped like a /chat request body and the Chat Completions payload built from it.
+    data = base64.b64encode(os.urandom(attachment_mb * 1024 * 1024)).decode('ascii')
+    return {
+        "message": "What is in this image?",
+        "model": "gpt-4-turbo",
+        "messages": [{"role": "user", "content": "Earlier question " * 50}] * 20,
+        "files": [{"name": "photo.jpg", "type": "image", "data": data}]
+    }
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+def main():
+    print(f"json_codec backend: {json_codec.BACKEND}")
+    for attachment_mb in (1, 5, 20):
+        payload = make_payload(attachment_mb)
+        body = json.dumps(payload).encode('utf-8')
+        repeat = max(3, 60 // attachment_mb)
+        stdlib_dumps = timed(lambda: json.dumps(payload).encode('utf-8'), repeat)
+        codec_dumps = timed(lambda: json_codec.dumps(payload), repeat)
+        stdlib_loads = timed(lambda: json.loads(body), repeat)
+        codec_loads = timed(lambda: json_codec.loads(body), repeat)
+        print(f"{attachment_mb:>3} MB attachment: dumps {stdlib_dumps:.1f} -> {codec_dumps:.1f} ms, "
+              f"loads {stdlib_loads:.1f} -> {codec_loads:.1f} ms")
+
+if __name__ == '__main__':
+    main()
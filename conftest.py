@@ -1,5 +1,11 @@
+import os
 import sys
 from pathlib import Path
 
 root_dir = Path(__file__).resolve().parent
-sys.path.append(str(root_dir))
\ No newline at end of file
+sys.path.append(str(root_dir))
+
+# Keep test runs from writing a conversation database into the working tree.
+os.environ.setdefault('LLM_HELPER_DB', ':memory:')
+# Keep LLMService instances from creating remote OpenAI threads in the background.
+os.environ.setdefault('OPENAI_THREAD_POOL_SIZE', '0')
@@ -1,14 +1,34 @@
+import json
 import logging
-from flask import request, jsonify, render_template
+from flask import Blueprint, request, jsonify, render_template, Response, stream_with_context
+from werkzeug.exceptions import Conflict, RequestEntityTooLarge, ServiceUnavailable
 from services.conversation_service import ConversationService
+from services.model_comparison import ModelComparison
+from services.job_queue import JobQueue
+from services.admission_controller import AdmissionController
 from services.file_service import FileService
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def register_routes(app, llm_service, file_service):
-    conversation_service = ConversationService(llm_service, file_service)
+def register_routes(app, llm_service, file_service, conversation_store=None, blob_store=None, request_limits=None, job_queue=None, admission=None, profiling=None):
+    conversation_service = ConversationService(llm_service, file_service, conversation_store, blob_store)
+    model_comparison = ModelComparison(llm_service, file_service, conversation_service.resolve_attachment_ref)
+    job_queue = job_queue or JobQueue()
+    admission = admission or AdmissionController()
+
+    def admission_key(model, assistant_id=None):
+        # Assistant runs always go to OpenAI, whatever the selected model.
+        return 'openai' if assistant_id else llm_service.provider_for(model)
+
+    def request_timeout():
+        # Clients can shorten how long a request may wait for capacity.
+        return request.headers.get('X-Request-Timeout', type=float)
+
+    def overloaded(e):
+        headers = {'Retry-After': str(e.retry_after)} if e.retry_after else {}
+        return jsonify({"error": e.description}), 503, headers
 
     @app.route('/')
     def index():
@@ -26,6 +46,27 @@ def register_routes(app, llm_service, file_service):
             logger.error(f"Error fetching available models: {e}", exc_info=True)
             return jsonify({"error": str(e)}), 500
 
+    @app.route('/upload_config', methods=['GET'])
+    def upload_config():
+        try:
+            return jsonify(file_service.upload_config())
+        except Exception as e:
+            logger.error(f"Error fetching upload config: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        try:
+            return jsonify({
+                "single_flight": llm_service.single_flight.stats(),
+                "jobs": job_queue.stats(),
+                "admission": admission.stats(),
+                "thread_pool": llm_service.thread_pool.stats()
+            })
+        except Exception as e:
+            logger.error(f"Error collecting metrics: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
     @app.route('/new_conversation', methods=['POST'])
     def new_conversation():
         try:
@@ -44,49 +85,72 @@ def register_routes(app, llm_service, file_service):
             logger.debug("Incoming request to /chat route")
             
             data = request.json
-            logger.debug(f"Request JSON data: {data}")
+            # Lazy formatting: the body can carry megabytes of base64 attachments.
+            logger.debug("Request JSON data: %s", data)
             
             message = data.get('message')
             files = data.get('files', [])
             model = data.get('model')
             assistant_id = data.get('assistantId')
+            mode = data.get('mode')
             
             logger.info(f"Received chat message: {message}")
-            logger.debug(f"Received files: {files}")
+            logger.debug("Received files: %s", files)
             logger.debug(f"Received model: {model}")
             logger.debug(f"Received assistant ID: {assistant_id}")
 
+            if request_limits:
+                request_limits.check_attachments(files)
+
             if model:
-                logger.info(f"Setting model to: {model}")
-                llm_service.set_model(model)
-            
-            # Process files if any
-            processed_files = []
-            for file in files:
-                logger.debug(f"Processing file: {file['name']}")
-                processed_file = file_service.process_file(file)
-                if processed_file:
-                    processed_files.append(processed_file)
-                    logger.info(f"Processed file: {file['name']} successfully")
-                else:
-                    logger.warning(f"Failed to process file: {file['name']}")
-
-            # Add file contents to the message if any files were processed
-            if processed_files:
-                logger.debug(f"Processed files: {processed_files}")
-                file_contents = "\n".join([
-                    f"File: {file['name']}\nContent: {file.get('text') or file['source']['data']}"
-                    for file in processed_files
-                ])
-                message += f"\n\nAttached files:\n{file_contents}"
-                logger.info("Added file contents to the chat message")
+                # Validated per request; the shared default model is left untouched.
+                llm_service.resolve_model(model)
+
+            if mode not in (None, 'map_reduce'):
+                raise ValueError(f"Unsupported mode: {mode}")
+
+            conversation_service.check_attachment_refs(files)
 
+            key = admission_key(model, assistant_id)
+
+            if data.get('async'):
+                # Long-running chats run on the job queue; the client polls or subscribes for the result.
+                # Jobs take their provider slot when they start, so queued jobs do not hold capacity.
+                submitted = {}
+
+                def run_job():
+                    # Filled in by submit(); nobody can cancel a job before they know its id.
+                    cancelled = lambda: 'job' in submitted and submitted['job'].cancel_requested
+                    with admission.admit(key):
+                        return conversation_service.process_message(message, files, assistant_id, model=model, mode=mode, cancelled=cancelled)
+
+                def stream_job():
+                    with admission.admit(key):
+                        yield from conversation_service.stream_message(message, files, assistant_id, model=model)
+
+                job = submitted['job'] = job_queue.submit(run_job if mode == 'map_reduce' else stream_job)
+                logger.info(f"Chat message queued as job {job.id}")
+                return jsonify({"job_id": job.id, "status": job.status}), 202, {'Location': f"/jobs/{job.id}"}
+            
             # Process the message through the conversation service
             logger.debug("Sending message to conversation service for processing")
-            response = conversation_service.process_message(message, processed_files, assistant_id)
+            with admission.admit(key, request_timeout()):
+                response = conversation_service.process_message(message, files, assistant_id, model=model, mode=mode)
             logger.info(f"Chat response generated: {response}")
             
             return jsonify(response)
+
+        except RequestEntityTooLarge as e:
+            logger.warning(f"Rejected oversized chat request: {e.description}")
+            return jsonify({"error": e.description}), 413
+
+        except ServiceUnavailable as e:
+            logger.warning(f"Rejected chat request: {e.description}")
+            return overloaded(e)
+
+        except Conflict as e:
+            logger.info(f"Chat request referenced unknown attachments: {e.description}")
+            return jsonify({"error": e.description}), 409
         
         except ValueError as e:
             logger.warning(f"Value error in chat route: {e}", exc_info=True)
@@ -96,6 +160,184 @@ def register_routes(app, llm_service, file_service):
             logger.error(f"Error processing chat message: {e}", exc_info=True)
             return jsonify({"error": str(e)}), 500
 
+
+    @app.route('/chat/stream', methods=['POST'])
+    def chat_stream():
+        try:
+            data = request.json
+            message = data.get('message')
+            files = data.get('files', [])
+            model = data.get('model')
+            assistant_id = data.get('assistantId')
+            logger.info(f"Received streaming chat message: {message}")
+
+            if request_limits:
+                request_limits.check_attachments(files)
+
+            if model:
+                llm_service.resolve_model(model)
+
+            conversation_service.check_attachment_refs(files)
+
+            # Admitted before the response starts so an overloaded provider still gets a 503.
+            ticket = admission.acquire(admission_key(model, assistant_id), request_timeout())
+
+            def generate():
+                try:
+                    for chunk in conversation_service.stream_message(message, files, assistant_id, model=model):
+                        yield f"data: {json.dumps({'delta': chunk})}\n\n"
+                    yield f"data: {json.dumps({'done': True})}\n\n"
+                except Conflict as e:
+                    # The refs were cleared after the early check; the client must resend the full data.
+                    logger.info(f"Streaming chat request referenced unknown attachments: {e.description}")
+                    yield f"data: {json.dumps({'error': e.description, 'status': 409})}\n\n"
+                except Exception as e:
+                    logger.error(f"Error streaming chat response: {e}", exc_info=True)
+                    yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                finally:
+                    admission.release(ticket)
+
+            response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+            response.call_on_close(lambda: admission.release(ticket))
+            return response
+
+        except RequestEntityTooLarge as e:
+            logger.warning(f"Rejected oversized streaming chat request: {e.description}")
+            return jsonify({"error": e.description}), 413
+
+        except ServiceUnavailable as e:
+            logger.warning(f"Rejected streaming chat request: {e.description}")
+            return overloaded(e)
+
+        except Conflict as e:
+            logger.info(f"Streaming chat request referenced unknown attachments: {e.description}")
+            return jsonify({"error": e.description}), 409
+
+        except ValueError as e:
+            logger.warning(f"Value error in streaming chat route: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 400
+
+        except Exception as e:
+            logger.error(f"Error starting streaming chat: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+    
+    @app.route('/jobs/<job_id>', methods=['GET'])
+    def get_job(job_id):
+        try:
+            job = job_queue.get(job_id)
+            if job is None:
+                return jsonify({"error": f"Unknown job: {job_id}"}), 404
+            after = request.args.get('after', 0, type=int)
+            wait = min(request.args.get('wait', 0, type=float), 60)
+            logger.debug(f"Polling job {job_id} (after={after}, wait={wait})")
+            return jsonify(job_queue.wait(job, after, wait) if wait > 0 else job.snapshot(after))
+        except Exception as e:
+            logger.error(f"Error fetching job {job_id}: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/jobs/<job_id>/events', methods=['GET'])
+    def job_events(job_id):
+        try:
+            job = job_queue.get(job_id)
+            if job is None:
+                return jsonify({"error": f"Unknown job: {job_id}"}), 404
+            after = request.args.get('after', 0, type=int)
+
+            def generate():
+                # A disconnecting subscriber only stops this generator; the job keeps running.
+                for event in job_queue.iter_events(job, after):
+                    yield ": keep-alive\n\n" if event is None else f"data: {json.dumps(event)}\n\n"
+
+            return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        except Exception as e:
+            logger.error(f"Error subscribing to job {job_id}: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/jobs/<job_id>/cancel', methods=['POST'])
+    def cancel_job(job_id):
+        try:
+            job = job_queue.get(job_id)
+            if job is None:
+                return jsonify({"error": f"Unknown job: {job_id}"}), 404
+            logger.info(f"Received request to cancel job {job_id}")
+            return jsonify(job_queue.cancel(job))
+        except Exception as e:
+            logger.error(f"Error cancelling job {job_id}: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/chat/compare', methods=['POST'])
+    def chat_compare():
+        try:
+            data = request.json
+            message = data.get('message')
+            files = data.get('files', [])
+            models = model_comparison.resolve_models(data.get('models') or llm_service.available_models)
+            logger.info(f"Received comparison request for models: {models}")
+
+            if request_limits:
+                request_limits.check_attachments(files)
+
+            conversation_service.check_attachment_refs(files)
+
+            # One slot per model; all are taken up front so a partial comparison is never started.
+            tickets = []
+            try:
+                for model in models:
+                    tickets.append(admission.acquire(admission_key(model), request_timeout()))
+            except ServiceUnavailable:
+                for ticket in tickets:
+                    admission.release(ticket)
+                raise
+
+            def release_all():
+                for ticket in tickets:
+                    admission.release(ticket)
+
+            # Comparisons are side-by-side previews and never touch the conversation history.
+            if data.get('stream'):
+                events = model_comparison.stream_compare(message, files, models)
+
+                def generate():
+                    try:
+                        for event in events:
+                            yield f"data: {json.dumps(event)}\n\n"
+                    except Exception as e:
+                        logger.error(f"Error streaming model comparison: {e}", exc_info=True)
+                        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                    finally:
+                        release_all()
+
+                response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+                response.call_on_close(release_all)
+                return response
+
+            try:
+                return jsonify(model_comparison.compare(message, files, models))
+            finally:
+                release_all()
+
+        except RequestEntityTooLarge as e:
+            logger.warning(f"Rejected oversized comparison request: {e.description}")
+            return jsonify({"error": e.description}), 413
+
+        except ServiceUnavailable as e:
+            logger.warning(f"Rejected comparison request: {e.description}")
+            return overloaded(e)
+
+        except Conflict as e:
+            logger.info(f"Comparison request referenced unknown attachments: {e.description}")
+            return jsonify({"error": e.description}), 409
+
+        except ValueError as e:
+            logger.warning(f"Value error in comparison route: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 400
+
+        except Exception as e:
+            logger.error(f"Error comparing models: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
     
     @app.route('/export_chat', methods=['GET'])
     def export_chat():
@@ -107,6 +349,39 @@ def register_routes(app, llm_service, file_service):
         except Exception as e:
             logger.error(f"Error exporting chat: {e}", exc_info=True)
             return jsonify({"error": str(e)}), 500
+
+    @app.route('/export_chat/stream', methods=['GET'])
+    def export_chat_stream():
+        try:
+            export_format = request.args.get('format', 'markdown')
+            logger.info(f"Received request to stream chat export as {export_format}")
+            chunks = conversation_service.iter_export(export_format)
+            if export_format == 'json':
+                mimetype, extension = 'application/json', 'json'
+            else:
+                mimetype, extension = 'text/markdown', 'md'
+            return Response(
+                stream_with_context(chunks),
+                mimetype=mimetype,
+                headers={'Content-Disposition': f'attachment; filename=chat_export.{extension}'}
+            )
+        except ValueError as e:
+            logger.warning(f"Invalid export format: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error streaming chat export: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/history', methods=['GET'])
+    def history():
+        try:
+            before = request.args.get('before', type=int)
+            limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+            logger.info(f"Received request for history page (before={before}, limit={limit})")
+            return jsonify(conversation_service.get_history_page(before, limit))
+        except Exception as e:
+            logger.error(f"Error fetching history: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
     
     @app.route('/set_model', methods=['POST'])
     def set_model():
@@ -138,4 +413,77 @@ def register_routes(app, llm_service, file_service):
             logger.error(f"Error creating assistant: {e}", exc_info=True)
             return jsonify({"error": str(e)}), 500
 
-    logger.info("All routes registered successfully")
\ No newline at end of file
+    if profiling is not None:
+        register_admin_routes(app, profiling, conversation_service)
+
+    logger.info("All routes registered successfully")
+
+def register_admin_routes(app, profiling, conversation_service):
+    # Only registered when profiling is enabled; every route also requires the admin token.
+    # Built per call, since the routes close over this app's services.
+    admin = Blueprint('admin', __name__, url_prefix='/admin')
+
+    @admin.before_request
+    def require_token():
+        if not profiling.authorized(request.headers.get('X-Admin-Token')):
+            logger.warning(f"Rejected admin request to {request.path}")
+            return jsonify({"error": "Forbidden"}), 403
+
+    @admin.route('/profile/start', methods=['POST'])
+    def start_profile():
+        try:
+            interval = request.args.get('interval', type=float)
+            max_seconds = request.args.get('max_seconds', type=float)
+            return jsonify(profiling.cpu.start(interval, max_seconds))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 409
+        except Exception as e:
+            logger.error(f"Error starting profiler: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
+    @admin.route('/profile', methods=['GET'])
+    def profile_status():
+        return jsonify(profiling.cpu.status())
+
+    @admin.route('/profile/stop', methods=['POST'])
+    def stop_profile():
+        try:
+            profiling.cpu.stop()
+            return Response(profiling.cpu.folded(), mimetype='text/plain', headers={
+                'Content-Disposition': 'attachment; filename=profile.folded'
+            })
+        except Exception as e:
+            logger.error(f"Error stopping profiler: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
+    @admin.route('/memory/snapshot', methods=['POST'])
+    def memory_snapshot():
+        try:
+            return jsonify(profiling.memory.snapshot(request.args.get('limit', 20, type=int)))
+        except Exception as e:
+            logger.error(f"Error taking memory snapshot: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
+    @admin.route('/memory/diff', methods=['GET'])
+    def memory_diff():
+        try:
+            return jsonify(profiling.memory.diff(request.args.get('limit', 20, type=int)))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 409
+        except Exception as e:
+            logger.error(f"Error diffing memory snapshots: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
+    @admin.route('/memory/stop', methods=['POST'])
+    def memory_stop():
+        return jsonify(profiling.memory.stop())
+
+    @admin.route('/memory/sessions', methods=['GET'])
+    def memory_sessions():
+        try:
+            return jsonify(conversation_service.memory_usage())
+        except Exception as e:
+            logger.error(f"Error collecting session memory: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
+    app.register_blueprint(admin)
@@ -1,5 +1,20 @@
 from .llm_service import LLMService
 from .file_service import FileService
 from .conversation_service import ConversationService
+from .conversation_store import ConversationStore
+from .blob_store import BlobStore
+from .attachment_executor import AttachmentExecutor
+from .request_limits import RequestLimits
+from .assistant_registry import AssistantRegistry
+from .thread_sync import ThreadSync
+from .document_index import DocumentIndex
+from .map_reduce import MapReduceProcessor
+from .single_flight import SingleFlight
+from .model_comparison import ModelComparison
+from .job_queue import JobQueue
+from .admission_controller import AdmissionController
+from .message import Message, ContentPart
+from .profiling import ProfilingTools
+from .thread_warm_pool import ThreadWarmPool
 
-__all__ = ['LLMService', 'FileService', 'ConversationService']
\ No newline at end of file
+__all__ = ['LLMService', 'FileService', 'ConversationService', 'ConversationStore', 'BlobStore', 'AttachmentExecutor', 'RequestLimits', 'AssistantRegistry', 'ThreadSync', 'DocumentIndex', 'MapReduceProcessor', 'SingleFlight', 'ModelComparison', 'JobQueue', 'AdmissionController', 'Message', 'ContentPart', 'ProfilingTools', 'ThreadWarmPool']
\ No newline at end of file
@@ -0,0 +1,131 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+from werkzeug.exceptions import ServiceUnavailable
+
+logger = logging.getLogger(__name__)
+
+class Ticket:
+    def __init__(self, key: str):
+        self.key = key
+        self.started = time.monotonic()
+        self.released = False
+
+class _Waiter:
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.event = threading.Event()
+        self.granted = False
+
+class _ProviderState:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters = deque()
+        self.service_time = None
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_deadline = 0
+        self.timed_out = 0
+
+class AdmissionController:
+    def __init__(self, limits: Dict[str, int] = None, default_limit: int = 8, max_queue: int = 16, max_wait: float = 10.0):
+        self.limits = limits or {}
+        self.default_limit = default_limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._states: Dict[str, _ProviderState] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, timeout: Optional[float] = None) -> Ticket:
+        timeout = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        with self._lock:
+            state = self._state(key)
+            if state.active < state.limit and not state.waiters:
+                state.active += 1
+                state.admitted += 1
+                return Ticket(key)
+            if len(state.waiters) >= self.max_queue:
+                state.shed_queue_full += 1
+                raise self._overloaded(key, state, "queue is full")
+            # Reject now rather than queue a request that would miss its deadline anyway.
+            if self._estimated_wait(state, len(state.waiters) + 1) > timeout:
+                state.shed_deadline += 1
+                raise self._overloaded(key, state, "expected wait exceeds the request deadline")
+            waiter = _Waiter(time.monotonic() + timeout)
+            state.waiters.append(waiter)
+
+        waiter.event.wait(timeout)
+        with self._lock:
+            if waiter.granted:
+                return Ticket(key)
+            if waiter in state.waiters:
+                state.waiters.remove(waiter)
+            state.timed_out += 1
+            raise self._overloaded(key, state, "timed out waiting for capacity")
+
+    def release(self, ticket: Ticket):
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            state = self._states[ticket.key]
+            duration = time.monotonic() - ticket.started
+            state.service_time = duration if state.service_time is None else 0.8 * state.service_time + 0.2 * duration
+            # Hand the slot straight to the oldest waiter that can still meet its deadline.
+            now = time.monotonic()
+            while state.waiters:
+                waiter = state.waiters.popleft()
+                if waiter.deadline <= now:
+                    continue
+                waiter.granted = True
+                state.admitted += 1
+                waiter.event.set()
+                return
+            state.active -= 1
+
+    @contextmanager
+    def admit(self, key: str, timeout: Optional[float] = None):
+        ticket = self.acquire(key, timeout)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                key: {
+                    'limit': state.limit,
+                    'active': state.active,
+                    'queued': len(state.waiters),
+                    'admitted': state.admitted,
+                    'shed_queue_full': state.shed_queue_full,
+                    'shed_deadline': state.shed_deadline,
+                    'timed_out': state.timed_out,
+                    'avg_service_ms': round(state.service_time * 1000, 1) if state.service_time is not None else None
+                }
+                for key, state in self._states.items()
+            }
+
+    def _state(self, key: str) -> _ProviderState:
+        # Called with self._lock held.
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _ProviderState(self.limits.get(key, self.default_limit))
+        return state
+
+    @staticmethod
+    def _estimated_wait(state: _ProviderState, position: int) -> float:
+        if state.service_time is None:
+            return 0.0
+        return state.service_time * position / state.limit
+
+    def _overloaded(self, key: str, state: _ProviderState, reason: str) -> ServiceUnavailable:
+        retry_after = max(1, math.ceil(self._estimated_wait(state, len(state.waiters) + 1)))
+        logger.warning(f"Shedding {key} request: {reason} ({state.active} active, {len(state.waiters)} queued)")
+        return ServiceUnavailable(description=f"{key} is at capacity ({reason}), please retry later", retry_after=retry_after)
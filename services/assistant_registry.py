@@ -0,0 +1,84 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class AssistantRegistry:
+    def __init__(self, db_path: str = ':memory:'):
+        logger.info(f"Initializing AssistantRegistry at: {db_path}")
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        if db_path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS openai_assistants (
+                config_key TEXT PRIMARY KEY,
+                assistant_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                name TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS openai_threads (
+                session_id TEXT PRIMARY KEY,
+                thread_id TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+        """)
+        # Warm lookups are served from memory; SQLite is only the durable copy.
+        self._assistants: Dict[str, str] = dict(
+            self._conn.execute('SELECT config_key, assistant_id FROM openai_assistants').fetchall()
+        )
+        self._threads: Dict[str, str] = dict(
+            self._conn.execute('SELECT session_id, thread_id FROM openai_threads').fetchall()
+        )
+        logger.info(f"AssistantRegistry loaded {len(self._assistants)} assistants and {len(self._threads)} threads")
+
+    @staticmethod
+    def assistant_key(model: str, name: str, instructions: str) -> str:
+        instructions_hash = hashlib.sha256((instructions or '').encode('utf-8')).hexdigest()
+        return f"{model}:{name}:{instructions_hash}"
+
+    def get_assistant(self, model: str, name: str, instructions: str) -> Optional[str]:
+        with self._lock:
+            return self._assistants.get(self.assistant_key(model, name, instructions))
+
+    def save_assistant(self, model: str, name: str, instructions: str, assistant_id: str):
+        key = self.assistant_key(model, name, instructions)
+        with self._lock:
+            self._assistants[key] = assistant_id
+            self._conn.execute(
+                'INSERT OR REPLACE INTO openai_assistants (config_key, assistant_id, model, name, created_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, assistant_id, model, name, time.time())
+            )
+        logger.info(f"Registered assistant {assistant_id} for model {model}")
+
+    def invalidate_assistant(self, assistant_id: str):
+        with self._lock:
+            self._assistants = {k: v for k, v in self._assistants.items() if v != assistant_id}
+            self._conn.execute('DELETE FROM openai_assistants WHERE assistant_id = ?', (assistant_id,))
+        logger.info(f"Invalidated assistant {assistant_id}")
+
+    def get_thread(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            return self._threads.get(session_id)
+
+    def save_thread(self, session_id: str, thread_id: str):
+        with self._lock:
+            self._threads[session_id] = thread_id
+            self._conn.execute(
+                'INSERT OR REPLACE INTO openai_threads (session_id, thread_id, created_at) VALUES (?, ?, ?)',
+                (session_id, thread_id, time.time())
+            )
+        logger.info(f"Registered thread {thread_id} for session {session_id}")
+
+    def invalidate_thread(self, session_id: str):
+        with self._lock:
+            self._threads.pop(session_id, None)
+            self._conn.execute('DELETE FROM openai_threads WHERE session_id = ?', (session_id,))
+        logger.info(f"Invalidated thread for session {session_id}")
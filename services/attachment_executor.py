@@ -0,0 +1,126 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def _process_file_in_worker(file: Dict) -> Optional[Dict]:
+    from .file_service import FileService
+    return FileService().process_file(file)
+
+class AttachmentExecutor:
+    # Types whose processing is CPU-bound enough to be worth the IPC round-trip.
+    CPU_BOUND_TYPES = ('image', 'csv', 'tsv', 'parquet', 'xlsx', 'pdf', 'docx')
+
+    def __init__(self, max_workers: int = None, timeout: float = 30.0, max_file_bytes: int = 20 * 1024 * 1024):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_file_bytes = max_file_bytes
+        self._executor = None
+        self._lock = threading.Lock()
+        # Pools killed after a timeout; their other in-flight files failed through no fault of their own.
+        self._recycled = weakref.WeakSet()
+        # Bounds pickled payloads waiting on the pool across all concurrent requests.
+        self._slots = threading.BoundedSemaphore(self.max_workers * 2)
+        logger.info(f"AttachmentExecutor configured with {self.max_workers} workers, timeout {timeout}s")
+
+    def process_files(self, files: List[Dict], process_inline: Callable[[Dict], Optional[Dict]]) -> List[Optional[Dict]]:
+        results: List[Optional[Dict]] = [None] * len(files)
+        pending = {}
+        for index, file in enumerate(files):
+            file_name = file.get('name', 'Unnamed file')
+            if self._encoded_size(file) > self.max_file_bytes:
+                logger.warning(f"Skipping file {file_name}: exceeds {self.max_file_bytes} byte limit")
+                continue
+            if file.get('type') in self.CPU_BOUND_TYPES:
+                submitted = self._submit(file)
+                if submitted is not None:
+                    pending[index] = submitted + (time.monotonic(),)
+                    continue
+            results[index] = process_inline(file)
+
+        for index, (future, executor, submitted_at) in pending.items():
+            remaining = max(0.0, self.timeout - (time.monotonic() - submitted_at))
+            results[index] = self._result(files[index], future, executor, remaining, process_inline)
+        return results
+
+    def _result(self, file: Dict, future: concurrent.futures.Future, executor: concurrent.futures.ProcessPoolExecutor,
+                timeout: float, process_inline: Callable[[Dict], Optional[Dict]], retry: bool = True) -> Optional[Dict]:
+        file_name = file.get('name', 'Unnamed file')
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            # A running worker cannot be cancelled, so the pool is recycled to free its process and slot.
+            logger.error(f"Timed out processing file {file_name} after {self.timeout}s; recycling worker pool")
+            self._reset(executor, terminate=True)
+        except BrokenProcessPool:
+            if retry and executor in self._recycled:
+                # Killed because another file timed out, not because of this one: retried once on the new pool.
+                logger.warning(f"Worker pool was recycled while processing {file_name}; retrying")
+                submitted = self._submit(file)
+                if submitted is None:
+                    return process_inline(file)
+                return self._result(file, *submitted, self.timeout, process_inline, retry=False)
+            # Not retried inline: the file that broke the pool may well be the one that crashed it.
+            logger.error(f"Attachment worker pool broke while processing {file_name}")
+            self._reset(executor)
+        except Exception as e:
+            logger.error(f"Error processing file {file_name} in worker: {e}", exc_info=True)
+        return None
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _submit(self, file: Dict) -> Optional[Tuple[concurrent.futures.Future, concurrent.futures.ProcessPoolExecutor]]:
+        if not self._slots.acquire(timeout=self.timeout):
+            logger.warning("Attachment worker pool saturated; processing inline")
+            return None
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_process_file_in_worker, file)
+        except Exception as e:
+            self._slots.release()
+            logger.error(f"Failed to submit file to worker pool: {e}", exc_info=True)
+            self._reset(executor)
+            return None
+        future.add_done_callback(lambda _: self._slots.release())
+        return future, executor
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                logger.info(f"Starting attachment worker pool with {self.max_workers} processes")
+                # spawn avoids forking a multi-threaded server process.
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _reset(self, executor: concurrent.futures.ProcessPoolExecutor, terminate: bool = False):
+        # Only the pool that failed is dropped; another request may already have started its replacement.
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+            if terminate:
+                self._recycled.add(executor)
+        if terminate:
+            # Futures still queued on the killed pool fail with BrokenProcessPool, which releases their slots.
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _encoded_size(file: Dict) -> int:
+        file_data = file.get('data') or file.get('content') or file.get('text') or ''
+        # Base64 payloads decode to three quarters of their length.
+        return len(file_data) * 3 // 4
@@ -0,0 +1,149 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class BlobStore:
+    def __init__(self, max_memory_bytes: int = 64 * 1024 * 1024, spill_dir: Optional[str] = None, persistent: bool = False):
+        logger.info(f"Initializing BlobStore with memory budget: {max_memory_bytes} bytes")
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_dir = spill_dir
+        # Persistent stores write every blob to spill_dir as it is stored, so blob_refs kept in
+        # the conversation database still resolve after a restart; memory is then only a cache.
+        self.persistent = persistent and spill_dir is not None
+        self._lock = threading.Lock()
+        # digest -> {'data': bytes or None when spilled, 'size': int, 'refcount': int}
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._conversation_refs: Dict[str, Counter] = {}
+        self._memory_bytes = 0
+
+    def put(self, data: bytes, conversation_id: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                entry = {'data': data, 'size': len(data), 'refcount': 0}
+                self._entries[digest] = entry
+                if self.persistent:
+                    self._write(digest, data)
+                self._memory_bytes += len(data)
+                logger.debug(f"Stored new blob {digest} ({len(data)} bytes)")
+            self._add_ref(digest, entry, conversation_id)
+            self._spill_if_needed()
+        return digest
+
+    def acquire(self, digest: str, conversation_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                path = self._blob_path(digest)
+                if not path or not os.path.exists(path):
+                    return False
+                entry = {'data': None, 'size': os.path.getsize(path), 'refcount': 0}
+                self._entries[digest] = entry
+            self._add_ref(digest, entry, conversation_id)
+        return True
+
+    def get(self, digest: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry['data'] is not None:
+                self._entries.move_to_end(digest)
+                return entry['data']
+        path = self._blob_path(digest)
+        if path:
+            try:
+                with open(path, 'rb') as f:
+                    return f.read()
+            except FileNotFoundError:
+                pass
+        logger.warning(f"Blob not found: {digest}")
+        return None
+
+    def release(self, conversation_id: str):
+        with self._lock:
+            refs = self._conversation_refs.pop(conversation_id, None)
+            if not refs:
+                return
+            for digest, count in refs.items():
+                entry = self._entries.get(digest)
+                if entry is None:
+                    continue
+                entry['refcount'] -= count
+                if entry['refcount'] <= 0:
+                    self._delete(digest, entry)
+        logger.info(f"Released blobs for conversation: {conversation_id}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            spilled = sum(1 for entry in self._entries.values() if entry['data'] is None)
+            return {
+                'blobs': len(self._entries),
+                'spilled_blobs': spilled,
+                'memory_bytes': self._memory_bytes,
+                'total_bytes': sum(entry['size'] for entry in self._entries.values()),
+                'conversations': len(self._conversation_refs)
+            }
+
+    def conversation_usage(self) -> Dict[str, Dict]:
+        # Shared blobs count towards every conversation that references them.
+        with self._lock:
+            usage = {}
+            for conversation_id, refs in self._conversation_refs.items():
+                entries = [self._entries[digest] for digest in refs if digest in self._entries]
+                usage[conversation_id] = {
+                    'blobs': len(entries),
+                    'bytes': sum(entry['size'] for entry in entries),
+                    'memory_bytes': sum(entry['size'] for entry in entries if entry['data'] is not None)
+                }
+            return usage
+
+    def _add_ref(self, digest: str, entry: Dict, conversation_id: str):
+        entry['refcount'] += 1
+        self._conversation_refs.setdefault(conversation_id, Counter())[digest] += 1
+
+    def _delete(self, digest: str, entry: Dict):
+        del self._entries[digest]
+        if entry['data'] is not None:
+            self._memory_bytes -= entry['size']
+        if entry['data'] is None or self.persistent:
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError as e:
+                logger.warning(f"Failed to remove spilled blob {digest}: {e}")
+        logger.debug(f"Deleted blob {digest}")
+
+    def _spill_if_needed(self):
+        # Least recently used blobs move to disk until the resident set fits the budget.
+        for digest, entry in list(self._entries.items()):
+            if self._memory_bytes <= self.max_memory_bytes:
+                break
+            if entry['data'] is None:
+                continue
+            if not self.persistent:
+                self._write(digest, entry['data'])
+            entry['data'] = None
+            self._memory_bytes -= entry['size']
+            logger.debug(f"Spilled blob {digest} to disk")
+
+    def _write(self, digest: str, data: bytes):
+        path = self._blob_path(digest, create_dir=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _blob_path(self, digest: str, create_dir: bool = False) -> Optional[str]:
+        if self.spill_dir is None:
+            if not create_dir:
+                return None
+            self.spill_dir = tempfile.mkdtemp(prefix='llm_helper_blobs_')
+            logger.info(f"Created blob spill directory: {self.spill_dir}")
+        elif create_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        return os.path.join(self.spill_dir, digest)
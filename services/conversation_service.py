@@ -1,59 +1,288 @@
+import base64
+import hashlib
+import json
 import logging
+import os
+from typing import Dict, Iterator, List, Optional
+from werkzeug.exceptions import Conflict
+from .blob_store import BlobStore
+from .conversation_store import ConversationStore
+from .document_index import DocumentIndex
+from .map_reduce import MapReduceProcessor
+from .message import Message
+from .profiling import deep_sizeof
+from .tabular import table_kind
 
 logger = logging.getLogger(__name__)
 
 class ConversationService:
-    def __init__(self, llm_service, file_service):
+    def __init__(self, llm_service, file_service, store=None, blob_store=None):
         logger.info("Initializing ConversationService")
         self.llm_service = llm_service
         self.file_service = file_service
-        self.conversation_history = []
-        logger.info("ConversationService initialized successfully")
+        self.store = store or ConversationStore()
+        self.blob_store = blob_store or BlobStore()
+        # Text attachments above this size are indexed for retrieval instead of inlined.
+        self.inline_char_limit = int(os.getenv('DOCUMENT_INLINE_CHARS', 20000))
+        self.retrieval_token_budget = int(os.getenv('RETRIEVAL_TOKEN_BUDGET', 3000))
+        self.document_index = DocumentIndex()
+        self.map_reduce = MapReduceProcessor(
+            llm_service,
+            chunk_chars=int(os.getenv('MAP_REDUCE_CHUNK_CHARS', 48000)),
+            max_concurrency=int(os.getenv('MAP_REDUCE_CONCURRENCY', 4))
+        )
+        # (name, blob_ref) of the full, untruncated text of documents sent in map-reduce mode.
+        self.map_reduce_documents = []
+        # Client-side SHA-256 of uploaded bytes -> stored attachment, so repeat uploads can be sent by reference.
+        self.attachment_refs: Dict[str, Dict] = {}
+        self.conversation_id = self.store.latest_conversation_id() or self.store.create_conversation()
+        self.conversation_history = [Message.from_dict(message) for message in self.store.iter_messages(self.conversation_id)]
+        for message in self.conversation_history:
+            for item in message['content']:
+                if 'blob_ref' in item:
+                    self.blob_store.acquire(item['blob_ref'], self.conversation_id)
+                if item.get('indexed'):
+                    self.document_index.add_document(item.get('name', 'Unnamed file'), self._resolve_attachment_text(item))
+        logger.info(f"ConversationService initialized successfully with conversation: {self.conversation_id}")
     
     def new_conversation(self):
         try:
             logger.info("Starting a new conversation")
+            self.blob_store.release(self.conversation_id)
+            self.conversation_id = self.store.create_conversation()
             self.conversation_history = []
-            self.llm_service._create_or_get_thread()  
+            self.document_index = DocumentIndex()
+            self.map_reduce_documents = []
+            self.attachment_refs = {}
+            self.llm_service._create_or_get_thread(self.conversation_id)
             logger.info("New conversation started")
             return {"message": "New conversation started"}
         except Exception as e:
             logger.error(f"Error starting new conversation: {e}", exc_info=True)
             return {"error": str(e)}
 
-    def process_message(self, message, files, assistant_id=None):
+    def process_message(self, message, files, assistant_id=None, model=None, mode=None, cancelled=None):
+        # Replies go to the conversation the message was sent in, even if /new_conversation runs meanwhile.
+        conversation_id = self.conversation_id
         try:
             logger.info(f"Processing message: {message}")
-            user_content = [{"type": "text", "text": message}]
-            processed_files = []
-
-            for file in files:
-                processed_file = self.file_service.process_file(file)
-                if processed_file:
-                    processed_files.append(processed_file)
-                    if processed_file['type'] == 'text':
-                        user_content.append({"type": "text", "text": processed_file['text']})
-                    elif processed_file['type'] == 'image':
-                        user_content.append({"type": "image", "image_url": processed_file['source']['data']})
-
-            # Add only the new message to the conversation history
-            self.conversation_history.append({"role": "user", "content": user_content})
-
-            # Prepare messages for LLM, including only unique entries
+            if mode == 'map_reduce':
+                return self._process_map_reduce(message, files, model, conversation_id, cancelled)
+            processed_files = self._add_user_message(message, files, conversation_id)
             llm_messages = self._prepare_messages_for_llm()
 
-            assistant_message = self.llm_service.call_llm(llm_messages, processed_files, assistant_id)
+            assistant_message = self.llm_service.call_llm(llm_messages, processed_files, assistant_id, session_id=conversation_id, model=model)
             
             if assistant_message:
-                self.conversation_history.append({"role": "assistant", "content": [{"type": "text", "text": assistant_message}]})
+                self._append_message({"role": "assistant", "content": [{"type": "text", "text": assistant_message}]}, conversation_id)
                 return assistant_message
             else:
                 logger.error("Failed to get response from LLM")
                 return {'error': 'Failed to get response from LLM'}
+        except Conflict:
+            # Left to the route, which answers 409 so the client resends the full data.
+            raise
         except Exception as e:
             logger.error(f"Error processing message: {e}", exc_info=True)
             return {"error": str(e)}
-        
+
+    def stream_message(self, message, files, assistant_id=None, model=None) -> Iterator[str]:
+        logger.info(f"Streaming message: {message}")
+        conversation_id = self.conversation_id
+        processed_files = self._add_user_message(message, files, conversation_id)
+        llm_messages = self._prepare_messages_for_llm()
+        chunks = []
+        for chunk in self.llm_service.stream_llm(llm_messages, processed_files, assistant_id, session_id=conversation_id, model=model):
+            chunks.append(chunk)
+            yield chunk
+        assistant_message = "".join(chunks)
+        if assistant_message:
+            self._append_message({"role": "assistant", "content": [{"type": "text", "text": assistant_message}]}, conversation_id)
+        else:
+            logger.error("Failed to get streamed response from LLM")
+
+    def memory_usage(self) -> Dict:
+        return {
+            'conversation_id': self.conversation_id,
+            'messages': len(self.conversation_history),
+            'history_bytes': deep_sizeof(self.conversation_history),
+            'document_index': self.document_index.stats(),
+            'attachment_refs': len(self.attachment_refs),
+            'blobs': self.blob_store.conversation_usage()
+        }
+
+    def check_attachment_refs(self, files):
+        # Called before a message is accepted; the client answers a 409 by resending the full data.
+        missing = [file['ref'] for file in files or [] if 'ref' in file and file['ref'] not in self.attachment_refs]
+        if missing:
+            raise Conflict(f"Unknown attachment references: {', '.join(missing)}")
+
+    def resolve_attachment_ref(self, ref: str) -> Dict:
+        attachment = self.attachment_refs.get(ref)
+        processed_file = self._processed_from_attachment(attachment) if attachment else None
+        if processed_file is None:
+            # Also covers a ref whose blob has gone; dropping it makes the client's resend store it again.
+            self.attachment_refs.pop(ref, None)
+            raise Conflict(f"Unknown attachment references: {ref}")
+        return processed_file
+
+    def _add_user_message(self, message, files, conversation_id=None):
+        user_content, processed_files = self._user_content(message, files)
+        # Add only the new message to the conversation history
+        self._append_message({"role": "user", "content": user_content}, conversation_id)
+        return processed_files
+
+    def _user_content(self, message, files, process_uploads=None):
+        user_content = [{"type": "text", "text": message}]
+        processed_files = []
+
+        if files:
+            # Checked again here: a new conversation may have cleared the refs since the route checked them.
+            self.check_attachment_refs(files)
+            uploads = [file for file in files if 'ref' not in file]
+            # Results come back in attachment order; failed files are None.
+            process_uploads = process_uploads or self.file_service.process_files
+            processed_uploads = iter(process_uploads(uploads) if uploads else [])
+            for file in files:
+                if 'ref' in file:
+                    processed_file = self.resolve_attachment_ref(file['ref'])
+                    attachment = self.attachment_refs[file['ref']]
+                else:
+                    attachment = None
+                    processed_file = next(processed_uploads)
+                if not processed_file:
+                    logger.warning(f"Failed to process file: {file.get('name', 'Unnamed file')}")
+                    continue
+                if attachment is None:
+                    attachment = self._store_attachment(processed_file)
+                    client_hash = self._client_hash(file)
+                    if client_hash:
+                        self.attachment_refs[client_hash] = attachment
+                processed_files.append(processed_file)
+                user_content.append(attachment)
+        return user_content, processed_files
+
+    @staticmethod
+    def _client_hash(file: Dict) -> Optional[str]:
+        # Matches the browser's hash of the bytes it sent, before any server-side processing.
+        data = file.get('data')
+        if not data:
+            return None
+        try:
+            return hashlib.sha256(base64.b64decode(data)).hexdigest()
+        except ValueError:
+            return None
+
+    def _processed_from_attachment(self, attachment: Dict) -> Optional[Dict]:
+        data = self.blob_store.get(attachment['blob_ref'])
+        if data is None:
+            return None
+        if attachment['type'] == 'image':
+            return {
+                'type': 'image',
+                'name': attachment.get('name', 'Unnamed file'),
+                'source': {'type': 'base64', 'media_type': attachment['media_type'], 'data': base64.b64encode(data).decode('utf-8')}
+            }
+        return {'type': 'text', 'name': attachment.get('name', 'Unnamed file'), 'text': data.decode('utf-8')}
+
+    def _process_map_reduce(self, message, files, model=None, conversation_id=None, cancelled=None):
+        if not files and not self.map_reduce_documents:
+            raise ValueError("Map-reduce mode requires at least one text attachment in the conversation")
+        # Files are processed once, here, and stored whole; the stored attachment is the map-reduce document.
+        user_content, _ = self._user_content(message, files, self._extract_full_texts)
+        self._append_message({"role": "user", "content": user_content}, conversation_id)
+        known = {blob_ref for _, blob_ref in self.map_reduce_documents}
+        for attachment in user_content[1:]:
+            # A resent file (usually by ref) already has its notes in the reduce prompt.
+            if attachment['type'] == 'text' and attachment['blob_ref'] not in known:
+                known.add(attachment['blob_ref'])
+                self.map_reduce_documents.append((attachment.get('name', 'Unnamed file'), attachment['blob_ref']))
+        if not self.map_reduce_documents:
+            raise ValueError("Map-reduce mode requires at least one text attachment in the conversation")
+
+        # Earlier documents are included so follow-up questions reuse their cached chunk notes.
+        documents = [
+            (name, self._resolve_attachment_text({'name': name, 'blob_ref': blob_ref}))
+            for name, blob_ref in self.map_reduce_documents
+        ]
+        assistant_message = self.map_reduce.run(message, documents, model)
+        if cancelled is not None and cancelled():
+            # The job was cancelled while the blocking run finished; its reply is dropped, not stored.
+            logger.info("Map-reduce run cancelled; reply not added to history")
+            return assistant_message
+        if assistant_message:
+            self._append_message({"role": "assistant", "content": [{"type": "text", "text": assistant_message}]}, conversation_id)
+            return assistant_message
+        logger.error("Failed to get map-reduce response from LLM")
+        return {'error': 'Failed to get response from LLM'}
+
+    def _extract_full_texts(self, uploads: List[Dict]) -> List[Optional[Dict]]:
+        # Map-reduce exists to read whole documents, so text skips the caps in process_files
+        # (the 1M-character text limit and the table preview). Images and binary tables have
+        # no plain-text form and still go through process_files.
+        processed = [None] * len(uploads)
+        binary = [index for index, file in enumerate(uploads)
+                  if file.get('type') == 'image' or table_kind(file.get('type'), file.get('name', 'Unnamed file')) in ('parquet', 'xlsx')]
+        for index, file in enumerate(uploads):
+            if index not in binary:
+                text = self.file_service.extract_text(file)
+                processed[index] = {'type': 'text', 'name': file.get('name', 'Unnamed file'), 'text': text} if text else None
+        if binary:
+            for index, processed_file in zip(binary, self.file_service.process_files([uploads[index] for index in binary])):
+                processed[index] = processed_file
+        return processed
+
+    def _append_message(self, message: Dict, conversation_id: Optional[str] = None):
+        # History holds compact slotted messages; the plain dict only exists while it is persisted.
+        conversation_id = conversation_id or self.conversation_id
+        self.store.append_message(conversation_id, message)
+        # A late reply to a conversation the client has since left is stored but not shown.
+        if conversation_id == self.conversation_id:
+            self.conversation_history.append(Message.from_dict(message))
+
+    def _store_attachment(self, processed_file: Dict) -> Dict:
+        # History keeps only a content-addressed reference; the payload lives in the blob store.
+        if processed_file['type'] == 'image':
+            data = base64.b64decode(processed_file['source']['data'])
+            return {
+                "type": "image",
+                "name": processed_file.get('name', 'Unnamed file'),
+                "media_type": processed_file['source']['media_type'],
+                "blob_ref": self.blob_store.put(data, self.conversation_id)
+            }
+        attachment = {
+            "type": "text",
+            "name": processed_file.get('name', 'Unnamed file'),
+            "blob_ref": self.blob_store.put(processed_file['text'].encode('utf-8'), self.conversation_id)
+        }
+        if len(processed_file['text']) > self.inline_char_limit:
+            self.document_index.add_document(attachment['name'], processed_file['text'])
+            attachment['indexed'] = True
+        return attachment
+
+    def _resolve_attachment_text(self, item: Dict) -> str:
+        if 'blob_ref' not in item:
+            return item.get('text', '')
+        data = self.blob_store.get(item['blob_ref'])
+        if data is None:
+            return f"[Attachment no longer available: {item.get('name', 'Unnamed file')}]"
+        return data.decode('utf-8')
+
+    def _render_content_for_llm(self, content: List[Dict]) -> str:
+        if not content:
+            return ''
+        text = content[0].get('text', '')
+        attachments = [
+            f"File: {item.get('name', 'Unnamed file')}\nContent: {self._resolve_attachment_text(item)}"
+            for item in content[1:] if item['type'] == 'text' and not item.get('indexed')
+        ]
+        indexed = [item.get('name', 'Unnamed file') for item in content[1:] if item.get('indexed')]
+        if indexed:
+            attachments.append(f"Indexed for retrieval (relevant excerpts are included with each question): {', '.join(indexed)}")
+        if attachments:
+            text += "\n\nAttached files:\n" + "\n".join(attachments)
+        return text
+
     def _prepare_messages_for_llm(self):
         unique_messages = []
         seen = set()
@@ -61,25 +290,58 @@ class ConversationService:
             message_content = message['content'][0]['text'] if message['content'] else ''
             if message_content not in seen:
                 seen.add(message_content)
-                unique_messages.append({"role": message['role'], "content": message_content})
+                unique_messages.append({"role": message['role'], "content": self._render_content_for_llm(message['content'])})
+        if len(self.document_index) and unique_messages and unique_messages[-1]['role'] == 'user':
+            query = self.conversation_history[-1]['content'][0].get('text', '')
+            excerpts = self.document_index.retrieve(query, self.retrieval_token_budget)
+            if excerpts:
+                logger.info(f"Adding {len(excerpts)} retrieved excerpts to the prompt")
+                unique_messages[-1]['content'] += "\n\nRelevant excerpts from attached documents:\n" + "\n".join(
+                    f"[{chunk['name']}, part {chunk['position'] + 1}]\n{chunk['text']}" for chunk in excerpts
+                )
         return unique_messages
 
+    @staticmethod
+    def _format_message_markdown(message: Dict) -> str:
+        lines = [f"{message['role'].capitalize()}:\n"]
+        for item in message['content']:
+            if 'blob_ref' in item and item['type'] == 'text':
+                lines.append(f"[File attached: {item.get('name', 'Unnamed file')}]\n")
+            elif item['type'] == 'text':
+                lines.append(f"{item['text']}\n")
+            elif item['type'] == 'image':
+                lines.append("[Image uploaded]\n")
+        lines.append("\n")
+        return "".join(lines)
+
     def export_chat(self):
         try:
             logger.info("Exporting chat history")
-            chat_export = ""
-            for message in self.conversation_history:
-                role = message['role']
-                content = message['content']
-                chat_export += f"{role.capitalize()}:\n"
-                for item in content:
-                    if item['type'] == 'text':
-                        chat_export += f"{item['text']}\n"
-                    elif item['type'] == 'image':
-                        chat_export += "[Image uploaded]\n"
-                chat_export += "\n"
+            chat_export = "".join(self._format_message_markdown(message) for message in self.conversation_history)
             logger.info("Chat history exported successfully")
             return chat_export
         except Exception as e:
             logger.error(f"Error exporting chat history: {e}", exc_info=True)
             return {"error": str(e)}
+
+    def iter_export(self, export_format: str = 'markdown') -> Iterator[str]:
+        if export_format not in ('markdown', 'json'):
+            raise ValueError(f"Unsupported export format: {export_format}")
+        logger.info(f"Streaming chat export for conversation {self.conversation_id} as {export_format}")
+        # Streams from the store one message at a time so export memory stays constant.
+        if export_format == 'json':
+            return self._iter_export_json(self.conversation_id, self.store.iter_message_json(self.conversation_id))
+        return (self._format_message_markdown(message) for message in self.store.iter_messages(self.conversation_id))
+
+    @staticmethod
+    def _iter_export_json(conversation_id: str, messages: Iterator[str]) -> Iterator[str]:
+        yield f'{{"conversation_id": {json.dumps(conversation_id)}, "messages": ['
+        separator = ""
+        for message in messages:
+            yield separator + message
+            separator = ","
+        yield "]}"
+
+    def get_history_page(self, before=None, limit=50):
+        logger.info(f"Fetching history page for conversation {self.conversation_id} (before={before}, limit={limit})")
+        return self.store.get_page(self.conversation_id, before, limit)
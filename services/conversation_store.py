@@ -0,0 +1,111 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+class ConversationStore:
+    def __init__(self, db_path: str = ':memory:'):
+        logger.info(f"Initializing ConversationStore at: {db_path}")
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # Autocommit mode: every append is its own short transaction on the log.
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        if db_path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_conversation_seq
+                ON messages (conversation_id, seq);
+        """)
+        logger.info("ConversationStore initialized successfully")
+
+    def create_conversation(self) -> str:
+        conversation_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO conversations (id, created_at) VALUES (?, ?)',
+                (conversation_id, time.time())
+            )
+        logger.info(f"Created conversation: {conversation_id}")
+        return conversation_id
+
+    def latest_conversation_id(self) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id FROM conversations ORDER BY created_at DESC, rowid DESC LIMIT 1'
+            ).fetchone()
+        return row[0] if row else None
+
+    def append_message(self, conversation_id: str, message: Dict) -> int:
+        content = json.dumps(message['content'], separators=(',', ':'))
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO messages (conversation_id, role, content, created_at) VALUES (?, ?, ?, ?)',
+                (conversation_id, message['role'], content, time.time())
+            )
+        return cursor.lastrowid
+
+    def count_messages(self, conversation_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT COUNT(*) FROM messages WHERE conversation_id = ?', (conversation_id,)
+            ).fetchone()
+        return row[0]
+
+    def iter_messages(self, conversation_id: str, batch_size: int = 500) -> Iterator[Dict]:
+        for _, role, content in self._iter_rows(conversation_id, batch_size):
+            yield {"role": role, "content": json.loads(content)}
+
+    def iter_message_json(self, conversation_id: str, batch_size: int = 500) -> Iterator[str]:
+        # Content is stored serialized, so exports splice it in instead of decoding and re-encoding.
+        for _, role, content in self._iter_rows(conversation_id, batch_size):
+            yield f'{{"role":{json.dumps(role)},"content":{content}}}'
+
+    def _iter_rows(self, conversation_id: str, batch_size: int) -> Iterator[tuple]:
+        # Keyset pagination keeps only one batch resident, regardless of conversation length.
+        last_seq = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT seq, role, content FROM messages '
+                    'WHERE conversation_id = ? AND seq > ? ORDER BY seq LIMIT ?',
+                    (conversation_id, last_seq, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_seq = rows[-1][0]
+
+    def get_page(self, conversation_id: str, before: Optional[int] = None, limit: int = 50) -> Dict:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT seq, role, content FROM messages '
+                'WHERE conversation_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?',
+                (conversation_id, before if before is not None else 2 ** 63 - 1, limit + 1)
+            ).fetchall()
+        has_more = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+        return {
+            "conversation_id": conversation_id,
+            "messages": [
+                {"seq": seq, "role": role, "content": json.loads(content)}
+                for seq, role, content in rows
+            ],
+            "next_before": rows[0][0] if has_more and rows else None
+        }
@@ -0,0 +1,104 @@
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text and code.
+    return len(text) // 4 + 1
+
+def chunk_text(text: str, chunk_chars: int) -> List[str]:
+    # Packs whole lines into chunks of at most chunk_chars, splitting only overlong lines.
+    chunks = []
+    current = []
+    current_length = 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > chunk_chars:
+            if current:
+                chunks.append("".join(current))
+                current, current_length = [], 0
+            chunks.append(line[:chunk_chars])
+            line = line[chunk_chars:]
+        if current_length + len(line) > chunk_chars:
+            chunks.append("".join(current))
+            current, current_length = [], 0
+        current.append(line)
+        current_length += len(line)
+    if current:
+        chunks.append("".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+class DocumentIndex:
+    def __init__(self, chunk_chars: int = 2000, k1: float = 1.5, b: float = 0.75):
+        self.chunk_chars = chunk_chars
+        self.k1 = k1
+        self.b = b
+        self.chunks: List[Dict] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._chunk_lengths: List[int] = []
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def add_document(self, name: str, text: str) -> int:
+        chunks = chunk_text(text, self.chunk_chars)
+        with self._lock:
+            for position, chunk in enumerate(chunks):
+                chunk_id = len(self.chunks)
+                self.chunks.append({'name': name, 'position': position, 'text': chunk})
+                term_counts = Counter(TOKEN_PATTERN.findall(chunk.lower()))
+                for term, count in term_counts.items():
+                    self._postings.setdefault(term, []).append((chunk_id, count))
+                length = sum(term_counts.values())
+                self._chunk_lengths.append(length)
+                self._total_length += length
+        logger.info(f"Indexed {name}: {len(text)} characters in {len(chunks)} chunks")
+        return len(chunks)
+
+    def search(self, query: str, top_k: int = 8) -> List[Tuple[float, Dict]]:
+        terms = set(TOKEN_PATTERN.findall(query.lower()))
+        with self._lock:
+            chunk_count = len(self.chunks)
+            if not chunk_count or not terms:
+                return []
+            average_length = self._total_length / chunk_count
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (chunk_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings:
+                    norm = self.k1 * (1 - self.b + self.b * self._chunk_lengths[chunk_id] / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            return [(score, self.chunks[chunk_id]) for chunk_id, score in ranked]
+
+    def retrieve(self, query: str, token_budget: int = 3000, top_k: int = 8) -> List[Dict]:
+        selected = []
+        used_tokens = 0
+        for _, chunk in self.search(query, top_k):
+            chunk_tokens = estimate_tokens(chunk['text'])
+            if used_tokens + chunk_tokens > token_budget:
+                continue
+            selected.append(chunk)
+            used_tokens += chunk_tokens
+        # Present excerpts in document order so neighbouring chunks read naturally.
+        selected.sort(key=lambda chunk: (chunk['name'], chunk['position']))
+        return selected
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'chunks': len(self.chunks),
+                'terms': len(self._postings),
+                'tokens': self._total_length
+            }
@@ -0,0 +1,99 @@
+import io
+import logging
+import time
+import zipfile
+from typing import Dict, Optional
+from xml.etree import ElementTree
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_EXTENSIONS = {'.pdf': 'pdf', '.docx': 'docx'}
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+def document_kind(file_type: Optional[str], file_name: str) -> Optional[str]:
+    if file_type in ('pdf', 'docx'):
+        return file_type
+    if file_type in (None, 'code', 'text'):
+        for extension, kind in DOCUMENT_EXTENSIONS.items():
+            if file_name.lower().endswith(extension):
+                return kind
+    return None
+
+def extract_document(data: bytes, kind: str, max_chars: int, time_budget: float) -> Dict:
+    # Both extractors stop at whichever comes first: the character budget or the time budget.
+    deadline = time.monotonic() + time_budget
+    if kind == 'pdf':
+        return _extract_pdf(data, max_chars, deadline)
+    if kind == 'docx':
+        return _extract_docx(data, max_chars, deadline)
+    raise ValueError(f"Unsupported document type: {kind}")
+
+def _extract_pdf(data: bytes, max_chars: int, deadline: float) -> Dict:
+    if PdfReader is None:
+        raise ValueError("Reading PDF files requires the pypdf package")
+    reader = PdfReader(io.BytesIO(data))
+    if reader.is_encrypted and not reader.decrypt(''):
+        raise ValueError("PDF is password protected")
+    # Pages are parsed one at a time as the loop reaches them; later pages are never touched.
+    pages = []
+    size = 0
+    stopped = None
+    for number, page in enumerate(reader.pages, 1):
+        if time.monotonic() > deadline:
+            stopped = 'time limit'
+            break
+        text = f"[Page {number}]\n{(page.extract_text() or '').strip()}\n"
+        if size + len(text) > max_chars:
+            pages.append(text[:max_chars - size])
+            stopped = 'character limit'
+            break
+        pages.append(text)
+        size += len(text)
+    return {'text': "".join(pages), 'parts': len(pages), 'total_parts': len(reader.pages), 'stopped': stopped}
+
+def _paragraph_text(paragraph) -> str:
+    pieces = []
+    for node in paragraph.iter():
+        if node.tag == WORD_NAMESPACE + 't':
+            pieces.append(node.text or '')
+        elif node.tag == WORD_NAMESPACE + 'tab':
+            pieces.append('\t')
+        elif node.tag in (WORD_NAMESPACE + 'br', WORD_NAMESPACE + 'cr'):
+            pieces.append('\n')
+    return "".join(pieces)
+
+def _extract_docx(data: bytes, max_chars: int, deadline: float) -> Dict:
+    paragraphs = []
+    size = 0
+    stopped = None
+    with zipfile.ZipFile(io.BytesIO(data)) as archive, archive.open('word/document.xml') as document:
+        # iterparse decompresses and parses the body incrementally; finished paragraphs are cleared.
+        for _, element in ElementTree.iterparse(document, events=('end',)):
+            if element.tag != WORD_NAMESPACE + 'p':
+                continue
+            if time.monotonic() > deadline:
+                stopped = 'time limit'
+                break
+            text = _paragraph_text(element) + "\n"
+            element.clear()
+            if size + len(text) > max_chars:
+                paragraphs.append(text[:max_chars - size])
+                stopped = 'character limit'
+                break
+            paragraphs.append(text)
+            size += len(text)
+    return {'text': "".join(paragraphs), 'parts': len(paragraphs), 'total_parts': None, 'stopped': stopped}
+
+def render_document(kind: str, document: Dict) -> str:
+    if kind == 'pdf':
+        header = f"PDF text, pages 1-{document['parts']} of {document['total_parts']}"
+    else:
+        header = f"Word document text, {document['parts']} paragraphs"
+    if document['stopped']:
+        header += f" (stopped at the {document['stopped']})"
+    return f"{header}:\n{document['text']}"
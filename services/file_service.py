@@ -1,22 +1,86 @@
 import base64
+import hashlib
 import io
 from PIL import Image
-import csv
-import json
 import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict
+from .documents import document_kind, extract_document, render_document
+from .tabular import read_table, render_table, summarize_columns, table_kind, TABLE_LABELS
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_IMAGE_PIXELS = 40_000_000
+# Longest edge sent to the models; larger images are downscaled here and in the browser.
+DEFAULT_MAX_IMAGE_DIMENSION = 1568
+DEFAULT_IMAGE_QUALITY = 85
+# Rows and columns read from any spreadsheet; also what ends up in the prompt.
+DEFAULT_TABLE_MAX_ROWS = 500
+DEFAULT_TABLE_MAX_COLUMNS = 50
+# Matches the plain-text cap; longer documents are indexed for retrieval downstream anyway.
+DEFAULT_DOCUMENT_MAX_CHARS = 1_000_000
+# Below ATTACHMENT_TIMEOUT, so a slow PDF returns its first pages instead of being discarded.
+DEFAULT_DOCUMENT_TIME_BUDGET = 20.0
+DEFAULT_DOCUMENT_CACHE_SIZE = 32
+
 class FileService:
+    def __init__(self, executor=None, max_image_pixels=None, max_image_dimension=None, image_quality=None,
+                 table_max_rows=None, table_max_columns=None, document_max_chars=None, document_time_budget=None,
+                 document_cache_size=None):
+        self.executor = executor
+        # Read from the environment by default so attachment worker processes share the limits.
+        self.max_image_pixels = max_image_pixels or int(os.getenv('MAX_IMAGE_PIXELS', DEFAULT_MAX_IMAGE_PIXELS))
+        self.max_image_dimension = max_image_dimension or int(os.getenv('MAX_IMAGE_DIMENSION', DEFAULT_MAX_IMAGE_DIMENSION))
+        self.image_quality = image_quality or int(os.getenv('IMAGE_QUALITY', DEFAULT_IMAGE_QUALITY))
+        self.table_max_rows = table_max_rows or int(os.getenv('TABLE_MAX_ROWS', DEFAULT_TABLE_MAX_ROWS))
+        self.table_max_columns = table_max_columns or int(os.getenv('TABLE_MAX_COLUMNS', DEFAULT_TABLE_MAX_COLUMNS))
+        self.document_max_chars = document_max_chars or int(os.getenv('DOCUMENT_MAX_CHARS', DEFAULT_DOCUMENT_MAX_CHARS))
+        self.document_time_budget = document_time_budget or float(os.getenv('DOCUMENT_TIME_BUDGET', DEFAULT_DOCUMENT_TIME_BUDGET))
+        self.document_cache_size = document_cache_size or int(os.getenv('DOCUMENT_CACHE_SIZE', DEFAULT_DOCUMENT_CACHE_SIZE))
+        # Extracted documents by content hash. Kept in this process because workers are short-lived copies.
+        self._document_cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._document_lock = threading.Lock()
+
+    def upload_config(self):
+        return {
+            'max_image_dimension': self.max_image_dimension,
+            'image_quality': self.image_quality
+        }
+
+    def process_files(self, files):
+        results = [self._cached_document(file) for file in files]
+        misses = [index for index, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+        uncached = [files[index] for index in misses]
+        if self.executor is None:
+            processed = [self.process_file(file) for file in uncached]
+        else:
+            logger.info(f"Submitting {len(uncached)} files to attachment executor")
+            processed = self.executor.process_files(uncached, self.process_file)
+        for index, processed_file in zip(misses, processed):
+            results[index] = processed_file
+            self._cache_document(files[index], processed_file)
+        return results
+
     def process_image(self, image_data):
         try:
             logger.info(f"Starting image processing. Data length: {len(image_data)}")
             encoded = image_data.split(",", 1)[1] if image_data.startswith('data:') else image_data
             logger.debug(f"Encoded image data (first 100 chars): {encoded[:100]}")
-            img = Image.open(io.BytesIO(base64.b64decode(encoded))).convert('RGB')
+            img = Image.open(io.BytesIO(base64.b64decode(encoded)))
+            # Image.open only reads the header, so this rejects decompression bombs before decoding pixels.
+            if img.width * img.height > self.max_image_pixels:
+                raise ValueError(f"Image dimensions {img.size} exceed the {self.max_image_pixels} pixel limit")
+            # Lets the JPEG decoder scale down by powers of two instead of decoding every pixel.
+            img.draft('RGB', (self.max_image_dimension, self.max_image_dimension))
+            img = img.convert('RGB')
             logger.info(f"Image opened. Size: {img.size}, Mode: {img.mode}")
+            img.thumbnail((self.max_image_dimension, self.max_image_dimension))
             buffer = io.BytesIO()
-            img.save(buffer, format='JPEG')
+            img.save(buffer, format='JPEG', quality=self.image_quality)
             processed_image_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
             logger.info(f"Image processed successfully. Processed data length: {len(processed_image_data)}")
             return processed_image_data
@@ -24,17 +88,59 @@ class FileService:
             logger.error(f"Error processing image: {str(e)}", exc_info=True)
             return None
 
-    def process_csv(self, csv_data):
+    def process_table(self, table_data, kind, file_name):
+        logger.info(f"Starting {kind} processing. Data length: {len(table_data)}")
+        try:
+            table = read_table(base64.b64decode(table_data), kind, self.table_max_rows, self.table_max_columns)
+        except Exception as e:
+            # Sent as a note rather than dropped, so the model can tell the user what went wrong.
+            logger.error(f"Error reading {kind} file {file_name}: {e}", exc_info=not isinstance(e, ValueError))
+            return f"{TABLE_LABELS[kind]} file {file_name} could not be read: {e}"
+        logger.info(f"{kind} processed successfully: {len(table['columns'])} columns, total rows {table['total_rows']}")
+        return render_table(file_name, kind, table, summarize_columns(table))
+
+    def process_document(self, document_data, kind, file_name):
+        # Returns the rendered text and why extraction stopped: None, 'character limit', 'time limit' or 'error'.
+        logger.info(f"Starting {kind} extraction. Data length: {len(document_data)}")
         try:
-            logger.info(f"Starting CSV processing. Data length: {len(csv_data)}")
-            csv_string = base64.b64decode(csv_data).decode('utf-8')
-            logger.debug(f"Decoded CSV data (first 100 chars): {csv_string[:100]}")
-            rows = list(csv.reader(csv_string.splitlines()))
-            logger.info(f"CSV processed successfully with {len(rows)} rows")
-            return rows[:2000]  # Limit the number of rows returned
+            document = extract_document(base64.b64decode(document_data), kind, self.document_max_chars, self.document_time_budget)
         except Exception as e:
-            logger.error(f"Error processing CSV: {str(e)}", exc_info=True)
+            logger.error(f"Error extracting {kind} file {file_name}: {e}", exc_info=not isinstance(e, ValueError))
+            return f"{kind.upper()} file {file_name} could not be read: {e}", 'error'
+        logger.info(f"{kind} extracted successfully: {document['parts']} parts, {len(document['text'])} characters, stopped: {document['stopped']}")
+        return render_document(kind, document), document['stopped']
+
+    def _document_cache_key(self, file):
+        file_data = file.get('data') or file.get('content')
+        kind = document_kind(file.get('type'), file.get('name', 'Unnamed file'))
+        if not kind or not isinstance(file_data, str):
             return None
+        return hashlib.sha256(f"{kind}:{file_data}".encode('utf-8')).hexdigest()
+
+    def _cached_document(self, file):
+        key = self._document_cache_key(file)
+        if key is None:
+            return None
+        with self._document_lock:
+            cached = self._document_cache.get(key)
+            if cached is None:
+                return None
+            self._document_cache.move_to_end(key)
+        logger.info(f"Using cached extraction for {file.get('name', 'Unnamed file')}")
+        # The text carries no file name, so the same bytes under another name reuse it.
+        return {**cached, 'name': file.get('name', 'Unnamed file')}
+
+    def _cache_document(self, file, processed_file):
+        key = self._document_cache_key(file)
+        if key is None or not processed_file:
+            return
+        # Failures and time-limited extractions depend on the moment, not the bytes; a retry may do better.
+        if processed_file.get('stopped') in ('error', 'time limit'):
+            return
+        with self._document_lock:
+            self._document_cache[key] = processed_file
+            while len(self._document_cache) > self.document_cache_size:
+                self._document_cache.popitem(last=False)
 
     def process_file(self, file):
         file_type = file.get('type')
@@ -50,6 +156,8 @@ class FileService:
         
         logger.info(f"File data found. Length: {len(file_data)}")
         
+        tabular = table_kind(file_type, file_name)
+        document = document_kind(file_type, file_name)
         try:
             if file_type == 'image':
                 processed_data = self.process_image(file_data)
@@ -64,15 +172,22 @@ class FileService:
                             'data': processed_data
                         }
                     }
-            elif file_type == 'csv':
-                csv_preview = self.process_csv(file_data)
-                if csv_preview:
-                    logger.info(f"CSV file processed successfully: {file_name}")
-                    return {
-                        'type': 'text',
-                        'name': file_name,
-                        'text': f"CSV Preview of {file_name}:\n{json.dumps(csv_preview, indent=2)}"
-                    }
+            elif tabular:
+                logger.info(f"Processing table file as {tabular}: {file_name}")
+                return {
+                    'type': 'text',
+                    'name': file_name,
+                    'text': self.process_table(file_data, tabular, file_name)
+                }
+            elif document:
+                logger.info(f"Processing document as {document}: {file_name}")
+                text, stopped = self.process_document(file_data, document, file_name)
+                return {
+                    'type': 'text',
+                    'name': file_name,
+                    'text': text,
+                    'stopped': stopped
+                }
             elif file_type in ['code', 'text'] or file_type is None:
                 return self.process_as_text(file)
             else:
@@ -82,20 +197,26 @@ class FileService:
             logger.error(f"Error processing file: {file_name}, Type: {file_type}, Error: {str(e)}", exc_info=True)
             return None
 
-    def process_as_text(self, file):
-        file_name = file.get('name', 'Unnamed file')
+    def extract_text(self, file):
+        if file.get('type') == 'image':
+            return None
+        if document_kind(file.get('type'), file.get('name', 'Unnamed file')):
+            processed_file = self.process_files([file])[0]
+            return processed_file['text'] if processed_file else None
         file_content = file.get('text') or file.get('content') or file.get('data') or ''
-        
-        logger.info(f"Processing as text: {file_name}. Content length: {len(file_content)}")
-        
         if isinstance(file_content, bytes):
-            file_content = file_content.decode('utf-8')
-        elif isinstance(file_content, str):
-            try:
-                file_content = base64.b64decode(file_content).decode('utf-8')
-                logger.info("Successfully decoded base64 content")
-            except:
-                logger.info("Content is not base64 encoded, using as-is")
+            return file_content.decode('utf-8')
+        try:
+            file_content = base64.b64decode(file_content).decode('utf-8')
+            logger.info("Successfully decoded base64 content")
+        except:
+            logger.info("Content is not base64 encoded, using as-is")
+        return file_content
+
+    def process_as_text(self, file):
+        file_name = file.get('name', 'Unnamed file')
+        logger.info(f"Processing as text: {file_name}")
+        file_content = self.extract_text(file) or ''
         
         logger.info(f"Text file processed successfully: {file_name}. Processed length: {len(file_content[:1000000])}")
         return {
@@ -0,0 +1,170 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+from werkzeug.exceptions import ServiceUnavailable
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+class Job:
+    def __init__(self, fn: Callable):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.status = 'queued'
+        self.result = None
+        self.error: Optional[str] = None
+        self.events: List[Dict] = []
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = False
+        self.condition = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def snapshot(self, after: int = 0) -> Dict:
+        with self.condition:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'result': self.result,
+                'error': self.error,
+                'events': self.events[after:],
+                'next': len(self.events)
+            }
+
+class JobQueue:
+    def __init__(self, max_workers: int = 4, max_queued: int = 32, retention_seconds: float = 600.0):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.counts = {'completed': 0, 'failed': 0, 'cancelled': 0, 'rejected': 0}
+
+    def submit(self, fn: Callable) -> Job:
+        # fn may return a value or an iterator of text chunks, which are published as progress.
+        with self._lock:
+            self._prune()
+            if self._pending >= self.max_workers + self.max_queued:
+                self.counts['rejected'] += 1
+                raise ServiceUnavailable(description="Job queue is full, please retry later")
+            job = Job(fn)
+            self._jobs[job.id] = job
+            self._pending += 1
+        self._executor.submit(self._run, job)
+        logger.info(f"Queued job {job.id}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job: Job, after: int = 0, timeout: float = 30.0) -> Dict:
+        # Long-poll: returns once the job has events past `after`, finishes, or the timeout expires.
+        with job.condition:
+            job.condition.wait_for(lambda: job.finished or len(job.events) > after, timeout)
+        return job.snapshot(after)
+
+    def iter_events(self, job: Job, after: int = 0, heartbeat: float = 15.0) -> Iterator[Optional[Dict]]:
+        # Yields None as a heartbeat while idle so the caller can keep the connection alive.
+        while True:
+            with job.condition:
+                job.condition.wait_for(lambda: job.finished or len(job.events) > after, heartbeat)
+                events = job.events[after:]
+                after = len(job.events)
+                finished = job.finished
+            if not events and not finished:
+                yield None
+            yield from events
+            if finished:
+                yield {'done': True, 'status': job.status, 'result': job.result, 'error': job.error}
+                return
+
+    def cancel(self, job: Job) -> Dict:
+        with job.condition:
+            if job.status == 'queued':
+                self._finish(job, 'cancelled')
+            elif job.status == 'running':
+                # Streaming jobs stop at the next chunk; a blocking call runs out but its result is dropped
+                # (callers check cancel_requested before storing it, as map-reduce chat does).
+                job.cancel_requested = True
+        logger.info(f"Cancellation requested for job {job.id}")
+        return job.snapshot(len(job.events))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            return {
+                'queued': statuses.count('queued'),
+                'running': statuses.count('running'),
+                'max_workers': self.max_workers,
+                'max_queued': self.max_queued,
+                **self.counts
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job):
+        try:
+            with job.condition:
+                if job.finished:
+                    return
+                job.status = 'running'
+                job.events.append({'status': 'running'})
+                job.condition.notify_all()
+            result = job.fn()
+            if isinstance(result, Iterator):
+                chunks = []
+                for chunk in result:
+                    if job.cancel_requested:
+                        close = getattr(result, 'close', None)
+                        if close:
+                            close()
+                        break
+                    chunks.append(chunk)
+                    with job.condition:
+                        job.events.append({'delta': chunk})
+                        job.condition.notify_all()
+                result = "".join(chunks)
+            with job.condition:
+                if job.cancel_requested:
+                    self._finish(job, 'cancelled')
+                elif isinstance(result, dict) and 'error' in result:
+                    self._finish(job, 'failed', error=result['error'])
+                else:
+                    self._finish(job, 'completed', result=result)
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+            with job.condition:
+                self._finish(job, 'failed', error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _finish(self, job: Job, status: str, result=None, error: Optional[str] = None):
+        # Called with job.condition held.
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        job.events.append({'status': status})
+        job.condition.notify_all()
+        with self._lock:
+            self.counts[status] += 1
+        logger.info(f"Job {job.id} {status}")
+
+    def _prune(self):
+        # Called with self._lock held.
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,44 @@
+import json
+import logging
+from typing import Any, Callable, Optional
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+def dumps(obj: Any, sort_keys: bool = False, default: Optional[Callable] = None) -> bytes:
+    # Compact UTF-8 bytes, ready to send as a request or response body without another encode.
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=default, option=option)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, sort_keys=sort_keys, default=default).encode('utf-8')
+
+def loads(data):
+    # Accepts bytes directly, so request and response bodies are never decoded to str first.
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class JSONProvider(DefaultJSONProvider):
+    # Flask's JSON provider (request.json, jsonify) backed by the fast codec.
+    # Calls with stdlib-specific options fall back to the default provider.
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, default=self.default).decode('utf-8')
+
+    def loads(self, s, **kwargs) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, default=self.default), mimetype=self.mimetype)
@@ -1,21 +1,38 @@
+import atexit
 import os
 import requests
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Iterator, Optional
 import logging
 import base64
 import time
-import json
+import hashlib
+from .assistant_registry import AssistantRegistry
+from .thread_sync import ThreadSync
+from .single_flight import SingleFlight
+from .thread_warm_pool import ThreadWarmPool
+from . import json_codec
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+DEFAULT_ASSISTANT_NAME = "Default Assistant"
+DEFAULT_ASSISTANT_INSTRUCTIONS = "You are a helpful assistant that can provide information and answer questions. ALWAYS respond in markdown format."
+
+# Returned to the user in place of a model reply when a provider call fails.
+REQUEST_ERROR_REPLY = "I'm sorry, but I experienced an error while processing your request. Please try again later."
+PARSE_ERROR_REPLY = "I apologize, but I had trouble understanding the response. Could you please rephrase your question?"
+UNEXPECTED_RESPONSE_REPLY = "I apologize, but I encountered an unexpected response. Please try again."
+ERROR_REPLIES = frozenset((REQUEST_ERROR_REPLY, PARSE_ERROR_REPLY, UNEXPECTED_RESPONSE_REPLY))
+
 class LLMService:
-    def __init__(self):
+    def __init__(self, registry=None):
         logger.info("Initializing LLMService")
         self.claude_api_key = os.getenv('CLAUDE_API_KEY')
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         self.claude_api_url = 'https://api.anthropic.com/v1/messages'
-        self.openai_chat_url = 'https://api.openai.com/v1/chat/completions'
+        # Any OpenAI-compatible server (e.g. a local inference server) can serve chat completions.
+        self.openai_base_url = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
+        self.openai_chat_url = f'{self.openai_base_url}/chat/completions'
         self.openai_files_url = 'https://api.openai.com/v1/files'
         self.openai_assistants_url = 'https://api.openai.com/v1/assistants'
         self.openai_threads_url = 'https://api.openai.com/v1/threads'
@@ -25,33 +42,70 @@ class LLMService:
             'claude-3-sonnet-20240229'
         ]
         self.current_model = 'claude-3-sonnet-20240229'
+        # Resolved once so per-request model selection is a dictionary lookup.
+        self.model_providers = {model: self._provider_for(model) for model in self.available_models}
+        self._provider_backends = {
+            'openai': ('call_openai_chat', 'stream_openai_chat'),
+            'anthropic': ('call_claude', None)
+        }
         self.default_max_tokens = 4096
-        self.openai_assistant_id = None
-        self.openai_thread_id = None
+        self.registry = registry or AssistantRegistry()
+        self.thread_sync = ThreadSync(self.openai_threads_url)
+        self.single_flight = SingleFlight()
+        self.thread_pool = ThreadWarmPool(
+            self._create_thread,
+            size=int(os.getenv('OPENAI_THREAD_POOL_SIZE', 2)),
+            max_age=float(os.getenv('OPENAI_THREAD_MAX_AGE', 24 * 3600)),
+            discard=self._delete_thread,
+            warm_up=self._warm_default_assistants
+        )
+        if self.openai_api_key:
+            # The only place the pool starts; without a key it would just fail every refill.
+            self.thread_pool.start()
+            atexit.register(self.thread_pool.shutdown)
         logger.info(f"Initial model set to: {self.current_model}")
         logger.debug(f"Claude API Key present: {'Yes' if self.claude_api_key else 'No'}")
         logger.debug(f"OpenAI API Key present: {'Yes' if self.openai_api_key else 'No'}")
 
     def set_model(self, model: str):
-        logger.info(f"Attempting to set model to: {model}")
-        if model in self.available_models:
-            self.current_model = model
-            logger.info(f"Model successfully set to: {self.current_model}")
-            if model.startswith('gpt'):
-                self._create_or_get_assistant()
-                self._create_or_get_thread()
-        else:
+        # Only changes the default; requests that pass a model never touch shared state.
+        logger.info(f"Attempting to set default model to: {model}")
+        if not model:
+            raise ValueError("Unsupported model: None")
+        self.current_model = self.resolve_model(model)
+        logger.info(f"Default model successfully set to: {self.current_model}")
+
+    @staticmethod
+    def _provider_for(model: str) -> Optional[str]:
+        if model.startswith('gpt'):
+            return 'openai'
+        if model.startswith('claude'):
+            return 'anthropic'
+        return None
+
+    def resolve_model(self, model: str = None) -> str:
+        model = model or self.current_model
+        if self.model_providers.get(model) is None:
             logger.error(f"Unsupported model: {model}")
             raise ValueError(f"Unsupported model: {model}")
+        return model
+
+    def provider_for(self, model: str = None) -> str:
+        return self.model_providers[self.resolve_model(model)]
 
-    def create_assistant(self, name, instructions):
+    def create_assistant(self, name, instructions, model: str = None):
+        model = self.resolve_model(model)
+        existing_id = self.registry.get_assistant(model, name, instructions)
+        if existing_id:
+            logger.info(f"Reusing registered assistant {existing_id} for name: {name}")
+            return existing_id
         headers = {
             'Authorization': f'Bearer {self.openai_api_key}',
             'Content-Type': 'application/json',
             'OpenAI-Beta': 'assistants=v1'
         }
         data = {
-            'model': self.current_model,
+            'model': model,
             'name': name,
             'instructions': instructions,
             'tools': [{'type': 'retrieval'}],
@@ -64,6 +118,7 @@ class LLMService:
             assistant_data = response.json()
             assistant_id = assistant_data['id']
             logger.info(f"Created new OpenAI Assistant with ID: {assistant_id}")
+            self.registry.save_assistant(model, name, instructions, assistant_id)
             return assistant_id
         except requests.RequestException as e:
             logger.error(f"Error creating OpenAI Assistant: {e}", exc_info=True)
@@ -71,81 +126,229 @@ class LLMService:
                 logger.error(f"Response content: {e.response.content}")
             raise
 
-    def _create_or_get_assistant(self):
-        if not self.openai_assistant_id:
-            logger.info("Creating or retrieving default assistant")
-            self.openai_assistant_id = self.create_assistant(
-                "Default Assistant",
-                "You are a helpful assistant that can provide information and answer questions. ALWAYS respond in markdown format."
-            )
-        return self.openai_assistant_id
+    def _create_or_get_assistant(self, model: str = None):
+        return self.create_assistant(DEFAULT_ASSISTANT_NAME, DEFAULT_ASSISTANT_INSTRUCTIONS, model)
 
-    def _create_or_get_thread(self):
-        if not self.openai_thread_id:
+    def _warm_default_assistants(self):
+        # The first assistant turn would otherwise create the default assistant inline; registered ones are skipped.
+        for model, provider in self.model_providers.items():
+            if provider != 'openai':
+                continue
             try:
-                headers = {
-                    'Authorization': f'Bearer {self.openai_api_key}',
-                    'Content-Type': 'application/json',
-                    'OpenAI-Beta': 'assistants=v1'
-                }
-                response = requests.post(self.openai_threads_url, headers=headers, json={})
-                response.raise_for_status()
-                self.openai_thread_id = response.json()['id']
-                logger.info(f"Created new thread with ID: {self.openai_thread_id}")
-            except requests.RequestException as e:
-                logger.error(f"Error creating thread: {str(e)}")
-                raise
-        return self.openai_thread_id
+                self._create_or_get_assistant(model)
+            except Exception as e:
+                # One unavailable model must not stop the others from being warmed.
+                logger.warning(f"Failed to pre-create default assistant for {model}: {e}")
+
+    def _create_or_get_thread(self, session_id: str = 'default'):
+        thread_id = self.registry.get_thread(session_id)
+        if not thread_id:
+            thread_id = self.thread_pool.take() or self._create_thread()
+            self.registry.save_thread(session_id, thread_id)
+        return thread_id
 
-    def call_llm(self, messages: List[Dict[str, str]], files: List[Dict] = None, assistant_id: str = None, max_tokens: int = None) -> Optional[str]:
+    def _create_thread(self) -> str:
         try:
-            logger.info(f"Calling LLM with model: {self.current_model}")
-            logger.debug(f"Messages: {messages}")
-            logger.debug(f"Files: {files}")
-            logger.debug(f"Max tokens: {max_tokens}")
-            if assistant_id or self.current_model.startswith('gpt'):
-                return self.call_openai_assistant(messages, files, assistant_id)
-            elif self.current_model.startswith('claude'):
-                return self.call_claude(messages, files, max_tokens)
-            else:
-                logger.error(f"Unknown model type: {self.current_model}")
-                raise ValueError(f"Unknown model type: {self.current_model}")
+            headers = {
+                'Authorization': f'Bearer {self.openai_api_key}',
+                'Content-Type': 'application/json',
+                'OpenAI-Beta': 'assistants=v1'
+            }
+            response = requests.post(self.openai_threads_url, headers=headers, json={}, timeout=30)
+            response.raise_for_status()
+            thread_id = response.json()['id']
+            logger.info(f"Created new thread with ID: {thread_id}")
+            return thread_id
+        except requests.RequestException as e:
+            logger.error(f"Error creating thread: {str(e)}")
+            raise
+
+    def _delete_thread(self, thread_id: str):
+        headers = {
+            'Authorization': f'Bearer {self.openai_api_key}',
+            'OpenAI-Beta': 'assistants=v1'
+        }
+        response = requests.delete(f"{self.openai_threads_url}/{thread_id}", headers=headers, timeout=30)
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    def call_llm(self, messages: List[Dict[str, str]], files: List[Dict] = None, assistant_id: str = None, max_tokens: int = None, session_id: str = 'default', model: str = None) -> Optional[str]:
+        try:
+            model = self.resolve_model(model)
+            logger.info(f"Calling LLM with model: {model}")
+            # Sizes only: messages and files can carry megabytes of base64, and this module logs at DEBUG.
+            logger.debug("Messages: %d, files: %d, max tokens: %s", len(messages), len(files or []), max_tokens)
+            if assistant_id:
+                return self.call_openai_assistant(messages, files, assistant_id, session_id, model)
+            call_backend, _ = self._provider_backends[self.model_providers[model]]
+            # Stateless backends only: identical concurrent requests share one generation.
+            key = self._request_key('call', model, messages, files, max_tokens)
+            return self.single_flight.do(key, lambda: getattr(self, call_backend)(messages, files, max_tokens, model))
         except Exception as e:
             logger.error(f"Error during LLM call: {e}", exc_info=True)
             raise
 
-    def call_claude(self, messages: List[Dict[str, str]], files: List[Dict] = None, max_tokens: int = None) -> Optional[str]:
+    def stream_llm(self, messages: List[Dict[str, str]], files: List[Dict] = None, assistant_id: str = None, max_tokens: int = None, session_id: str = 'default', model: str = None) -> Iterator[str]:
+        model = self.resolve_model(model)
+        _, stream_backend = self._provider_backends[self.model_providers[model]]
+        if not assistant_id and stream_backend:
+            key = self._request_key('stream', model, messages, files, max_tokens)
+            return self.single_flight.do_stream(key, lambda: getattr(self, stream_backend)(messages, files, max_tokens, model))
+        # Backends without incremental output yield the whole answer as one chunk.
+        return iter([self.call_llm(messages, files, assistant_id, max_tokens, session_id, model) or ''])
+
+    def measure_llm(self, messages: List[Dict[str, str]], files: List[Dict] = None, max_tokens: int = None, model: str = None, on_delta: Optional[Callable[[str], None]] = None) -> Dict:
+        # Bypasses single-flight so each measurement reflects its own upstream call.
+        model = self.resolve_model(model)
+        call_backend, stream_backend = self._provider_backends[self.model_providers[model]]
+        usage = {}
+        ttfb = None
+        started = time.perf_counter()
+        if stream_backend:
+            chunks = []
+            for chunk in getattr(self, stream_backend)(messages, files, max_tokens, model, usage=usage):
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+                chunks.append(chunk)
+                if on_delta:
+                    on_delta(chunk)
+            response = "".join(chunks)
+        else:
+            response = getattr(self, call_backend)(messages, files, max_tokens, model, usage=usage)
+            if on_delta and response:
+                on_delta(response)
+        latency = time.perf_counter() - started
+        return {
+            'model': model,
+            'response': response,
+            'latency_ms': round(latency * 1000, 1),
+            # Without incremental output the first byte arrives with the full answer.
+            'ttfb_ms': round((ttfb if ttfb is not None else latency) * 1000, 1),
+            'usage': usage
+        }
+
+    @staticmethod
+    def _request_key(kind: str, model: str, messages: List[Dict], files: Optional[List[Dict]], max_tokens: Optional[int]) -> str:
+        canonical = json_codec.dumps([kind, model, messages, files or [], max_tokens], sort_keys=True)
+        return hashlib.sha256(canonical).hexdigest()
+
+    def _openai_chat_payload(self, messages: List[Dict[str, str]], files: List[Dict] = None, max_tokens: int = None, model: str = None, stream: bool = False) -> Dict:
+        chat_messages = [{'role': 'system', 'content': DEFAULT_ASSISTANT_INSTRUCTIONS}]
+        chat_messages.extend({'role': message['role'], 'content': message['content']} for message in messages)
+        images = [file for file in files or [] if file.get('type') == 'image' and 'source' in file]
+        if images and chat_messages[-1]['role'] == 'user':
+            content = [{'type': 'text', 'text': chat_messages[-1]['content']}]
+            content.extend(
+                {'type': 'image_url', 'image_url': {'url': f"data:{image['source']['media_type']};base64,{image['source']['data']}"}}
+                for image in images
+            )
+            chat_messages[-1] = {'role': 'user', 'content': content}
+        payload = {
+            'model': model or self.current_model,
+            'messages': chat_messages,
+            'max_tokens': max_tokens or self.default_max_tokens
+        }
+        if stream:
+            payload['stream'] = True
+        return payload
+
+    def call_openai_chat(self, messages: List[Dict[str, str]], files: List[Dict] = None, max_tokens: int = None, model: str = None, usage: Optional[Dict] = None) -> Optional[str]:
+        headers = {
+            'Authorization': f'Bearer {self.openai_api_key}',
+            'Content-Type': 'application/json'
+        }
+        payload = self._openai_chat_payload(messages, files, max_tokens, model)
+
+        try:
+            logger.info(f"Sending request to OpenAI Chat Completions at {self.openai_chat_url}")
+            # Pre-serialized bytes; requests would otherwise re-encode the base64 images with the stdlib.
+            response = requests.post(self.openai_chat_url, data=json_codec.dumps(payload), headers=headers)
+            response.raise_for_status()
+            logger.info("Successfully received response from OpenAI Chat Completions")
+            response_data = json_codec.loads(response.content)
+            if usage is not None:
+                self._record_openai_usage(response_data, usage)
+            return response_data['choices'][0]['message']['content']
+        except (requests.RequestException, ValueError) as e:
+            # ValueError: the body was not JSON (e.g. an HTML error page from a proxy).
+            logger.error(f"Error calling OpenAI Chat Completions: {e}", exc_info=True)
+            return REQUEST_ERROR_REPLY
+        except (KeyError, IndexError) as e:
+            logger.error(f"Error parsing OpenAI Chat Completions response: {e}", exc_info=True)
+            return PARSE_ERROR_REPLY
+
+    def stream_openai_chat(self, messages: List[Dict[str, str]], files: List[Dict] = None, max_tokens: int = None, model: str = None, usage: Optional[Dict] = None) -> Iterator[str]:
+        headers = {
+            'Authorization': f'Bearer {self.openai_api_key}',
+            'Content-Type': 'application/json'
+        }
+        payload = self._openai_chat_payload(messages, files, max_tokens, model, stream=True)
+        if usage is not None:
+            # Usage arrives in a final chunk with no choices.
+            payload['stream_options'] = {'include_usage': True}
+
+        logger.info(f"Streaming request to OpenAI Chat Completions at {self.openai_chat_url}")
+        with requests.post(self.openai_chat_url, data=json_codec.dumps(payload), headers=headers, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data: '):
+                    continue
+                data = line[len('data: '):]
+                if data == '[DONE]':
+                    break
+                event = json_codec.loads(data)
+                if usage is not None and event.get('usage'):
+                    self._record_openai_usage(event, usage)
+                choices = event.get('choices') or []
+                delta = choices[0].get('delta', {}).get('content') if choices else None
+                if delta:
+                    yield delta
+        logger.info("Finished streaming response from OpenAI Chat Completions")
+
+    @staticmethod
+    def _record_openai_usage(response_data: Dict, usage: Dict):
+        reported = response_data.get('usage') or {}
+        usage['input_tokens'] = reported.get('prompt_tokens')
+        usage['output_tokens'] = reported.get('completion_tokens')
+
+    def call_claude(self, messages: List[Dict[str, str]], files: List[Dict] = None, max_tokens: int = None, model: str = None, usage: Optional[Dict] = None) -> Optional[str]:
         headers = {
             'Content-Type': 'application/json',
             'anthropic-version': '2023-06-01',
             'x-api-key': self.claude_api_key,
         }
         payload = {
-            'model': self.current_model,
+            'model': model or self.current_model,
             'max_tokens': max_tokens or self.default_max_tokens,
             'messages': messages
         }
         
         try:
-            logger.info(f"Sending request to Claude API with payload: {payload}")
-            response = requests.post(self.claude_api_url, json=payload, headers=headers)
+            logger.info(f"Sending request to Claude API with {len(messages)} messages")
+            body = json_codec.dumps(payload)
+            logger.debug("Claude API payload: %d bytes", len(body))
+            response = requests.post(self.claude_api_url, data=body, headers=headers)
             response.raise_for_status()
             logger.info("Successfully received response from Claude API")
-            response_data = response.json()
+            response_data = json_codec.loads(response.content)
+            if usage is not None:
+                reported = response_data.get('usage') or {}
+                usage['input_tokens'] = reported.get('input_tokens')
+                usage['output_tokens'] = reported.get('output_tokens')
             
             if 'content' in response_data and response_data['content']:
                 return response_data['content'][0]['text']
             else:
                 logger.error(f"Unexpected response structure from Claude API: {response_data}")
-                return "I apologize, but I encountered an unexpected response. Please try again."
-        except requests.RequestException as e:
+                return UNEXPECTED_RESPONSE_REPLY
+        except (requests.RequestException, ValueError) as e:
             logger.error(f"Error calling Claude API: {e}", exc_info=True)
-            return "I'm sorry, but I experienced an error while processing your request. Please try again later."
+            return REQUEST_ERROR_REPLY
         except (KeyError, IndexError) as e:
             logger.error(f"Error parsing Claude API response: {e}", exc_info=True)
-            return "I apologize, but I had trouble understanding the response. Could you please rephrase your question?"
+            return PARSE_ERROR_REPLY
 
-    def call_openai_assistant(self, messages, files=None, assistant_id=None):
+    def call_openai_assistant(self, messages, files=None, assistant_id=None, session_id='default', model=None):
         try:
             headers = {
                 'Authorization': f'Bearer {self.openai_api_key}',
@@ -153,11 +356,6 @@ class LLMService:
                 'OpenAI-Beta': 'assistants=v1'
             }
 
-            if not assistant_id:
-                assistant_id = self._create_or_get_assistant()
-
-            thread_id = self._create_or_get_thread()
-
             new_message = messages[-1]
             message_data = {
                 'role': new_message['role'],
@@ -165,23 +363,8 @@ class LLMService:
             }
             if files:
                 message_data['file_ids'] = self.upload_files_to_openai(files)
-            
-            logger.info(f"Sending message to OpenAI thread")
-            logger.debug(f"OpenAI message data: {json.dumps(message_data, indent=2)}")
-            
-            message_url = f"{self.openai_threads_url}/{thread_id}/messages"
-            response = requests.post(message_url, headers=headers, json=message_data)
-            response.raise_for_status()
 
-            run_url = f"{self.openai_threads_url}/{thread_id}/runs"
-            run_data = {'assistant_id': assistant_id}
-            
-            logger.info(f"Running OpenAI assistant")
-            logger.debug(f"OpenAI run data: {json.dumps(run_data, indent=2)}")
-            
-            response = requests.post(run_url, headers=headers, json=run_data)
-            response.raise_for_status()
-            run_id = response.json()['id']
+            thread_id, run_url, run_id = self._start_assistant_run(headers, message_data, assistant_id, session_id, model)
 
             while True:
                 status_url = f"{run_url}/{run_id}"
@@ -196,13 +379,10 @@ class LLMService:
                     return None
                 time.sleep(1)
 
-            messages_url = f"{self.openai_threads_url}/{thread_id}/messages"
-            response = requests.get(messages_url, headers=headers)
-            response.raise_for_status()
-            assistant_message = response.json()['data'][0]['content'][0]['text']['value']
+            assistant_message = self.thread_sync.fetch_run_reply(headers, thread_id, run_id)
             
             logger.info("Successfully received response from OpenAI Assistant")
-            logger.debug(f"OpenAI Assistant response: {assistant_message}")
+            logger.debug("OpenAI Assistant response: %d characters", len(assistant_message or ''))
 
             return assistant_message
 
@@ -213,6 +393,43 @@ class LLMService:
             logger.error(f"Unexpected error in call_openai_assistant: {str(e)}", exc_info=True)
             raise
 
+    def _start_assistant_run(self, headers, message_data, assistant_id, session_id, model=None):
+        # Registered IDs are trusted without a validation round-trip; if one was
+        # deleted remotely it is dropped and re-created once.
+        posted = False
+        for attempt in range(2):
+            run_assistant_id = assistant_id or self._create_or_get_assistant(model)
+            # Once the message is on the thread, a retry only re-creates the assistant and the run.
+            if not posted:
+                thread_id = self._create_or_get_thread(session_id)
+
+                logger.info(f"Sending message to OpenAI thread")
+                logger.debug("OpenAI message data: %d characters, %d files", len(message_data['content']), len(message_data.get('file_ids', [])))
+
+                message_url = f"{self.openai_threads_url}/{thread_id}/messages"
+                response = requests.post(message_url, headers=headers, json=message_data)
+                if response.status_code == 404 and attempt == 0:
+                    logger.warning(f"Thread {thread_id} no longer exists; re-creating")
+                    self.registry.invalidate_thread(session_id)
+                    self.thread_sync.forget(thread_id)
+                    continue
+                response.raise_for_status()
+                posted = True
+
+            run_url = f"{self.openai_threads_url}/{thread_id}/runs"
+            run_data = {'assistant_id': run_assistant_id}
+
+            logger.info(f"Running OpenAI assistant")
+            logger.debug("OpenAI run data: %s", run_data)
+
+            response = requests.post(run_url, headers=headers, json=run_data)
+            if response.status_code == 404 and attempt == 0 and not assistant_id:
+                logger.warning(f"Assistant {run_assistant_id} no longer exists; re-creating")
+                self.registry.invalidate_assistant(run_assistant_id)
+                continue
+            response.raise_for_status()
+            return thread_id, run_url, response.json()['id']
+
     def upload_files_to_openai(self, files: List[Dict]) -> List[str]:
         file_ids = []
         for file in files:
@@ -232,7 +449,7 @@ class LLMService:
             }
             try:
                 logger.info(f"Uploading file to OpenAI: {file['name']}")
-                logger.debug(f"File upload data: {json.dumps(data, indent=2)}")
+                logger.debug("File upload data: %s", data)
                 response = requests.post(
                     self.openai_files_url,
                     headers={'Authorization': f'Bearer {self.openai_api_key}'},
@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from .document_index import chunk_text
+from .llm_service import ERROR_REPLIES, REQUEST_ERROR_REPLY
+
+logger = logging.getLogger(__name__)
+
+# Bump when MAP_PROMPT changes so cached notes from the old prompt are not reused.
+MAP_PROMPT_VERSION = 1
+MAP_PROMPT = (
+    "Below is part {part} of {parts} of the document \"{name}\". Write dense notes capturing every fact, "
+    "figure, name, date, definition and claim in it so that questions about the document can later be "
+    "answered from your notes alone. Do not add commentary.\n\n{text}"
+)
+COMBINE_PROMPT = (
+    "Merge the following notes into one set of dense notes without losing any facts, figures or names.\n\n{notes}"
+)
+REDUCE_PROMPT = (
+    "The notes below were extracted from the attached documents, part by part. Using only these notes, "
+    "answer the question. If the notes do not contain the answer, say so.\n\n{notes}\n\nQuestion: {question}"
+)
+
+class MapReduceProcessor:
+    def __init__(self, llm_service, chunk_chars: int = 48000, max_concurrency: int = 4, cache_size: int = 1024):
+        self.llm_service = llm_service
+        self.chunk_chars = chunk_chars
+        self.max_concurrency = max_concurrency
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Shared across requests so total in-flight chunk calls stay bounded.
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='map-reduce')
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def run(self, question: str, documents: List[Tuple[str, str]], model: Optional[str] = None) -> str:
+        tasks = []
+        for name, text in documents:
+            chunks = chunk_text(text, self.chunk_chars)
+            tasks.extend((name, index + 1, len(chunks), chunk) for index, chunk in enumerate(chunks))
+        logger.info(f"Map-reduce over {len(documents)} documents in {len(tasks)} chunks")
+
+        notes = list(self._executor.map(lambda task: self._map_chunk(*task, model=model), tasks))
+        # A failed chunk is left out rather than passing the provider's apology off as notes.
+        notes = [note for note in notes if note is not None]
+
+        # Combine notes in context-sized groups until they fit a single reduce call.
+        while len(notes) > 1 and sum(len(note) for note in notes) > self.chunk_chars:
+            groups = self._group(notes)
+            if len(groups) == len(notes):
+                break
+            logger.info(f"Combining {len(notes)} partial notes into {len(groups)} groups")
+            combined = self._executor.map(
+                lambda group: self._call(COMBINE_PROMPT.format(notes="\n\n".join(group)), model), groups
+            )
+            notes = [note for note in combined if note is not None]
+
+        answer = self._call(REDUCE_PROMPT.format(notes="\n\n".join(notes), question=question), model)
+        return answer if answer is not None else REQUEST_ERROR_REPLY
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'cached_chunks': len(self._cache),
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses
+            }
+
+    def _map_chunk(self, name: str, part: int, parts: int, text: str, model: Optional[str] = None) -> Optional[str]:
+        # Notes are question-independent, so follow-up questions only pay for the reduce call.
+        key = hashlib.sha256(f"{MAP_PROMPT_VERSION}:{model}:{text}".encode('utf-8')).hexdigest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+
+        note = self._call(MAP_PROMPT.format(part=part, parts=parts, name=name, text=text), model)
+        if note is not None:
+            with self._lock:
+                self._cache[key] = note
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return note
+
+    def _call(self, prompt: str, model: Optional[str]) -> Optional[str]:
+        # None means the provider call failed, so callers never cache or combine an error reply.
+        reply = self.llm_service.call_llm([{'role': 'user', 'content': prompt}], model=model)
+        if reply is None or reply in ERROR_REPLIES:
+            return None
+        return reply
+
+    def _group(self, notes: List[str]) -> List[List[str]]:
+        groups = [[]]
+        size = 0
+        for note in notes:
+            if groups[-1] and size + len(note) > self.chunk_chars:
+                groups.append([])
+                size = 0
+            groups[-1].append(note)
+            size += len(note)
+        return groups
@@ -0,0 +1,106 @@
+import sys
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional, Tuple
+
+_PART_FIELDS = ('type', 'text', 'name', 'media_type', 'blob_ref', 'indexed')
+
+class ContentPart(Mapping):
+    # Read-only mapping over slots, so code written against the old dict parts keeps working.
+    __slots__ = _PART_FIELDS + ('extra',)
+
+    def __init__(self, type: str, text: Optional[str] = None, name: Optional[str] = None,
+                 media_type: Optional[str] = None, blob_ref: Optional[str] = None,
+                 indexed: bool = False, extra: Optional[Dict] = None):
+        # Types and media types come from a tiny vocabulary, so every part shares one copy.
+        self.type = sys.intern(type)
+        self.text = text
+        self.name = name
+        self.media_type = sys.intern(media_type) if media_type else None
+        self.blob_ref = blob_ref
+        self.indexed = indexed
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, part: Dict) -> 'ContentPart':
+        if isinstance(part, ContentPart):
+            return part
+        known = {key: part[key] for key in _PART_FIELDS if key in part}
+        extra = {key: value for key, value in part.items() if key not in _PART_FIELDS}
+        return cls(extra=extra, **known)
+
+    def __getitem__(self, key: str):
+        if key in _PART_FIELDS:
+            value = getattr(self, key)
+            if value is not None and value is not False:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in _PART_FIELDS:
+            value = getattr(self, key)
+            if value is not None and value is not False:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"ContentPart({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict:
+        return {key: self[key] for key in self}
+
+class Message(Mapping):
+    __slots__ = ('role', 'content')
+
+    def __init__(self, role: str, content: Tuple[ContentPart, ...]):
+        self.role = sys.intern(role)
+        self.content = content
+
+    @classmethod
+    def from_dict(cls, message: Dict) -> 'Message':
+        if isinstance(message, Message):
+            return message
+        return cls(message['role'], tuple(ContentPart.from_dict(part) for part in message['content']))
+
+    @property
+    def text(self) -> str:
+        return self.content[0].text or '' if self.content else ''
+
+    def __getitem__(self, key: str):
+        if key == 'role':
+            return self.role
+        if key == 'content':
+            return self.content
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(('role', 'content'))
+
+    def __len__(self) -> int:
+        return 2
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Mapping):
+            return self.to_dict() == (other.to_dict() if isinstance(other, Message) else dict(other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Message({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict:
+        # Materialized on demand (persistence, exports); never kept on the message.
+        return {'role': self.role, 'content': [part.to_dict() for part in self.content]}
@@ -0,0 +1,97 @@
+import logging
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+from werkzeug.exceptions import Conflict
+
+logger = logging.getLogger(__name__)
+
+class ModelComparison:
+    def __init__(self, llm_service, file_service, resolve_ref: Optional[Callable[[str], Dict]] = None, max_workers: int = 8):
+        self.llm_service = llm_service
+        self.file_service = file_service
+        # Turns an attachment reference into its processed file, raising Conflict when it is unknown.
+        self.resolve_ref = resolve_ref
+        # Shared across requests; each comparison needs one worker per model to finish in the slowest model's time.
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='compare')
+
+    def resolve_models(self, models: Optional[List[str]]) -> List[str]:
+        if not models:
+            raise ValueError("At least one model is required for comparison")
+        resolved = []
+        for model in models:
+            model = self.llm_service.resolve_model(model)
+            if model not in resolved:
+                resolved.append(model)
+        return resolved
+
+    def prepare(self, message: str, files: List[Dict]):
+        # Attachments are processed once and the same prompt is sent to every model.
+        processed_files = []
+        if files:
+            refs = [file['ref'] for file in files if 'ref' in file]
+            if refs and self.resolve_ref is None:
+                raise Conflict(f"Unknown attachment references: {', '.join(refs)}")
+            resolved = {ref: self.resolve_ref(ref) for ref in refs}
+            uploads = [file for file in files if 'ref' not in file]
+            processed_uploads = iter(self.file_service.process_files(uploads) if uploads else [])
+            for file in files:
+                processed_file = resolved[file['ref']] if 'ref' in file else next(processed_uploads)
+                if processed_file:
+                    processed_files.append(processed_file)
+                else:
+                    logger.warning(f"Failed to process file: {file.get('name', 'Unnamed file')}")
+        text = message or ''
+        attachments = [
+            f"File: {file.get('name', 'Unnamed file')}\nContent: {file['text']}"
+            for file in processed_files if file.get('type') == 'text'
+        ]
+        if attachments:
+            text += "\n\nAttached files:\n" + "\n".join(attachments)
+        return [{'role': 'user', 'content': text}], processed_files
+
+    def compare(self, message: str, files: List[Dict], models: List[str]) -> Dict:
+        models = self.resolve_models(models)
+        messages, processed_files = self.prepare(message, files)
+        logger.info(f"Comparing {len(models)} models: {', '.join(models)}")
+        started = time.perf_counter()
+        futures = [self._executor.submit(self._measure, messages, processed_files, model) for model in models]
+        results = [future.result() for future in futures]
+        return {
+            'results': results,
+            'wall_time_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+
+    def stream_compare(self, message: str, files: List[Dict], models: List[str]) -> Iterator[Dict]:
+        models = self.resolve_models(models)
+        messages, processed_files = self.prepare(message, files)
+        logger.info(f"Streaming comparison of {len(models)} models: {', '.join(models)}")
+        return self._iter_events(messages, processed_files, models)
+
+    def _iter_events(self, messages: List[Dict], processed_files: List[Dict], models: List[str]) -> Iterator[Dict]:
+        events = queue.Queue()
+        started = time.perf_counter()
+
+        def run(model):
+            result = self._measure(messages, processed_files, model,
+                                   on_delta=lambda chunk: events.put({'model': model, 'delta': chunk}))
+            events.put({'model': model, 'result': result})
+
+        for model in models:
+            self._executor.submit(run, model)
+        remaining = len(models)
+        while remaining:
+            event = events.get()
+            if 'result' in event:
+                remaining -= 1
+            yield event
+        yield {'done': True, 'wall_time_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+    def _measure(self, messages: List[Dict], processed_files: List[Dict], model: str, on_delta=None) -> Dict:
+        # A failing model is reported in its own result rather than failing the comparison.
+        try:
+            return self.llm_service.measure_llm(messages, processed_files, model=model, on_delta=on_delta)
+        except Exception as e:
+            logger.error(f"Error comparing model {model}: {e}", exc_info=True)
+            return {'model': model, 'error': str(e)}
@@ -0,0 +1,192 @@
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@lru_cache(maxsize=4096)
+def module_for_filename(filename: str) -> str:
+    # services/file_service.py -> services.file_service; site-packages and stdlib resolve against sys.path.
+    path = os.path.abspath(filename)
+    roots = sorted({_PROJECT_ROOT, *(os.path.abspath(entry) for entry in sys.path if entry)}, key=len, reverse=True)
+    for root in roots:
+        if path.startswith(root + os.sep):
+            module = os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, '.')
+            return module[:-len('.__init__')] if module.endswith('.__init__') else module
+    return filename
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    # Follows containers and __slots__ objects; shared objects are counted once.
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    for cls in type(obj).__mro__:
+        for slot in getattr(cls, '__slots__', ()):
+            if hasattr(obj, slot):
+                size += deep_sizeof(getattr(obj, slot), seen)
+    if hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.01, max_seconds: float = 300.0):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: Optional[float] = None, max_seconds: Optional[float] = None) -> Dict:
+        if self.running:
+            raise ValueError("Profiler is already running")
+        self.interval = max(interval or self.interval, 0.001)
+        self.max_seconds = max_seconds or self.max_seconds
+        with self._lock:
+            self._stacks = Counter()
+            self._samples = 0
+        self._stop.clear()
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        logger.info(f"Sampling profiler started (interval {self.interval}s, max {self.max_seconds}s)")
+        return self.status()
+
+    def stop(self) -> Dict:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        logger.info(f"Sampling profiler stopped after {self._samples} samples")
+        return self.status()
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'running': self.running,
+                'interval': self.interval,
+                'samples': self._samples,
+                'stacks': len(self._stacks)
+            }
+
+    def folded(self) -> str:
+        # Brendan Gregg's folded format: "thread;outer;...;inner count", one stack per line.
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def _run(self):
+        own_id = threading.get_ident()
+        deadline = self._started_at + self.max_seconds
+        # Waiting on the event rather than sleeping keeps stop() prompt.
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > deadline:
+                logger.info("Sampling profiler reached its time limit")
+                break
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(f"{module_for_filename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                stacks.append(";".join(reversed(frames)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self._samples += 1
+
+class MemoryProfiler:
+    def __init__(self, frames: int = 1):
+        self.frames = frames
+        self._snapshots: List[tracemalloc.Snapshot] = []
+        self._lock = threading.Lock()
+
+    def snapshot(self, limit: int = 20) -> Dict:
+        # Tracing starts with the first snapshot; its overhead applies only until stop().
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logger.info("tracemalloc started")
+        snapshot = self._filtered(tracemalloc.take_snapshot())
+        with self._lock:
+            self._snapshots = (self._snapshots + [snapshot])[-2:]
+        stats = self._by_module(snapshot.statistics('filename'))
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            'traced_bytes': current,
+            'peak_bytes': peak,
+            'modules': [{'module': module, 'size': size, 'count': count} for module, size, count in stats[:limit]]
+        }
+
+    def diff(self, limit: int = 20) -> Dict:
+        with self._lock:
+            if len(self._snapshots) < 2:
+                raise ValueError("Take at least two snapshots before diffing")
+            previous, latest = self._snapshots
+        grouped: Dict[str, List[int]] = {}
+        for stat in latest.compare_to(previous, 'filename'):
+            module = module_for_filename(stat.traceback[0].filename)
+            totals = grouped.setdefault(module, [0, 0])
+            totals[0] += stat.size_diff
+            totals[1] += stat.count_diff
+        ranked = sorted(grouped.items(), key=lambda item: abs(item[1][0]), reverse=True)
+        return {
+            'modules': [{'module': module, 'size_diff': size, 'count_diff': count} for module, (size, count) in ranked[:limit]]
+        }
+
+    def stop(self) -> Dict:
+        with self._lock:
+            self._snapshots = []
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc stopped")
+        return {'tracing': False}
+
+    def _by_module(self, statistics) -> List:
+        grouped: Dict[str, List[int]] = {}
+        for stat in statistics:
+            totals = grouped.setdefault(module_for_filename(stat.traceback[0].filename), [0, 0])
+            totals[0] += stat.size
+            totals[1] += stat.count
+        return sorted(((module, size, count) for module, (size, count) in grouped.items()), key=lambda item: item[1], reverse=True)
+
+    @staticmethod
+    def _filtered(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>')
+        ))
+
+class ProfilingTools:
+    def __init__(self, admin_token: str, interval: float = 0.01, max_seconds: float = 300.0):
+        self.admin_token = admin_token
+        self.cpu = SamplingProfiler(interval, max_seconds)
+        self.memory = MemoryProfiler()
+
+    def authorized(self, token: Optional[str]) -> bool:
+        # Compared as bytes: compare_digest rejects str arguments containing non-ASCII characters.
+        return bool(token) and hmac.compare_digest(token.encode('utf-8'), self.admin_token.encode('utf-8'))
@@ -0,0 +1,59 @@
+import logging
+from typing import Dict, List, Optional
+from flask import Request, current_app, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+logger = logging.getLogger(__name__)
+
+class LimitedRequest(Request):
+    @property
+    def max_content_length(self) -> Optional[int]:
+        # Werkzeug enforces this before buffering: immediately for Content-Length
+        # bodies, and while reading for chunked bodies.
+        if not current_app:
+            return None
+        limits = current_app.config.get('ENDPOINT_MAX_CONTENT_LENGTH', {})
+        return limits.get(self.endpoint, current_app.config['MAX_CONTENT_LENGTH'])
+
+class RequestLimits:
+    def __init__(self, max_content_length: int = 32 * 1024 * 1024, endpoint_limits: Dict[str, int] = None,
+                 max_attachments: int = 10, max_attachment_bytes: int = 20 * 1024 * 1024):
+        self.max_content_length = max_content_length
+        self.endpoint_limits = endpoint_limits if endpoint_limits is not None else {
+            'new_conversation': 16 * 1024,
+            'set_model': 16 * 1024,
+            'create_assistant': 64 * 1024,
+            'cancel_job': 16 * 1024,
+        }
+        self.max_attachments = max_attachments
+        self.max_attachment_bytes = max_attachment_bytes
+
+    def init_app(self, app):
+        logger.info(f"Applying request limits: {self.max_content_length} bytes default, {self.endpoint_limits} per endpoint")
+        app.request_class = LimitedRequest
+        app.config['MAX_CONTENT_LENGTH'] = self.max_content_length
+        app.config['ENDPOINT_MAX_CONTENT_LENGTH'] = dict(self.endpoint_limits)
+        app.before_request(self._reject_oversized_request)
+        app.register_error_handler(RequestEntityTooLarge, self._handle_too_large)
+
+    def check_attachments(self, files: List[Dict]):
+        if len(files) > self.max_attachments:
+            raise RequestEntityTooLarge(f"Too many attachments: {len(files)} (limit {self.max_attachments})")
+        for file in files:
+            file_data = file.get('data') or file.get('content') or file.get('text') or ''
+            # Base64 payloads decode to three quarters of their length.
+            if len(file_data) * 3 // 4 > self.max_attachment_bytes:
+                raise RequestEntityTooLarge(
+                    f"Attachment {file.get('name', 'Unnamed file')} exceeds {self.max_attachment_bytes} bytes"
+                )
+
+    @staticmethod
+    def _reject_oversized_request():
+        limit = request.max_content_length
+        if request.content_length is not None and limit is not None and request.content_length > limit:
+            logger.warning(f"Rejecting {request.content_length} byte request to {request.path} (limit {limit})")
+            raise RequestEntityTooLarge(f"Request body exceeds {limit} bytes")
+
+    @staticmethod
+    def _handle_too_large(e):
+        return jsonify({"error": e.description}), 413
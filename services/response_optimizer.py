@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import zlib
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = (
+    'application/json',
+    'application/javascript',
+    'text/css',
+    'text/event-stream',
+    'text/html',
+    'text/javascript',
+    'text/markdown',
+    'text/plain'
+)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+class ResponseOptimizer:
+    def __init__(self, min_size: int = 1024, compress_level: int = 6, etag_endpoints: Tuple[str, ...] = ('get_available_models', 'upload_config'),
+                 max_static_bytes: int = 4 * 1024 * 1024):
+        self.min_size = min_size
+        self.compress_level = compress_level
+        self.etag_endpoints = etag_endpoints
+        self.max_static_bytes = max_static_bytes
+        self._fingerprints: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self.static_folder = None
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        app.url_defaults(self._add_static_fingerprint)
+        app.after_request(self._optimize_response)
+        logger.info(f"Response compression enabled ({'br, ' if brotli else ''}gzip) above {self.min_size} bytes")
+
+    def fingerprint(self, filename: str) -> Optional[str]:
+        # Content hash, recomputed only when the file's mtime changes.
+        path = os.path.join(self.static_folder, filename)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._fingerprints.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        with self._lock:
+            self._fingerprints[path] = (mtime, digest)
+        return digest
+
+    def _add_static_fingerprint(self, endpoint: str, values: Dict):
+        # url_for('static', ...) gains ?v=<hash>, so the URL changes whenever the file does.
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            digest = self.fingerprint(values['filename'])
+            if digest:
+                values['v'] = digest
+
+    def _optimize_response(self, response):
+        if response.status_code != 200 or 'Content-Encoding' in response.headers:
+            return response
+        is_static = request.endpoint == 'static'
+        if is_static:
+            self._prepare_static(response)
+        if response.direct_passthrough:
+            return response
+
+        encoding = self._negotiate_encoding(response)
+        response.vary.add('Accept-Encoding')
+
+        if request.method == 'GET' and (is_static or request.endpoint in self.etag_endpoints):
+            digest = self.fingerprint(request.view_args['filename']) if is_static else None
+            digest = digest or hashlib.sha256(response.get_data()).hexdigest()[:32]
+            # Each encoding is a different representation, so it gets its own strong tag.
+            response.set_etag(f"{digest}-{encoding}" if encoding else digest)
+            if not is_static:
+                response.headers['Cache-Control'] = 'no-cache'
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        if encoding:
+            self._compress(response, encoding)
+        return response
+
+    def _prepare_static(self, response):
+        filename = request.view_args.get('filename', '')
+        if request.args.get('v') and request.args.get('v') == self.fingerprint(filename):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        # Small assets are buffered so they can be compressed; large files keep streaming from disk.
+        if response.direct_passthrough and (response.content_length or 0) <= self.max_static_bytes:
+            response.direct_passthrough = False
+            response.get_data()
+
+    def _negotiate_encoding(self, response) -> Optional[str]:
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return None
+        if not response.is_streamed and (response.content_length or 0) < self.min_size:
+            return None
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def _compress(self, response, encoding: str):
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if encoding == 'br':
+                response.set_data(brotli.compress(data, quality=min(self.compress_level, 11)))
+            else:
+                response.set_data(gzip.compress(data, compresslevel=self.compress_level))
+        response.headers['Content-Encoding'] = encoding
+
+    def _compress_stream(self, chunks: Iterable, encoding: str) -> Iterator[bytes]:
+        # Flushed after every chunk so SSE events and export pages reach the client immediately.
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=min(self.compress_level, 11))
+            compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            compress, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                yield compress(chunk) + flush()
+            yield finish()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
@@ -0,0 +1,148 @@
+import logging
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+class _StreamCall:
+    def __init__(self, source: Iterator[str]):
+        self.source = source
+        self.chunks: List[str] = []
+        self.condition = threading.Condition()
+        self.pulling = False
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.consumers = 0
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _StreamCall] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.stream_leaders = 0
+        self.stream_coalesced = 0
+
+    def do(self, key: str, fn: Callable):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            logger.info(f"Coalescing duplicate request {key[:12]} onto in-flight call")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def do_stream(self, key: str, fn: Callable[[], Iterator[str]]) -> Iterator[str]:
+        with self._lock:
+            call = self._streams.get(key)
+            if call is None:
+                call = _StreamCall(fn())
+                self._streams[key] = call
+                self.stream_leaders += 1
+            else:
+                self.stream_coalesced += 1
+                logger.info(f"Coalescing duplicate stream {key[:12]} onto in-flight stream")
+            with call.condition:
+                call.consumers += 1
+        return self._consume(key, call)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'in_flight_streams': len(self._streams),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'stream_leaders': self.stream_leaders,
+                'stream_coalesced': self.stream_coalesced
+            }
+
+    def _consume(self, key: str, call: _StreamCall) -> Iterator[str]:
+        # Whichever consumer is ready pulls the next chunk from the source, so the
+        # shared stream keeps moving even if the first requester disconnects.
+        index = 0
+        try:
+            while True:
+                with call.condition:
+                    while index >= len(call.chunks) and not call.finished and call.pulling:
+                        call.condition.wait()
+                    if index < len(call.chunks):
+                        chunk = call.chunks[index]
+                        index += 1
+                    elif call.finished:
+                        if call.error is not None:
+                            raise call.error
+                        return
+                    else:
+                        call.pulling = True
+                        chunk = None
+                if chunk is not None:
+                    yield chunk
+                    continue
+                self._pull(key, call)
+        finally:
+            with call.condition:
+                call.consumers -= 1
+                abandoned = call.consumers == 0 and not call.finished
+            if abandoned:
+                self._finish(key, call)
+                close = getattr(call.source, 'close', None)
+                if close:
+                    close()
+
+    def _pull(self, key: str, call: _StreamCall):
+        try:
+            chunk = next(call.source)
+        except StopIteration:
+            self._finish(key, call)
+            return
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+            self._finish(key, call, e)
+            return
+        with call.condition:
+            call.chunks.append(chunk)
+            call.pulling = False
+            call.condition.notify_all()
+
+    def _finish(self, key: str, call: _StreamCall, error: Optional[BaseException] = None):
+        with self._lock:
+            if self._streams.get(key) is call:
+                del self._streams[key]
+        with call.condition:
+            call.finished = True
+            call.pulling = False
+            call.error = error
+            call.condition.notify_all()
@@ -0,0 +1,190 @@
+import csv
+import io
+import itertools
+import logging
+from collections import Counter
+from typing import Dict, List, Optional
+
+try:
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pc = pq = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+TABLE_LABELS = {'csv': 'CSV', 'tsv': 'TSV', 'parquet': 'Parquet', 'xlsx': 'Excel'}
+TABLE_EXTENSIONS = {'.csv': 'csv', '.tsv': 'tsv', '.tab': 'tsv', '.parquet': 'parquet', '.xlsx': 'xlsx', '.xlsm': 'xlsx'}
+ORDERED_TYPES = ('int', 'float', 'date', 'datetime')
+
+def table_kind(file_type: Optional[str], file_name: str) -> Optional[str]:
+    if file_type in TABLE_LABELS:
+        return file_type
+    # Older clients send spreadsheets as 'code'; fall back to the extension.
+    if file_type in (None, 'code', 'text'):
+        for extension, kind in TABLE_EXTENSIONS.items():
+            if file_name.lower().endswith(extension):
+                return kind
+    return None
+
+def read_table(data: bytes, kind: str, max_rows: int, max_columns: int) -> Dict:
+    # Every reader stops after max_rows, so work is bounded by the preview rather than the file.
+    # Tables are column-major: {'columns': [...], 'data': [[column values], ...], 'total_rows': int or None}.
+    if kind in ('csv', 'tsv'):
+        return _read_delimited(data, ',' if kind == 'csv' else '\t', max_rows, max_columns)
+    if kind == 'parquet':
+        return _read_parquet(data, max_rows, max_columns)
+    if kind == 'xlsx':
+        return _read_xlsx(data, max_rows, max_columns)
+    raise ValueError(f"Unsupported table type: {kind}")
+
+def _read_delimited(data: bytes, delimiter: str, max_rows: int, max_columns: int) -> Dict:
+    text = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig', errors='replace', newline='')
+    reader = csv.reader(text, delimiter=delimiter)
+    header = next(reader, [])[:max_columns]
+    # One row past the budget tells us whether the preview is complete without reading the rest.
+    rows = list(itertools.islice(reader, max_rows + 1))
+    truncated = len(rows) > max_rows
+    return {
+        'columns': header,
+        'data': _to_columns(rows[:max_rows], len(header), ''),
+        'total_rows': None if truncated else len(rows)
+    }
+
+def _read_parquet(data: bytes, max_rows: int, max_columns: int) -> Dict:
+    if pq is None:
+        raise ValueError("Reading Parquet files requires the pyarrow package")
+    parquet_file = pq.ParquetFile(io.BytesIO(data))
+    names = parquet_file.schema_arrow.names[:max_columns]
+    # Projected to the first max_columns and decoded batch by batch, so only the leading row group is read.
+    batch = next(parquet_file.iter_batches(batch_size=max_rows, columns=names), None)
+    arrays = batch.columns if batch is not None else []
+    return {
+        'columns': names,
+        'data': [array.to_pylist() for array in arrays] or [[] for _ in names],
+        'total_rows': parquet_file.metadata.num_rows,
+        'summaries': [_summarize_arrow(name, array) for name, array in zip(names, arrays)] or None
+    }
+
+def _read_xlsx(data: bytes, max_rows: int, max_columns: int) -> Dict:
+    if openpyxl is None:
+        raise ValueError("Reading Excel files requires the openpyxl package")
+    # read_only streams rows from the sheet XML instead of building the whole workbook.
+    workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True, max_row=max_rows + 1, max_col=max_columns)
+        header = list(next(rows, ()))
+        # Rows come back padded to max_col, so trailing empty header cells are not real columns.
+        while header and header[-1] is None:
+            header.pop()
+        header = [str(value) if value is not None else f"column_{index + 1}" for index, value in enumerate(header)]
+        return {
+            'columns': header,
+            'data': _to_columns(rows, len(header), None),
+            # The dimension tag is written by Excel but optional, so the total can be unknown.
+            'total_rows': sheet.max_row - 1 if sheet.max_row else None,
+            'sheets': workbook.sheetnames
+        }
+    finally:
+        workbook.close()
+
+def _to_columns(rows, width: int, fill) -> List[List]:
+    # Transposed once, so summaries and rendering work column by column.
+    padded = (list(row[:width]) + [fill] * (width - len(row)) for row in rows)
+    return [list(column) for column in zip(*padded)] or [[] for _ in range(width)]
+
+def _coerce(value):
+    # Delimited files only carry strings; numbers are recovered so columns can be typed and ranged.
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    if not value:
+        return None
+    for parse in (int, float):
+        try:
+            return parse(value)
+        except ValueError:
+            pass
+    return value
+
+def _column_type(values: List) -> str:
+    kinds = {type(value).__name__ for value in values}
+    if not kinds:
+        return 'empty'
+    if kinds <= {'int', 'float'}:
+        return 'float' if 'float' in kinds else 'int'
+    if len(kinds) == 1:
+        return 'text' if 'str' in kinds else kinds.pop()
+    return 'mixed'
+
+def summarize_columns(table: Dict) -> List[Dict]:
+    if table.get('summaries'):
+        return table['summaries']
+    summaries = []
+    for name, column in zip(table['columns'], table['data']):
+        values = [value for value in map(_coerce, column) if value is not None]
+        summary = {'name': name, 'type': _column_type(values), 'nulls': len(column) - len(values)}
+        try:
+            summary['distinct'] = len(set(values))
+        except TypeError:
+            pass
+        if values and summary['type'] in ORDERED_TYPES:
+            summary['min'], summary['max'] = min(values), max(values)
+        elif values and summary['type'] == 'text':
+            value, count = Counter(values).most_common(1)[0]
+            if count > 1:
+                summary['top'] = value
+        summaries.append(summary)
+    return summaries
+
+def _summarize_arrow(name: str, array) -> Dict:
+    # Computed by Arrow kernels over the whole batch rather than value by value.
+    summary = {'name': name, 'type': str(array.type), 'nulls': array.null_count}
+    try:
+        summary['distinct'] = pc.count_distinct(array).as_py()
+        min_max = pc.min_max(array).as_py()
+        if min_max['min'] is not None:
+            summary['min'], summary['max'] = min_max['min'], min_max['max']
+    except Exception:
+        # Nested and binary types have no ordering kernels; the type and null count still help.
+        pass
+    return summary
+
+def _format_cell(value, max_chars: int) -> str:
+    if value is None:
+        return ''
+    text = format(value, '.10g') if isinstance(value, float) else str(value)
+    text = text.replace('\n', ' ').replace('|', '/')
+    return text if len(text) <= max_chars else text[:max_chars - 1] + '…'
+
+def render_table(name: str, kind: str, table: Dict, summaries: List[Dict], max_cell_chars: int = 60) -> str:
+    # Pipe-separated rows with no padding or per-row keys: far fewer tokens than JSON or aligned tables.
+    shown = len(table['data'][0]) if table['data'] else 0
+    total = table['total_rows']
+    size = f"{total} rows" if total is not None else "more rows than shown"
+    lines = [f"{TABLE_LABELS[kind]} Preview of {name} ({size}, {len(table['columns'])} columns; first {shown} rows shown):"]
+    if len(table.get('sheets') or ()) > 1:
+        lines.append(f"Sheets: {', '.join(table['sheets'])} (first sheet shown)")
+    lines.append("Columns:")
+    for summary in summaries:
+        details = [summary['type']]
+        if 'min' in summary:
+            details.append(f"{_format_cell(summary['min'], max_cell_chars)} to {_format_cell(summary['max'], max_cell_chars)}")
+        if 'distinct' in summary:
+            details.append(f"{summary['distinct']} distinct")
+        if 'top' in summary:
+            details.append(f"most common {_format_cell(summary['top'], max_cell_chars)}")
+        if summary['nulls']:
+            details.append(f"{summary['nulls']} empty")
+        lines.append(f"- {summary['name']}: {', '.join(details)}")
+    lines.append("Rows:")
+    lines.append("|".join(_format_cell(column, max_cell_chars) for column in table['columns']))
+    for row in zip(*table['data']):
+        lines.append("|".join(_format_cell(value, max_cell_chars) for value in row))
+    return "\n".join(lines)
@@ -0,0 +1,72 @@
+import logging
+import threading
+import requests
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class ThreadSync:
+    def __init__(self, threads_url: str, page_size: int = 20):
+        self.threads_url = threads_url
+        self.page_size = page_size
+        self._cursors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def fetch_run_messages(self, headers: Dict, thread_id: str, run_id: str) -> List[Dict]:
+        messages_url = f"{self.threads_url}/{thread_id}/messages"
+        with self._lock:
+            cursor = self._cursors.get(thread_id)
+
+        if cursor:
+            # Only messages newer than the last one we saw, oldest first.
+            params = {'order': 'asc', 'limit': self.page_size, 'after': cursor, 'run_id': run_id}
+        else:
+            # No cursor yet (new thread or restart): the run's messages are the newest ones.
+            params = {'order': 'desc', 'limit': self.page_size, 'run_id': run_id}
+
+        run_messages = []
+        last_id = None
+        while True:
+            response = requests.get(messages_url, headers=headers, params=params)
+            response.raise_for_status()
+            page = response.json()
+            data = page.get('data', [])
+            if data:
+                last_id = data[-1]['id'] if params['order'] == 'asc' else (last_id or data[0]['id'])
+            run_messages.extend(
+                message for message in data
+                if message.get('role') == 'assistant' and message.get('run_id') in (None, run_id)
+            )
+            if params['order'] == 'desc' or not page.get('has_more'):
+                break
+            params['after'] = page.get('last_id') or data[-1]['id']
+
+        if params['order'] == 'desc':
+            run_messages.reverse()
+        if last_id:
+            with self._lock:
+                self._cursors[thread_id] = last_id
+        logger.info(f"Fetched {len(run_messages)} new messages for run {run_id} on thread {thread_id}")
+        return run_messages
+
+    def fetch_run_reply(self, headers: Dict, thread_id: str, run_id: str) -> Optional[str]:
+        messages = self.fetch_run_messages(headers, thread_id, run_id)
+        if not messages:
+            return None
+        return "\n\n".join(self.render_content(message) for message in messages)
+
+    def forget(self, thread_id: str):
+        with self._lock:
+            self._cursors.pop(thread_id, None)
+
+    @staticmethod
+    def render_content(message: Dict) -> str:
+        parts = []
+        for item in message.get('content', []):
+            if item.get('type') == 'text':
+                parts.append(item['text']['value'])
+            elif item.get('type') == 'image_file':
+                parts.append(f"[Image file: {item['image_file']['file_id']}]")
+            elif item.get('type') == 'image_url':
+                parts.append(f"![image]({item['image_url']['url']})")
+        return "\n\n".join(parts)
@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ThreadWarmPool:
+    # Keeps `size` empty OpenAI threads created ahead of time, so starting a
+    # conversation takes one instead of waiting on the API.
+
+    def __init__(self, create: Callable[[], str], size: int = 2, max_age: float = 24 * 3600.0,
+                 discard: Optional[Callable[[str], None]] = None, warm_up: Optional[Callable[[], None]] = None,
+                 retry_delay: float = 30.0, check_interval: float = 60.0):
+        self.create = create
+        self.size = size
+        self.max_age = max_age
+        self.discard = discard
+        self.warm_up = warm_up
+        self.retry_delay = retry_delay
+        self.check_interval = check_interval
+        # (thread_id, created_at), oldest first.
+        self._ready: Deque[Tuple[str, float]] = deque()
+        self._stale: List[str] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.refill_failures = 0
+        self._refills = 0
+        self._refill_seconds = 0.0
+        self._last_refill_ms: Optional[float] = None
+
+    def start(self):
+        with self._lock:
+            if self._worker is not None or self.size <= 0:
+                return
+            self._worker = threading.Thread(target=self._run, name='thread-warm-pool', daemon=True)
+            self._worker.start()
+        logger.info(f"Thread warm pool started with target size {self.size}")
+
+    def take(self) -> Optional[str]:
+        # Never blocks: an empty pool returns None and the caller creates a thread itself.
+        if self.size <= 0:
+            return None
+        now = time.monotonic()
+        thread_id = None
+        with self._lock:
+            while self._ready:
+                candidate, created_at = self._ready.popleft()
+                if now - created_at <= self.max_age:
+                    thread_id = candidate
+                    break
+                self._stale.append(candidate)
+            if thread_id:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self._wake.set()
+        return thread_id
+
+    def stats(self) -> Dict:
+        with self._lock:
+            taken = self.hits + self.misses
+            return {
+                'size': self.size,
+                'ready': len(self._ready),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / taken, 3) if taken else None,
+                'discarded': self.discarded,
+                'refill_failures': self.refill_failures,
+                'avg_refill_ms': round(self._refill_seconds / self._refills * 1000, 1) if self._refills else None,
+                'last_refill_ms': self._last_refill_ms
+            }
+
+    def shutdown(self):
+        # Pool threads exist remotely, so they are deleted rather than dropped with the process.
+        self._stopped.set()
+        self._wake.set()
+        with self._lock:
+            self._stale.extend(thread_id for thread_id, _ in self._ready)
+            self._ready.clear()
+        self._discard_stale()
+
+    def _run(self):
+        if self.warm_up is not None:
+            try:
+                self.warm_up()
+            except Exception as e:
+                logger.warning(f"Thread warm pool warm-up failed: {e}")
+        while not self._stopped.is_set():
+            # Cleared before checking, so a take() that lands mid-iteration still wakes the next wait.
+            self._wake.clear()
+            self._discard_stale()
+            with self._lock:
+                missing = self.size - len(self._ready)
+            if missing <= 0:
+                self._wake.wait(self.check_interval)
+                continue
+            started = time.monotonic()
+            try:
+                thread_id = self.create()
+            except Exception as e:
+                with self._lock:
+                    self.refill_failures += 1
+                logger.warning(f"Thread warm pool refill failed, retrying in {self.retry_delay}s: {e}")
+                self._stopped.wait(self.retry_delay)
+                continue
+            elapsed = time.monotonic() - started
+            with self._lock:
+                if self._stopped.is_set():
+                    # Finished after shutdown() drained the pool; deleted below instead of leaking.
+                    self._stale.append(thread_id)
+                    break
+                self._ready.append((thread_id, time.monotonic()))
+                self._refills += 1
+                self._refill_seconds += elapsed
+                self._last_refill_ms = round(elapsed * 1000, 1)
+            logger.debug("Pre-created thread %s in %.0f ms", thread_id, elapsed * 1000)
+        self._discard_stale()
+
+    def _discard_stale(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._ready and now - self._ready[0][1] > self.max_age:
+                self._stale.append(self._ready.popleft()[0])
+            stale, self._stale = self._stale, []
+            self.discarded += len(stale)
+        for thread_id in stale:
+            logger.info(f"Discarding stale pre-created thread {thread_id}")
+            if self.discard is not None:
+                try:
+                    self.discard(thread_id)
+                except Exception as e:
+                    logger.warning(f"Failed to delete stale thread {thread_id}: {e}")
@@ -23,10 +23,27 @@ document.addEventListener("DOMContentLoaded", () => {
   let selectedFiles = [];
   let isAssistantMode = false;
   let currentAssistantId = null;
+  // Matches the server defaults until /upload_config answers.
+  let uploadConfig = { max_image_dimension: 1568, image_quality: 85 };
+  // SHA-256 of files already sent in this conversation; these are sent by reference.
+  const sentHashes = new Set();
+  const preparedFileCache = new WeakMap();
+  const imageFormat = detectImageFormat();
+  const EXTENSION_TYPES = {
+    csv: "csv",
+    tsv: "tsv",
+    tab: "tsv",
+    parquet: "parquet",
+    xlsx: "xlsx",
+    xlsm: "xlsx",
+    pdf: "pdf",
+    docx: "docx",
+  };
 
   console.log("Initializing app.js");
 
   initializeModelSelect();
+  initializeUploadConfig();
 
   async function initializeModelSelect() {
     console.log("Initializing model select");
@@ -54,33 +71,114 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   }
 
+  async function initializeUploadConfig() {
+    try {
+      const response = await fetch("/upload_config");
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      uploadConfig = { ...uploadConfig, ...(await response.json()) };
+      console.log("Upload config loaded:", uploadConfig);
+    } catch (error) {
+      console.error("Error loading upload config:", error);
+    }
+  }
+
+  function detectImageFormat() {
+    const canvas = document.createElement("canvas");
+    canvas.width = canvas.height = 1;
+    return canvas.toDataURL("image/webp").startsWith("data:image/webp")
+      ? "image/webp"
+      : "image/jpeg";
+  }
+
   function handleFileUpload(file) {
+    // Prepared once per file, so a resend after a 409 does not re-encode.
+    if (!preparedFileCache.has(file)) {
+      preparedFileCache.set(file, prepareFile(file));
+    }
+    return preparedFileCache.get(file);
+  }
+
+  async function prepareFile(file) {
     console.log("Handling file upload:", file.name, "Type:", file.type);
-    return new Promise((resolve, reject) => {
-      const reader = new FileReader();
-      reader.onload = (e) => {
-        console.log(
-          "File read successfully. Data length:",
-          e.target.result.length
-        );
-        const fileType = file.type.startsWith("image/")
-          ? "image"
-          : file.type === "text/csv"
-          ? "csv"
-          : "code";
-        console.log("Determined file type:", fileType);
-        resolve({
-          name: file.name,
-          type: fileType,
-          data: e.target.result.split(",")[1],
-        });
-      };
-      reader.onerror = (error) => {
-        console.error("Error reading file:", error);
-        reject(error);
-      };
-      reader.readAsDataURL(file);
-    });
+    const fileType = detectFileType(file);
+    let blob = file;
+    if (fileType === "image") {
+      try {
+        blob = await compressImage(file);
+      } catch (error) {
+        console.error("Error compressing image, sending original:", error);
+      }
+    }
+    const buffer = await blob.arrayBuffer();
+    console.log(
+      "File prepared:",
+      file.name,
+      "Original bytes:",
+      file.size,
+      "Prepared bytes:",
+      buffer.byteLength
+    );
+    return {
+      name: file.name,
+      type: fileType,
+      hash: await hashBuffer(buffer),
+      data: bufferToBase64(buffer),
+    };
+  }
+
+  function detectFileType(file) {
+    if (file.type.startsWith("image/")) {
+      return "image";
+    }
+    // Browsers report no MIME type for Parquet and inconsistent ones for spreadsheets, so the extension decides.
+    const extension = file.name.split(".").pop().toLowerCase();
+    return EXTENSION_TYPES[extension] || (file.type === "text/csv" ? "csv" : "code");
+  }
+
+  async function compressImage(file) {
+    const bitmap = await createImageBitmap(file);
+    const scale = Math.min(
+      1,
+      uploadConfig.max_image_dimension / Math.max(bitmap.width, bitmap.height)
+    );
+    const canvas = document.createElement("canvas");
+    canvas.width = Math.round(bitmap.width * scale);
+    canvas.height = Math.round(bitmap.height * scale);
+    const context = canvas.getContext("2d");
+    if (imageFormat === "image/jpeg") {
+      // JPEG has no alpha channel; flatten transparency onto white instead of black.
+      context.fillStyle = "#fff";
+      context.fillRect(0, 0, canvas.width, canvas.height);
+    }
+    context.drawImage(bitmap, 0, 0, canvas.width, canvas.height);
+    bitmap.close();
+    const blob = await new Promise((resolve) =>
+      canvas.toBlob(resolve, imageFormat, uploadConfig.image_quality / 100)
+    );
+    // Small, already-compressed images can grow when re-encoded.
+    return blob && blob.size < file.size ? blob : file;
+  }
+
+  async function hashBuffer(buffer) {
+    // crypto.subtle only exists on secure origins (https or localhost); without it files are always sent in full.
+    if (!window.crypto?.subtle) {
+      return null;
+    }
+    const digest = await crypto.subtle.digest("SHA-256", buffer);
+    return Array.from(new Uint8Array(digest), (byte) =>
+      byte.toString(16).padStart(2, "0")
+    ).join("");
+  }
+
+  function bufferToBase64(buffer) {
+    const bytes = new Uint8Array(buffer);
+    let binary = "";
+    for (let i = 0; i < bytes.length; i += 0x8000) {
+      binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+    }
+    return btoa(binary);
   }
 
   async function createAssistant(name, instructions) {
@@ -131,6 +229,39 @@ document.addEventListener("DOMContentLoaded", () => {
     });
   }
 
+  function buildPayload(message, fileData, useRefs) {
+    const payload = {
+      message,
+      files: fileData.map(({ name, type, hash, data }) =>
+        useRefs && hash && sentHashes.has(hash)
+          ? { name, type, ref: hash }
+          : { name, type, data }
+      ),
+      model: elements.modelSelect.value,
+    };
+
+    if (isAssistantMode && currentAssistantId) {
+      payload.assistantId = currentAssistantId;
+    }
+    return payload;
+  }
+
+  async function postChat(message, fileData, useRefs) {
+    const body = JSON.stringify(buildPayload(message, fileData, useRefs));
+    console.log(
+      "Sending payload to server:",
+      fileData.length,
+      "file(s),",
+      body.length,
+      "bytes"
+    );
+    return fetch("/chat", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body,
+    });
+  }
+
   async function sendMessage(message) {
     console.log("Sending message:", message);
     try {
@@ -138,33 +269,21 @@ document.addEventListener("DOMContentLoaded", () => {
       const fileData = await Promise.all(
         selectedFiles.map((file) => handleFileUpload(file))
       );
-      console.log("Processed file data:", fileData);
-      const payload = {
-        message,
-        files: fileData,
-        model: elements.modelSelect.value,
-      };
-
-      if (isAssistantMode && currentAssistantId) {
-        payload.assistantId = currentAssistantId;
-      }
-
-      console.log(
-        "Sending payload to server:",
-        JSON.stringify(payload, null, 2)
-      );
 
-      const response = await fetch("/chat", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
-      });
+      let response = await postChat(message, fileData, true);
+      if (response.status === 409) {
+        // The server no longer knows a referenced file (e.g. after a restart); send everything in full.
+        console.log("Server requested full file data, resending");
+        fileData.forEach((file) => sentHashes.delete(file.hash));
+        response = await postChat(message, fileData, false);
+      }
 
       console.log("Response status:", response.status);
 
       if (!response.ok) {
         throw new Error(`Server error: ${response.status}`);
       }
+      fileData.forEach((file) => file.hash && sentHashes.add(file.hash));
       const data = await response.json();
       console.log("Received data from server:", data);
       displayMessage("assistant", data.message || data);
@@ -257,6 +376,7 @@ document.addEventListener("DOMContentLoaded", () => {
     try {
       const response = await fetch("/new_conversation", { method: "POST" });
       if (response.ok) {
+        sentHashes.clear();
         elements.chatContainer.innerHTML = "";
         displayMessage(
           "assistant",
@@ -0,0 +1,64 @@
+import pytest
+import threading
+import time
+from werkzeug.exceptions import ServiceUnavailable
+from services.admission_controller import AdmissionController
+
+def test_admits_up_to_limit_then_queues():
+    admission = AdmissionController(limits={'openai': 1}, max_queue=1, max_wait=2)
+    first = admission.acquire('openai')
+    admitted = []
+
+    waiter = threading.Thread(target=lambda: admitted.append(admission.acquire('openai')))
+    waiter.start()
+    time.sleep(0.1)
+    assert admission.stats()['openai']['queued'] == 1
+
+    admission.release(first)
+    waiter.join(2)
+    assert len(admitted) == 1
+    assert admission.stats()['openai']['active'] == 1
+
+def test_rejects_when_queue_is_full():
+    admission = AdmissionController(limits={'openai': 1}, max_queue=0)
+    admission.acquire('openai')
+
+    with pytest.raises(ServiceUnavailable) as error:
+        admission.acquire('openai')
+
+    assert error.value.retry_after >= 1
+    assert admission.stats()['openai']['shed_queue_full'] == 1
+
+def test_waiter_times_out():
+    admission = AdmissionController(limits={'anthropic': 1}, max_queue=4, max_wait=5)
+    admission.acquire('anthropic')
+
+    started = time.monotonic()
+    with pytest.raises(ServiceUnavailable):
+        admission.acquire('anthropic', timeout=0.1)
+
+    assert time.monotonic() - started < 1
+    stats = admission.stats()['anthropic']
+    assert stats['timed_out'] == 1
+    assert stats['queued'] == 0
+
+def test_sheds_when_expected_wait_exceeds_deadline():
+    admission = AdmissionController(limits={'openai': 1}, max_queue=4)
+    ticket = admission.acquire('openai')
+    ticket.started -= 5
+    admission.release(ticket)
+    admission.acquire('openai')
+
+    started = time.monotonic()
+    with pytest.raises(ServiceUnavailable):
+        admission.acquire('openai', timeout=1)
+
+    assert time.monotonic() - started < 0.5
+    assert admission.stats()['openai']['shed_deadline'] == 1
+
+def test_release_skips_expired_waiters_and_is_idempotent():
+    admission = AdmissionController(limits={'openai': 1}, max_queue=4)
+    with admission.admit('openai') as ticket:
+        pass
+    admission.release(ticket)
+    assert admission.stats()['openai']['active'] == 0
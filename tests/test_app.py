@@ -83,11 +83,11 @@ def test_chat_route_with_files(mock_process_message, client):
 def test_chat_route_with_model_selection(mock_set_model, mock_process_message, client):
     logger.info("Testing chat route with model selection")
     mock_process_message.return_value = "Test response with model selection"
-    response = client.post('/chat', json={'message': 'Test message', 'model': 'gpt-4'})
+    response = client.post('/chat', json={'message': 'Test message', 'model': 'gpt-4-turbo'})
     assert response.status_code == 200
     assert json.loads(response.data) == "Test response with model selection"
-    mock_set_model.assert_called_once_with('gpt-4')
-    mock_process_message.assert_called_once_with('Test message', [])
+    mock_set_model.assert_not_called()
+    mock_process_message.assert_called_once_with('Test message', [], None, model='gpt-4-turbo', mode=None)
     logger.info("Chat route with model selection test passed")
 
 @patch('services.conversation_service.ConversationService.process_message')
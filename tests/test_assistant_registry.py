@@ -0,0 +1,115 @@
+import pytest
+import time
+from unittest.mock import patch, MagicMock
+from services.assistant_registry import AssistantRegistry
+from services.llm_service import LLMService, DEFAULT_ASSISTANT_NAME, DEFAULT_ASSISTANT_INSTRUCTIONS
+from services.thread_warm_pool import ThreadWarmPool
+
+def _response(status_code=200, data=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = data or {}
+    return response
+
+@pytest.fixture
+def llm_service(tmp_path):
+    return LLMService(registry=AssistantRegistry(str(tmp_path / "registry.db")))
+
+def test_registry_persists_ids(tmp_path):
+    db_path = str(tmp_path / "registry.db")
+    registry = AssistantRegistry(db_path)
+    registry.save_assistant('gpt-4-turbo', 'Helper', 'Be nice', 'asst_1')
+    registry.save_thread('conversation-1', 'thread_1')
+
+    reloaded = AssistantRegistry(db_path)
+    assert reloaded.get_assistant('gpt-4-turbo', 'Helper', 'Be nice') == 'asst_1'
+    assert reloaded.get_assistant('gpt-4-turbo', 'Helper', 'Be rude') is None
+    assert reloaded.get_assistant('gpt-3.5-turbo', 'Helper', 'Be nice') is None
+    assert reloaded.get_thread('conversation-1') == 'thread_1'
+
+def test_invalidate(tmp_path):
+    registry = AssistantRegistry()
+    registry.save_assistant('gpt-4-turbo', 'Helper', 'Be nice', 'asst_1')
+    registry.save_thread('conversation-1', 'thread_1')
+
+    registry.invalidate_assistant('asst_1')
+    registry.invalidate_thread('conversation-1')
+
+    assert registry.get_assistant('gpt-4-turbo', 'Helper', 'Be nice') is None
+    assert registry.get_thread('conversation-1') is None
+
+@patch('services.llm_service.requests.post')
+def test_create_assistant_reuses_registered_id(mock_post, llm_service):
+    mock_post.return_value = _response(data={'id': 'asst_1'})
+
+    assert llm_service.create_assistant('Helper', 'Be nice') == 'asst_1'
+    assert llm_service.create_assistant('Helper', 'Be nice') == 'asst_1'
+    mock_post.assert_called_once()
+
+@patch('services.llm_service.requests.post')
+def test_thread_is_reused_per_session(mock_post, llm_service):
+    mock_post.side_effect = [_response(data={'id': 'thread_1'}), _response(data={'id': 'thread_2'})]
+
+    assert llm_service._create_or_get_thread('conversation-1') == 'thread_1'
+    assert llm_service._create_or_get_thread('conversation-1') == 'thread_1'
+    assert llm_service._create_or_get_thread('conversation-2') == 'thread_2'
+
+@patch('services.llm_service.requests.post')
+def test_stale_thread_is_recreated(mock_post, llm_service):
+    llm_service.registry.save_assistant(llm_service.current_model, DEFAULT_ASSISTANT_NAME, DEFAULT_ASSISTANT_INSTRUCTIONS, 'asst_1')
+    llm_service.registry.save_thread('conversation-1', 'thread_stale')
+    mock_post.side_effect = [
+        _response(404),
+        _response(data={'id': 'thread_new'}),
+        _response(data={'id': 'msg_1'}),
+        _response(data={'id': 'run_1'}),
+    ]
+
+    thread_id, run_url, run_id = llm_service._start_assistant_run({}, {'role': 'user', 'content': 'Hi'}, None, 'conversation-1')
+
+    assert thread_id == 'thread_new'
+    assert run_id == 'run_1'
+    assert llm_service.registry.get_thread('conversation-1') == 'thread_new'
+
+@patch('services.llm_service.requests.post')
+def test_stale_assistant_retry_does_not_repost_message(mock_post, llm_service):
+    llm_service.registry.save_assistant(llm_service.current_model, DEFAULT_ASSISTANT_NAME, DEFAULT_ASSISTANT_INSTRUCTIONS, 'asst_stale')
+    llm_service.registry.save_thread('conversation-1', 'thread_1')
+    mock_post.side_effect = [
+        _response(data={'id': 'msg_1'}),
+        _response(404),
+        _response(data={'id': 'asst_new'}),
+        _response(data={'id': 'run_1'}),
+    ]
+
+    thread_id, run_url, run_id = llm_service._start_assistant_run({}, {'role': 'user', 'content': 'Hi'}, None, 'conversation-1')
+
+    assert (thread_id, run_id) == ('thread_1', 'run_1')
+    urls = [call.args[0] for call in mock_post.call_args_list]
+    assert urls.count(f"{llm_service.openai_threads_url}/thread_1/messages") == 1
+    assert mock_post.call_args_list[-1].kwargs['json'] == {'assistant_id': 'asst_new'}
+
+@patch('services.llm_service.requests.post')
+def test_new_session_takes_prewarmed_thread(mock_post, llm_service):
+    llm_service.thread_pool = ThreadWarmPool(lambda: 'thread_warm', size=1)
+    llm_service.thread_pool.start()
+    deadline = time.monotonic() + 2
+    while not llm_service.thread_pool.stats()['ready'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert llm_service._create_or_get_thread('conversation-1') == 'thread_warm'
+    assert llm_service.registry.get_thread('conversation-1') == 'thread_warm'
+    mock_post.assert_not_called()
+    llm_service.thread_pool.shutdown()
+
+def test_warm_up_continues_past_failing_model(llm_service):
+    warmed = []
+
+    def create(model):
+        if model == 'gpt-4-turbo':
+            raise RuntimeError("model unavailable")
+        warmed.append(model)
+
+    llm_service._create_or_get_assistant = create
+    llm_service._warm_default_assistants()
+    assert warmed == ['gpt-3.5-turbo']
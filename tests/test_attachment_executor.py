@@ -0,0 +1,119 @@
+import pytest
+import base64
+import concurrent.futures
+import io
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock
+from PIL import Image
+from services.attachment_executor import AttachmentExecutor
+from services.file_service import FileService
+
+@pytest.fixture
+def file_service():
+    executor = AttachmentExecutor(max_workers=2, timeout=60)
+    yield FileService(executor=executor)
+    executor.shutdown()
+
+def _image_file(name, color):
+    img = Image.new('RGB', (50, 50), color=color)
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return {'type': 'image', 'name': name, 'data': base64.b64encode(buffer.getvalue()).decode('utf-8')}
+
+def test_process_files_preserves_order(file_service):
+    csv_base64 = base64.b64encode(b"Name,Age\nAlice,30").decode('utf-8')
+    text_base64 = base64.b64encode(b"plain text").decode('utf-8')
+    files = [
+        _image_file('red.png', 'red'),
+        {'type': 'csv', 'name': 'people.csv', 'data': csv_base64},
+        {'type': 'text', 'name': 'notes.txt', 'data': text_base64},
+        _image_file('blue.png', 'blue'),
+    ]
+
+    results = file_service.process_files(files)
+
+    assert [result['name'] for result in results] == ['red.png', 'people.csv', 'notes.txt', 'blue.png']
+    assert results[0]['type'] == 'image'
+    assert 'Alice' in results[1]['text']
+    assert 'plain text' in results[2]['text']
+
+def test_process_files_rejects_oversized(file_service):
+    file_service.executor.max_file_bytes = 10
+    files = [{'type': 'csv', 'name': 'big.csv', 'data': base64.b64encode(b"x" * 100).decode('utf-8')}]
+    assert file_service.process_files(files) == [None]
+
+def test_process_files_without_executor():
+    text_base64 = base64.b64encode(b"plain text").decode('utf-8')
+    results = FileService().process_files([{'type': 'text', 'name': 'notes.txt', 'data': text_base64}])
+    assert results[0]['name'] == 'notes.txt'
+
+def test_broken_pool_marks_file_failed_without_inline_retry():
+    executor = AttachmentExecutor(max_workers=1, timeout=5)
+    pool = MagicMock()
+    future = concurrent.futures.Future()
+    future.set_exception(BrokenProcessPool())
+    executor._submit = lambda file: (future, pool)
+    process_inline = MagicMock()
+
+    results = executor.process_files([_image_file('red.png', 'red')], process_inline)
+
+    assert results == [None]
+    process_inline.assert_not_called()
+    pool.shutdown.assert_called_once()
+
+def test_reset_leaves_replacement_pool_running():
+    executor = AttachmentExecutor(max_workers=1)
+    broken = MagicMock()
+    replacement = MagicMock()
+    executor._executor = replacement
+
+    executor._reset(broken)
+
+    assert executor._executor is replacement
+    broken.shutdown.assert_called_once()
+    replacement.shutdown.assert_not_called()
+
+def test_timeout_terminates_running_worker():
+    executor = AttachmentExecutor(max_workers=1, timeout=0.5)
+    pool = executor._get_executor()
+    future = pool.submit(time.sleep, 30)
+    executor._submit = lambda file: (future, pool)
+    # Wait for the worker to pick the task up, so cancel() alone could not stop it.
+    while not future.running():
+        time.sleep(0.05)
+    processes = list(pool._processes.values())
+
+    assert executor.process_files([_image_file('slow.png', 'red')], MagicMock()) == [None]
+
+    for process in processes:
+        process.join(timeout=5)
+        assert not process.is_alive()
+    assert executor._executor is None
+
+def test_timeout_recycle_does_not_drop_other_requests_files():
+    executor = AttachmentExecutor(max_workers=2, timeout=3)
+    pool = executor._get_executor()
+    # Stand-ins already running in the shared pool: one hangs, one is merely slow.
+    hanging = pool.submit(time.sleep, 30)
+    busy = pool.submit(time.sleep, 3.3)
+    while not (hanging.running() and busy.running()):
+        time.sleep(0.05)
+    stand_ins = {'hanging.png': (hanging, pool), 'other.png': (busy, pool)}
+    submit = executor._submit
+    executor._submit = lambda file: stand_ins.pop(file['name'], None) or submit(file)
+    process_inline = MagicMock()
+
+    slow_results = []
+    slow_request = threading.Thread(target=lambda: slow_results.extend(
+        executor.process_files([_image_file('hanging.png', 'red')], process_inline)))
+    slow_request.start()
+    time.sleep(0.5)
+    other_results = executor.process_files([_image_file('other.png', 'blue')], process_inline)
+    slow_request.join()
+
+    assert slow_results == [None]
+    assert other_results[0]['name'] == 'other.png'
+    process_inline.assert_not_called()
+    executor.shutdown()
@@ -0,0 +1,62 @@
+import pytest
+from services.blob_store import BlobStore
+
+@pytest.fixture
+def blob_store(tmp_path):
+    return BlobStore(max_memory_bytes=10, spill_dir=str(tmp_path))
+
+def test_put_is_content_addressed(blob_store):
+    first = blob_store.put(b"same", "conversation-1")
+    second = blob_store.put(b"same", "conversation-2")
+    assert first == second
+    assert blob_store.get(first) == b"same"
+    assert blob_store.stats()['blobs'] == 1
+
+def test_spills_to_disk_over_budget(blob_store, tmp_path):
+    first = blob_store.put(b"0123456789", "conversation-1")
+    second = blob_store.put(b"abcdefghij", "conversation-1")
+
+    stats = blob_store.stats()
+    assert stats['spilled_blobs'] == 1
+    assert stats['memory_bytes'] <= 10
+    assert (tmp_path / first).exists()
+    assert blob_store.get(first) == b"0123456789"
+    assert blob_store.get(second) == b"abcdefghij"
+
+def test_release_drops_unreferenced_blobs(blob_store):
+    shared = blob_store.put(b"shared", "conversation-1")
+    blob_store.put(b"shared", "conversation-2")
+    only_first = blob_store.put(b"first", "conversation-1")
+
+    blob_store.release("conversation-1")
+
+    assert blob_store.get(shared) == b"shared"
+    assert blob_store.get(only_first) is None
+
+def test_release_removes_spilled_files(blob_store, tmp_path):
+    digest = blob_store.put(b"0123456789abcdef", "conversation-1")
+    assert (tmp_path / digest).exists()
+
+    blob_store.release("conversation-1")
+    assert not (tmp_path / digest).exists()
+
+def test_conversation_usage_counts_shared_blobs(blob_store):
+    blob_store.put(b"0123456789", "conversation-1")
+    blob_store.put(b"abcdefghij", "conversation-1")
+    blob_store.put(b"abcdefghij", "conversation-2")
+
+    usage = blob_store.conversation_usage()
+    assert usage["conversation-1"]['blobs'] == 2
+    assert usage["conversation-1"]['bytes'] == 20
+    assert usage["conversation-1"]['memory_bytes'] == 10
+    assert usage["conversation-2"] == {'blobs': 1, 'bytes': 10, 'memory_bytes': 10}
+
+def test_persistent_store_survives_restart(tmp_path):
+    digest = BlobStore(spill_dir=str(tmp_path), persistent=True).put(b"kept", "conversation-1")
+
+    restarted = BlobStore(spill_dir=str(tmp_path), persistent=True)
+    assert restarted.acquire(digest, "conversation-1")
+    assert restarted.get(digest) == b"kept"
+
+    restarted.release("conversation-1")
+    assert not (tmp_path / digest).exists()
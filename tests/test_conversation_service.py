@@ -1,4 +1,7 @@
 import pytest
+import base64
+import hashlib
+from werkzeug.exceptions import Conflict
 from services.conversation_service import ConversationService
 from unittest.mock import MagicMock, patch
 
@@ -40,20 +43,21 @@ def test_process_message_without_files(conversation_service):
 
 def test_process_message_with_files(conversation_service):
     conversation_service.llm_service.call_llm.return_value = "LLM response with files"
-    conversation_service.file_service.process_file.return_value = {"type": "image", "data": "processed_image_data"}
+    conversation_service.file_service.process_files.return_value = [{"type": "text", "name": "notes.txt", "text": "File body"}]
     
-    files = [{"type": "image", "data": "raw_image_data"}]
-    result = conversation_service.process_message("Test message with image", files)
+    files = [{"type": "text", "data": "raw_text_data", "name": "notes.txt"}]
+    result = conversation_service.process_message("Test message with file", files)
     
     assert result == "LLM response with files"
     assert len(conversation_service.conversation_history) == 2
-    assert conversation_service.conversation_history[0] == {
-        "role": "user", 
-        "content": [
-            {"type": "text", "text": "Test message with image"},
-            {"type": "image", "data": "processed_image_data"}
-        ]
-    }
+    attachment = conversation_service.conversation_history[0]["content"][1]
+    assert attachment["type"] == "text"
+    assert attachment["name"] == "notes.txt"
+    assert "text" not in attachment
+    assert conversation_service.blob_store.get(attachment["blob_ref"]) == b"File body"
+
+    llm_messages = conversation_service.llm_service.call_llm.call_args[0][0]
+    assert llm_messages[-1]["content"] == "Test message with file\n\nAttached files:\nFile: notes.txt\nContent: File body"
 
 def test_process_message_llm_failure(conversation_service):
     conversation_service.llm_service.call_llm.return_value = None
@@ -105,4 +109,46 @@ def test_process_message_logging(mock_print, conversation_service):
     conversation_service.process_message("Test message", [])
     
     mock_print.assert_any_call("Processing message: Test message")
-    mock_print.assert_any_call("LLM response: LLM response")
\ No newline at end of file
+    mock_print.assert_any_call("LLM response: LLM response")
+
+def test_repeat_attachment_can_be_sent_by_reference(conversation_service):
+    conversation_service.llm_service.call_llm.return_value = "ok"
+    conversation_service.file_service.process_files.return_value = [{"type": "text", "name": "notes.txt", "text": "File body"}]
+    data = base64.b64encode(b"raw notes").decode('utf-8')
+    ref = hashlib.sha256(b"raw notes").hexdigest()
+
+    with pytest.raises(Conflict):
+        conversation_service.check_attachment_refs([{"name": "notes.txt", "type": "text", "ref": ref}])
+
+    conversation_service.process_message("First", [{"name": "notes.txt", "type": "text", "data": data}])
+    conversation_service.file_service.process_files.reset_mock()
+    files = [{"name": "notes.txt", "type": "text", "ref": ref}]
+    conversation_service.check_attachment_refs(files)
+    conversation_service.process_message("Second", files)
+
+    conversation_service.file_service.process_files.assert_not_called()
+    assert conversation_service.llm_service.call_llm.call_args[0][1] == [{"type": "text", "name": "notes.txt", "text": "File body"}]
+    assert conversation_service.conversation_history[2]["content"][1] == conversation_service.conversation_history[0]["content"][1]
+
+    conversation_service.new_conversation()
+    with pytest.raises(Conflict):
+        conversation_service.check_attachment_refs(files)
+    # The route checked earlier, but the refs are re-checked when the message is added.
+    with pytest.raises(Conflict):
+        conversation_service.process_message("Third", files)
+    assert len(conversation_service.conversation_history) == 0
+
+def test_reply_stays_in_conversation_it_was_sent_in(conversation_service):
+    old_id = conversation_service.conversation_id
+
+    def call_llm(*args, **kwargs):
+        conversation_service.new_conversation()
+        return "late reply"
+
+    conversation_service.llm_service.call_llm.side_effect = call_llm
+    conversation_service.process_message("Question", [])
+
+    store = conversation_service.store
+    assert [message['role'] for message in store.iter_messages(old_id)] == ['user', 'assistant']
+    assert list(store.iter_messages(conversation_service.conversation_id)) == []
+    assert conversation_service.conversation_history == []
@@ -0,0 +1,77 @@
+import json
+import pytest
+from services.conversation_store import ConversationStore
+from services.conversation_service import ConversationService
+from unittest.mock import MagicMock
+
+@pytest.fixture
+def store():
+    return ConversationStore()
+
+def test_create_conversation(store):
+    conversation_id = store.create_conversation()
+    assert store.latest_conversation_id() == conversation_id
+    assert store.count_messages(conversation_id) == 0
+
+def test_append_and_iter_messages(store):
+    conversation_id = store.create_conversation()
+    store.append_message(conversation_id, {"role": "user", "content": [{"type": "text", "text": "Hello"}]})
+    store.append_message(conversation_id, {"role": "assistant", "content": [{"type": "text", "text": "Hi"}]})
+
+    messages = list(store.iter_messages(conversation_id, batch_size=1))
+    assert messages == [
+        {"role": "user", "content": [{"type": "text", "text": "Hello"}]},
+        {"role": "assistant", "content": [{"type": "text", "text": "Hi"}]}
+    ]
+
+def test_messages_are_scoped_to_conversation(store):
+    first = store.create_conversation()
+    second = store.create_conversation()
+    store.append_message(first, {"role": "user", "content": [{"type": "text", "text": "First"}]})
+
+    assert store.count_messages(first) == 1
+    assert list(store.iter_messages(second)) == []
+
+def test_get_page(store):
+    conversation_id = store.create_conversation()
+    for i in range(5):
+        store.append_message(conversation_id, {"role": "user", "content": [{"type": "text", "text": f"Message {i}"}]})
+
+    page = store.get_page(conversation_id, limit=2)
+    assert [m['content'][0]['text'] for m in page['messages']] == ["Message 3", "Message 4"]
+    assert page['next_before'] is not None
+
+    page = store.get_page(conversation_id, before=page['next_before'], limit=10)
+    assert [m['content'][0]['text'] for m in page['messages']] == ["Message 0", "Message 1", "Message 2"]
+    assert page['next_before'] is None
+
+def test_history_survives_restart(tmp_path):
+    db_path = str(tmp_path / "conversations.db")
+    llm_service = MagicMock()
+    llm_service.call_llm.return_value = "LLM response"
+
+    service = ConversationService(llm_service, MagicMock(), ConversationStore(db_path))
+    service.process_message("Test message", [])
+
+    restarted = ConversationService(llm_service, MagicMock(), ConversationStore(db_path))
+    assert restarted.conversation_id == service.conversation_id
+    assert restarted.conversation_history == service.conversation_history
+
+def test_iter_export_formats():
+    llm_service = MagicMock()
+    llm_service.call_llm.return_value = "Hi there!"
+    service = ConversationService(llm_service, MagicMock())
+    service.process_message("Hello", [])
+
+    assert "".join(service.iter_export('markdown')) == "User:\nHello\n\nAssistant:\nHi there!\n\n"
+    exported = json.loads("".join(service.iter_export('json')))
+    assert [message['role'] for message in exported['messages']] == ['user', 'assistant']
+    with pytest.raises(ValueError):
+        service.iter_export('xml')
+
+def test_iter_message_json_splices_stored_content(store):
+    conversation_id = store.create_conversation()
+    message = {"role": "user", "content": [{"type": "text", "text": "Hello \"world\""}]}
+    store.append_message(conversation_id, message)
+
+    assert [json.loads(raw) for raw in store.iter_message_json(conversation_id)] == [message]
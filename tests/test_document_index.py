@@ -0,0 +1,48 @@
+import pytest
+from unittest.mock import MagicMock
+from services.document_index import DocumentIndex
+from services.conversation_service import ConversationService
+
+@pytest.fixture
+def index():
+    index = DocumentIndex(chunk_chars=60)
+    index.add_document("animals.txt", "\n".join([
+        "Cats are small carnivorous mammals.",
+        "Dogs are loyal companions and good guards.",
+        "Elephants are the largest land animals.",
+        "Penguins are flightless birds living in the south.",
+    ]))
+    return index
+
+def test_chunking_respects_size(index):
+    assert len(index) > 1
+    assert all(len(chunk['text']) <= 60 for chunk in index.chunks)
+
+def test_search_ranks_relevant_chunk_first(index):
+    results = index.search("which birds cannot fly? penguins")
+    assert results
+    assert "Penguins" in results[0][1]['text']
+
+def test_retrieve_respects_token_budget(index):
+    assert index.retrieve("cats dogs elephants penguins", token_budget=1) == []
+    assert len(index.retrieve("cats dogs elephants penguins", token_budget=1000)) >= 2
+
+def test_search_without_matches(index):
+    assert index.search("quantum chromodynamics") == []
+    assert DocumentIndex().search("cats") == []
+
+def test_large_attachment_is_retrieved_not_inlined(monkeypatch):
+    monkeypatch.setenv('DOCUMENT_INLINE_CHARS', '100')
+    llm_service = MagicMock()
+    llm_service.call_llm.return_value = "LLM response"
+    file_service = MagicMock()
+    document = "\n".join(f"Line {i} about filler content." for i in range(200)) + "\nThe secret launch code is swordfish."
+    file_service.process_files.return_value = [{"type": "text", "name": "report.txt", "text": document}]
+    service = ConversationService(llm_service, file_service)
+
+    service.process_message("What is the secret launch code?", [{"type": "text", "name": "report.txt"}])
+
+    prompt = llm_service.call_llm.call_args[0][0][-1]['content']
+    assert "swordfish" in prompt
+    assert len(prompt) < len(document)
+    assert service.conversation_history[0]['content'][1]['indexed'] is True
@@ -0,0 +1,65 @@
+import io
+import zipfile
+import pytest
+from services.documents import document_kind, extract_document, render_document
+
+def make_docx(paragraphs):
+    namespace = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+    body = "".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('word/document.xml', f'<w:document xmlns:w="{namespace}"><w:body>{body}</w:body></w:document>')
+    return buffer.getvalue()
+
+def make_pdf(pages):
+    # Minimal uncompressed PDF with one line of Helvetica text per page.
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R /Resources << /Font << /F1 3 0 R >> >> >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('latin-1')
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    return output
+
+def test_document_kind_falls_back_to_extension():
+    assert document_kind('pdf', 'scan') == 'pdf'
+    assert document_kind('code', 'Report.DOCX') == 'docx'
+    assert document_kind('code', 'notes.txt') is None
+
+def test_extract_docx_paragraphs():
+    document = extract_document(make_docx(["First", "Second"]), 'docx', max_chars=1000, time_budget=10)
+    assert document == {'text': "First\nSecond\n", 'parts': 2, 'total_parts': None, 'stopped': None}
+    assert render_document('docx', document) == "Word document text, 2 paragraphs:\nFirst\nSecond\n"
+
+def test_extract_docx_stops_at_character_budget():
+    document = extract_document(make_docx([f"Paragraph {i}" for i in range(1000)]), 'docx', max_chars=30, time_budget=10)
+    assert document['text'] == "Paragraph 0\nParagraph 1\nParagr"
+    assert document['stopped'] == 'character limit'
+
+def test_extract_docx_stops_at_time_budget():
+    document = extract_document(make_docx(["First"]), 'docx', max_chars=1000, time_budget=-1)
+    assert document['parts'] == 0
+    assert document['stopped'] == 'time limit'
+
+def test_extract_pdf_page_by_page():
+    pytest.importorskip('pypdf')
+    data = make_pdf(["Alpha page", "Beta page", "Gamma page"])
+    document = extract_document(data, 'pdf', max_chars=1000, time_budget=10)
+    assert document['parts'] == 3 and document['total_parts'] == 3
+    assert "[Page 2]\nBeta page" in document['text']
+
+    document = extract_document(data, 'pdf', max_chars=25, time_budget=10)
+    assert document['parts'] == 2
+    assert document['stopped'] == 'character limit'
+    assert render_document('pdf', document).startswith("PDF text, pages 1-2 of 3 (stopped at the character limit):")
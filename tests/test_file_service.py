@@ -5,6 +5,9 @@ import io
 from PIL import Image
 import csv
 import json
+import zipfile
+from unittest.mock import patch
+from services.documents import extract_document
 
 @pytest.fixture
 def file_service():
@@ -31,13 +34,9 @@ def test_process_csv(file_service):
     csv_data = "Name,Age\nAlice,30\nBob,25"
     csv_base64 = base64.b64encode(csv_data.encode('utf-8')).decode('utf-8')
 
-    processed_csv = file_service.process_csv(csv_base64)
-    assert processed_csv is not None
-    assert isinstance(processed_csv, list)
-    assert len(processed_csv) == 3  # header + 2 data rows
-    assert processed_csv[0] == ['Name', 'Age']
-    assert processed_csv[1] == ['Alice', '30']
-    assert processed_csv[2] == ['Bob', '25']
+    processed_csv = file_service.process_table(csv_base64, 'csv', 'people.csv')
+    assert processed_csv.startswith('CSV Preview of people.csv (2 rows, 2 columns')
+    assert processed_csv.endswith('Name|Age\nAlice|30\nBob|25')
 
 def test_process_text_file(file_service):
     text_data = "This is a test file.\nIt has multiple lines."
@@ -116,4 +115,53 @@ def test_process_invalid_base64(file_service):
     file_data = {'type': 'code', 'data': invalid_base64, 'name': 'invalid.txt'}
     processed_file = file_service.process_file(file_data)
 
-    assert processed_file is None
\ No newline at end of file
+    assert processed_file is None
+
+def test_process_image_downscales_to_max_dimension():
+    file_service = FileService(max_image_dimension=64, image_quality=70)
+    img = Image.new('RGB', (400, 200), color='blue')
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='PNG')
+
+    processed_image = file_service.process_image(base64.b64encode(img_byte_arr.getvalue()).decode('utf-8'))
+
+    processed_img = Image.open(io.BytesIO(base64.b64decode(processed_image)))
+    assert processed_img.size == (64, 32)
+    assert file_service.upload_config() == {'max_image_dimension': 64, 'image_quality': 70}
+
+def test_process_file_table_by_extension(file_service):
+    tsv_base64 = base64.b64encode(b"Name\tAge\nAlice\t30").decode('utf-8')
+    processed_file = file_service.process_file({'type': 'code', 'data': tsv_base64, 'name': 'people.tsv'})
+    assert processed_file['type'] == 'text'
+    assert processed_file['text'].startswith('TSV Preview of people.tsv')
+    assert 'Alice|30' in processed_file['text']
+
+def test_process_file_unreadable_table(file_service):
+    processed_file = file_service.process_file({'type': 'parquet', 'data': base64.b64encode(b"not parquet").decode('utf-8'), 'name': 'data.parquet'})
+    assert processed_file['text'].startswith('Parquet file data.parquet could not be read')
+
+def test_process_files_caches_documents_by_content(file_service):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('word/document.xml', '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                                              '<w:body><w:p><w:r><w:t>Quarterly numbers</w:t></w:r></w:p></w:body></w:document>')
+    docx_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    with patch('services.file_service.extract_document', wraps=extract_document) as mock_extract:
+        first = file_service.process_files([{'type': 'docx', 'data': docx_base64, 'name': 'q1.docx'}])[0]
+        second = file_service.process_files([{'type': 'code', 'data': docx_base64, 'name': 'copy.docx'}])[0]
+    assert mock_extract.call_count == 1
+    assert first['text'] == second['text'] == "Word document text, 1 paragraphs:\nQuarterly numbers\n"
+    assert second['name'] == 'copy.docx'
+    assert file_service.extract_text({'type': 'docx', 'data': docx_base64, 'name': 'q1.docx'}) == first['text']
+
+def test_process_files_does_not_cache_failed_or_timed_out_documents(file_service):
+    broken = {'type': 'docx', 'data': base64.b64encode(b"not a zip").decode('utf-8'), 'name': 'broken.docx'}
+    assert 'could not be read' in file_service.process_files([broken])[0]['text']
+
+    slow = {'type': 'docx', 'data': base64.b64encode(b"slow").decode('utf-8'), 'name': 'slow.docx'}
+    partial = {'text': 'Para', 'parts': 1, 'total_parts': None, 'stopped': 'time limit'}
+    with patch('services.file_service.extract_document', return_value=partial) as mock_extract:
+        file_service.process_files([slow])
+        file_service.process_files([slow])
+    assert mock_extract.call_count == 2
+    assert len(file_service._document_cache) == 0
@@ -0,0 +1,78 @@
+import pytest
+import threading
+import time
+from werkzeug.exceptions import ServiceUnavailable
+from services.job_queue import JobQueue
+
+def test_job_returns_result():
+    job_queue = JobQueue(max_workers=1)
+    job = job_queue.submit(lambda: "done")
+
+    snapshot = job_queue.wait(job, after=0, timeout=2)
+    while snapshot['status'] != 'completed':
+        snapshot = job_queue.wait(job, after=snapshot['next'], timeout=2)
+
+    assert snapshot['result'] == "done"
+    assert job_queue.stats()['completed'] == 1
+
+def test_streaming_job_publishes_deltas():
+    job_queue = JobQueue(max_workers=1)
+    job = job_queue.submit(lambda: iter(["Hel", "lo"]))
+
+    events = list(job_queue.iter_events(job, heartbeat=1))
+
+    assert {'delta': 'Hel'} in events and {'delta': 'lo'} in events
+    assert events[-1] == {'done': True, 'status': 'completed', 'result': 'Hello', 'error': None}
+
+def test_failed_job_reports_error():
+    job_queue = JobQueue(max_workers=1)
+
+    def fail():
+        raise RuntimeError("provider down")
+
+    job = job_queue.submit(fail)
+    events = list(job_queue.iter_events(job, heartbeat=1))
+
+    assert events[-1]['status'] == 'failed'
+    assert events[-1]['error'] == "provider down"
+
+def test_error_result_marks_job_failed():
+    job_queue = JobQueue(max_workers=1)
+    job = job_queue.submit(lambda: {"error": "Failed to get response from LLM"})
+    events = list(job_queue.iter_events(job, heartbeat=1))
+    assert events[-1]['status'] == 'failed'
+
+def test_queue_full_is_rejected_and_queued_job_can_be_cancelled():
+    job_queue = JobQueue(max_workers=1, max_queued=1)
+    release = threading.Event()
+    running = job_queue.submit(lambda: release.wait(5))
+    queued = job_queue.submit(lambda: "never runs")
+
+    with pytest.raises(ServiceUnavailable):
+        job_queue.submit(lambda: "rejected")
+
+    assert job_queue.cancel(queued)['status'] == 'cancelled'
+    release.set()
+    list(job_queue.iter_events(running, heartbeat=1))
+    assert job_queue.stats()['rejected'] == 1
+    assert queued.status == 'cancelled'
+
+def test_running_stream_is_cancelled_between_chunks():
+    job_queue = JobQueue(max_workers=1)
+    closed = threading.Event()
+
+    def chunks():
+        try:
+            for index in range(100):
+                time.sleep(0.02)
+                yield str(index)
+        finally:
+            closed.set()
+
+    job = job_queue.submit(chunks)
+    job_queue.wait(job, after=1, timeout=2)
+    job_queue.cancel(job)
+    events = list(job_queue.iter_events(job, heartbeat=1))
+
+    assert events[-1]['status'] == 'cancelled'
+    assert closed.is_set()
@@ -0,0 +1,34 @@
+import pytest
+from flask import Flask, jsonify, request
+from services import json_codec
+from services.json_codec import JSONProvider
+
+@pytest.fixture(params=['fast', 'stdlib'])
+def codec(request, monkeypatch):
+    if request.param == 'stdlib':
+        monkeypatch.setattr(json_codec, 'orjson', None)
+    return json_codec
+
+def test_round_trip(codec):
+    payload = {"messages": [{"role": "user", "content": "héllo"}], "max_tokens": 10}
+    encoded = codec.dumps(payload)
+    assert isinstance(encoded, bytes)
+    assert b" " not in encoded.replace("héllo".encode('utf-8'), b"")
+    assert codec.loads(encoded) == payload
+    assert codec.loads(encoded.decode('utf-8')) == payload
+
+def test_sort_keys_is_canonical(codec):
+    assert codec.dumps({"b": 1, "a": 2}, sort_keys=True) == codec.dumps({"a": 2, "b": 1}, sort_keys=True)
+
+def test_flask_provider_parses_requests_and_serializes_responses(codec):
+    app = Flask(__name__)
+    app.json = JSONProvider(app)
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return jsonify(request.json)
+
+    response = app.test_client().post('/echo', json={"files": [{"data": "QUJD" * 1000}]})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert response.get_json() == {"files": [{"data": "QUJD" * 1000}]}
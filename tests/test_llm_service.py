@@ -1,3 +1,5 @@
+import json
+import logging
 import pytest
 from unittest.mock import patch, MagicMock
 from services.llm_service import LLMService
@@ -56,26 +58,35 @@ def test_call_llm(mock_call_chatgpt, mock_call_claude, llm_service):
 @patch('services.llm_service.requests.post')
 def test_call_claude_success(mock_post, llm_service):
     mock_response = MagicMock()
-    mock_response.json.return_value = {'content': [{'text': 'Claude test response'}]}
+    mock_response.content = json.dumps({'content': [{'text': 'Claude test response'}]}).encode('utf-8')
     mock_post.return_value = mock_response
 
     messages = [{'role': 'user', 'content': 'Test message'}]
     result = llm_service.call_claude(messages)
 
     assert result == 'Claude test response'
-    mock_post.assert_called_once_with(
-        llm_service.claude_api_url,
-        json={
-            'model': 'claude-3-sonnet-20240229',
-            'max_tokens': 1000,
-            'messages': messages
-        },
-        headers={
-            'Content-Type': 'application/json',
-            'anthropic-version': '2023-06-01',
-            'x-api-key': 'test_claude_key',
-        }
-    )
+    mock_post.assert_called_once()
+    assert mock_post.call_args[0][0] == llm_service.claude_api_url
+    assert json.loads(mock_post.call_args[1]['data']) == {
+        'model': 'claude-3-sonnet-20240229',
+        'max_tokens': llm_service.default_max_tokens,
+        'messages': messages
+    }
+    assert mock_post.call_args[1]['headers'] == {
+        'Content-Type': 'application/json',
+        'anthropic-version': '2023-06-01',
+        'x-api-key': 'test_claude_key',
+    }
+
+@patch('services.llm_service.requests.post')
+def test_call_claude_non_json_body(mock_post, llm_service):
+    mock_response = MagicMock()
+    mock_response.content = b'<html>Bad gateway</html>'
+    mock_post.return_value = mock_response
+
+    result = llm_service.call_claude([{'role': 'user', 'content': 'Test message'}])
+
+    assert result.startswith("I'm sorry, but I experienced an error")
 
 @patch('services.llm_service.requests.post')
 def test_call_claude_error(mock_post, llm_service):
@@ -119,4 +130,112 @@ def test_call_chatgpt_error(mock_post, llm_service):
     result = llm_service.call_chatgpt(messages)
 
     assert result is None
-    mock_post.assert_called_once()
\ No newline at end of file
+    mock_post.assert_called_once()
+
+@patch('services.llm_service.requests.post')
+def test_call_openai_chat_success(mock_post, llm_service):
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({'choices': [{'message': {'content': 'GPT chat response'}}]}).encode('utf-8')
+    mock_post.return_value = mock_response
+    llm_service.current_model = 'gpt-4-turbo'
+
+    messages = [{'role': 'user', 'content': 'Test message'}]
+    assert llm_service.call_llm(messages) == 'GPT chat response'
+
+    mock_post.assert_called_once()
+    assert mock_post.call_args[0][0] == llm_service.openai_chat_url
+    payload = json.loads(mock_post.call_args[1]['data'])
+    assert payload['model'] == 'gpt-4-turbo'
+    assert payload['messages'][0]['role'] == 'system'
+    assert payload['messages'][-1] == {'role': 'user', 'content': 'Test message'}
+
+def test_openai_chat_payload_includes_images(llm_service):
+    llm_service.current_model = 'gpt-4-turbo'
+    files = [{'type': 'image', 'name': 'a.jpg', 'source': {'type': 'base64', 'media_type': 'image/jpeg', 'data': 'abc'}}]
+    payload = llm_service._openai_chat_payload([{'role': 'user', 'content': 'Describe'}], files)
+    content = payload['messages'][-1]['content']
+    assert content[0] == {'type': 'text', 'text': 'Describe'}
+    assert content[1]['image_url']['url'] == 'data:image/jpeg;base64,abc'
+
+@patch('services.llm_service.requests.post')
+def test_stream_openai_chat(mock_post, llm_service):
+    mock_response = MagicMock()
+    mock_response.__enter__.return_value = mock_response
+    mock_response.iter_lines.return_value = [
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+        '',
+        'data: {"choices": [{"delta": {"content": "Hel"}}]}',
+        'data: {"choices": [{"delta": {"content": "lo"}}]}',
+        'data: [DONE]',
+    ]
+    mock_post.return_value = mock_response
+    llm_service.current_model = 'gpt-4-turbo'
+
+    chunks = list(llm_service.stream_llm([{'role': 'user', 'content': 'Hi'}]))
+    assert chunks == ['Hel', 'lo']
+    assert json.loads(mock_post.call_args[1]['data'])['stream'] is True
+
+@patch('services.llm_service.LLMService.call_openai_assistant')
+@patch('services.llm_service.LLMService.call_openai_chat')
+def test_call_llm_uses_assistant_only_for_custom_assistant(mock_chat, mock_assistant, llm_service):
+    llm_service.current_model = 'gpt-4-turbo'
+    messages = [{'role': 'user', 'content': 'Test message'}]
+
+    llm_service.call_llm(messages)
+    mock_chat.assert_called_once()
+    mock_assistant.assert_not_called()
+
+    llm_service.call_llm(messages, assistant_id='asst_custom')
+    mock_assistant.assert_called_once()
+
+@patch('services.llm_service.LLMService.call_openai_chat')
+@patch('services.llm_service.LLMService.call_claude')
+def test_call_llm_with_request_model(mock_call_claude, mock_call_openai_chat, llm_service):
+    messages = [{'role': 'user', 'content': 'Test message'}]
+    mock_call_openai_chat.return_value = 'GPT response'
+
+    assert llm_service.call_llm(messages, model='gpt-3.5-turbo') == 'GPT response'
+    mock_call_openai_chat.assert_called_once_with(messages, None, None, 'gpt-3.5-turbo')
+    mock_call_claude.assert_not_called()
+    assert llm_service.current_model == 'claude-3-sonnet-20240229'
+
+    with pytest.raises(ValueError):
+        llm_service.call_llm(messages, model='invalid-model')
+
+def test_resolve_model(llm_service):
+    assert llm_service.resolve_model() == llm_service.current_model
+    assert llm_service.resolve_model('gpt-4-turbo') == 'gpt-4-turbo'
+    assert llm_service.provider_for('gpt-4-turbo') == 'openai'
+    assert llm_service.provider_for('claude-3-sonnet-20240229') == 'anthropic'
+    with pytest.raises(ValueError):
+        llm_service.resolve_model('invalid-model')
+
+@patch('services.llm_service.requests.post')
+def test_measure_llm_reports_usage_and_ttfb(mock_post, llm_service):
+    mock_response = MagicMock()
+    mock_response.iter_lines.return_value = [
+        'data: {"choices": [{"delta": {"content": "Hi"}}]}',
+        'data: {"choices": [], "usage": {"prompt_tokens": 7, "completion_tokens": 1}}',
+        'data: [DONE]'
+    ]
+    mock_post.return_value.__enter__.return_value = mock_response
+
+    result = llm_service.measure_llm([{'role': 'user', 'content': 'Hello'}], model='gpt-4-turbo')
+
+    assert result['response'] == 'Hi'
+    assert result['usage'] == {'input_tokens': 7, 'output_tokens': 1}
+    assert result['ttfb_ms'] <= result['latency_ms']
+    assert json.loads(mock_post.call_args.kwargs['data'])['stream_options'] == {'include_usage': True}
+
+@patch('services.llm_service.requests.post')
+def test_call_claude_logs_payload_size_not_content(mock_post, llm_service, caplog):
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({'content': [{'text': 'ok'}]})
+    mock_post.return_value = mock_response
+    secret = "x" * 5000
+
+    with caplog.at_level(logging.DEBUG, logger='services.llm_service'):
+        llm_service.call_llm([{'role': 'user', 'content': secret}], model='claude-3-sonnet-20240229')
+
+    assert secret not in caplog.text
+    assert "Claude API payload:" in caplog.text
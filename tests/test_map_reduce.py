@@ -0,0 +1,148 @@
+import pytest
+import base64
+import hashlib
+import threading
+import time
+from unittest.mock import MagicMock
+from services.map_reduce import MapReduceProcessor
+from services.llm_service import REQUEST_ERROR_REPLY
+from services.conversation_service import ConversationService
+from services.file_service import FileService
+
+def _fake_llm(delay=0.0):
+    llm_service = MagicMock()
+    lock = threading.Lock()
+    calls = []
+
+    def call_llm(messages, model=None, **kwargs):
+        prompt = messages[-1]['content']
+        with lock:
+            calls.append(prompt)
+        time.sleep(delay)
+        if prompt.startswith("Below is part"):
+            return "note: " + prompt.split("\n\n", 1)[1].strip()
+        return "answer from notes"
+
+    llm_service.call_llm.side_effect = call_llm
+    return llm_service, calls
+
+def test_run_maps_each_chunk_and_reduces():
+    llm_service, calls = _fake_llm()
+    processor = MapReduceProcessor(llm_service, chunk_chars=25, max_concurrency=4)
+
+    answer = processor.run("What is in it?", [("doc.txt", "alpha line\nbeta line\ngamma line\ndelta line")])
+
+    assert answer == "answer from notes"
+    map_calls = [call for call in calls if call.startswith("Below is part")]
+    assert len(map_calls) == 2
+    assert "Question: What is in it?" in calls[-1]
+
+def test_chunk_notes_are_cached_across_questions():
+    llm_service, calls = _fake_llm()
+    processor = MapReduceProcessor(llm_service, chunk_chars=25, max_concurrency=4)
+    documents = [("doc.txt", "alpha line\nbeta line\ngamma line\ndelta line")]
+
+    processor.run("First question?", documents)
+    calls.clear()
+    processor.run("Follow-up question?", documents)
+
+    assert len(calls) == 1
+    assert processor.stats()['cache_hits'] == 2
+
+def test_failed_chunk_notes_are_not_cached():
+    llm_service, calls = _fake_llm()
+    working = llm_service.call_llm.side_effect
+    llm_service.call_llm.side_effect = lambda messages, model=None, **kwargs: REQUEST_ERROR_REPLY
+    processor = MapReduceProcessor(llm_service, chunk_chars=25, max_concurrency=4)
+    documents = [("doc.txt", "alpha line\nbeta line\ngamma line\ndelta line")]
+
+    assert processor.run("First question?", documents) == REQUEST_ERROR_REPLY
+    assert processor.stats()['cached_chunks'] == 0
+
+    llm_service.call_llm.side_effect = working
+    assert processor.run("Retry?", documents) == "answer from notes"
+    assert len([call for call in calls if call.startswith("Below is part")]) == 2
+    assert processor.stats()['cached_chunks'] == 2
+
+def test_chunks_run_concurrently():
+    llm_service, _ = _fake_llm(delay=0.2)
+    processor = MapReduceProcessor(llm_service, chunk_chars=12, max_concurrency=8)
+    text = "\n".join(f"line number {i}" for i in range(8))
+
+    start = time.monotonic()
+    processor.run("Question?", [("doc.txt", text)])
+    elapsed = time.monotonic() - start
+
+    # Eight map calls plus one reduce call, each 0.2s: serial would take 1.8s.
+    assert elapsed < 1.0
+
+def test_conversation_map_reduce_mode():
+    llm_service, _ = _fake_llm()
+    service = ConversationService(llm_service, FileService())
+    service.map_reduce.chunk_chars = 20
+    document = base64.b64encode(b"alpha line\nbeta line\ngamma line").decode('utf-8')
+
+    result = service.process_message("Summarize", [{'type': 'text', 'name': 'doc.txt', 'data': document}], mode='map_reduce')
+    assert result == "answer from notes"
+
+    follow_up = service.process_message("And the beta line?", [], mode='map_reduce')
+    assert follow_up == "answer from notes"
+    assert service.map_reduce.stats()['cache_hits'] >= 1
+    assert len(service.conversation_history) == 4
+
+def test_map_reduce_processes_each_file_once():
+    llm_service, _ = _fake_llm()
+    file_service = FileService()
+    service = ConversationService(llm_service, file_service)
+    document = base64.b64encode(b"alpha line\nbeta line").decode('utf-8')
+    calls = []
+    extract_text = file_service.extract_text
+    file_service.extract_text = lambda file: calls.append(file['name']) or extract_text(file)
+
+    service.process_message("Summarize", [{'type': 'text', 'name': 'doc.txt', 'data': document}], mode='map_reduce')
+
+    assert calls == ['doc.txt']
+    assert [name for name, _ in service.map_reduce_documents] == ['doc.txt']
+
+def test_map_reduce_reads_past_the_attachment_caps():
+    llm_service, calls = _fake_llm()
+    service = ConversationService(llm_service, FileService())
+    service.map_reduce.chunk_chars = 200000
+    text = ("filler line\n" * 200000) + "END MARKER\n"
+    rows = "id,value\n" + "".join(f"{i},row {i}\n" for i in range(10000))
+    files = [
+        {'type': 'text', 'name': 'big.txt', 'data': base64.b64encode(text.encode('utf-8')).decode('utf-8')},
+        {'type': 'csv', 'name': 'rows.csv', 'data': base64.b64encode(rows.encode('utf-8')).decode('utf-8')}
+    ]
+
+    service.process_message("Summarize", files, mode='map_reduce')
+
+    map_calls = [call for call in calls if call.startswith("Below is part")]
+    assert len(text) > 1000000
+    assert any("END MARKER" in call for call in map_calls)
+    assert any("9999,row 9999" in call for call in map_calls)
+
+def test_map_reduce_resent_file_is_not_duplicated():
+    llm_service, calls = _fake_llm()
+    service = ConversationService(llm_service, FileService())
+    service.map_reduce.chunk_chars = 1000
+    raw = b"alpha line\nbeta line"
+    file = {'type': 'text', 'name': 'doc.txt', 'data': base64.b64encode(raw).decode('utf-8')}
+
+    service.process_message("Summarize", [file], mode='map_reduce')
+    calls.clear()
+    ref = {'type': 'text', 'name': 'doc.txt', 'ref': hashlib.sha256(raw).hexdigest()}
+    service.process_message("And beta?", [ref], mode='map_reduce')
+    service.process_message("And alpha?", [ref], mode='map_reduce')
+
+    assert len(service.map_reduce_documents) == 1
+    assert calls[-1].count("note: alpha line") == 1
+
+def test_cancelled_map_reduce_reply_is_not_stored():
+    llm_service, _ = _fake_llm()
+    service = ConversationService(llm_service, FileService())
+    document = base64.b64encode(b"alpha line").decode('utf-8')
+
+    service.process_message("Summarize", [{'type': 'text', 'name': 'doc.txt', 'data': document}], mode='map_reduce', cancelled=lambda: True)
+
+    assert [message['role'] for message in service.conversation_history] == ['user']
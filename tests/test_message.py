@@ -0,0 +1,32 @@
+import json
+from services.message import Message, ContentPart
+
+def test_message_compares_equal_to_dict():
+    raw = {"role": "user", "content": [
+        {"type": "text", "text": "Hello"},
+        {"type": "text", "name": "notes.txt", "blob_ref": "abc", "indexed": True}
+    ]}
+    message = Message.from_dict(json.loads(json.dumps(raw)))
+
+    assert message == raw
+    assert message.to_dict() == raw
+    assert message['content'][1]['indexed'] is True
+    assert 'blob_ref' in message['content'][1]
+    assert message['content'][0].get('name') is None
+    assert message.text == "Hello"
+
+def test_roles_and_types_are_interned():
+    first = Message.from_dict(json.loads('{"role": "user", "content": [{"type": "text", "text": "a"}]}'))
+    second = Message.from_dict(json.loads('{"role": "user", "content": [{"type": "text", "text": "b"}]}'))
+    assert first.role is second.role
+    assert first.content[0].type is second.content[0].type
+
+def test_unknown_part_keys_round_trip():
+    part = ContentPart.from_dict({"type": "image", "name": "cat.png", "source": {"data": "xyz"}})
+    assert part['source'] == {"data": "xyz"}
+    assert part.to_dict() == {"type": "image", "name": "cat.png", "source": {"data": "xyz"}}
+
+def test_message_has_no_instance_dict():
+    message = Message.from_dict({"role": "assistant", "content": [{"type": "text", "text": "Hi"}]})
+    assert not hasattr(message, '__dict__')
+    assert not hasattr(message.content[0], '__dict__')
@@ -0,0 +1,88 @@
+import pytest
+import time
+from unittest.mock import MagicMock
+from werkzeug.exceptions import Conflict
+from services.model_comparison import ModelComparison
+
+def _fake_llm(delays):
+    llm_service = MagicMock()
+    llm_service.resolve_model.side_effect = lambda model: model
+
+    def measure_llm(messages, files=None, model=None, on_delta=None, **kwargs):
+        if delays[model] < 0:
+            raise RuntimeError("provider down")
+        time.sleep(delays[model])
+        if on_delta:
+            on_delta(f"answer from {model}")
+        return {'model': model, 'response': f"answer from {model}", 'latency_ms': delays[model] * 1000,
+                'ttfb_ms': 0.0, 'usage': {'input_tokens': 10, 'output_tokens': 5}}
+
+    llm_service.measure_llm.side_effect = measure_llm
+    return llm_service
+
+def test_compare_runs_models_concurrently():
+    llm_service = _fake_llm({'model-a': 0.3, 'model-b': 0.3, 'model-c': 0.3})
+    comparison = ModelComparison(llm_service, MagicMock())
+
+    started = time.perf_counter()
+    result = comparison.compare("Hi", [], ['model-a', 'model-b', 'model-c'])
+    elapsed = time.perf_counter() - started
+
+    assert [r['model'] for r in result['results']] == ['model-a', 'model-b', 'model-c']
+    assert result['results'][0]['usage'] == {'input_tokens': 10, 'output_tokens': 5}
+    assert elapsed < 0.6
+
+def test_attachments_are_processed_once():
+    llm_service = _fake_llm({'model-a': 0, 'model-b': 0})
+    file_service = MagicMock()
+    file_service.process_files.return_value = [{'type': 'text', 'name': 'notes.txt', 'text': 'file body'}]
+    comparison = ModelComparison(llm_service, file_service)
+
+    comparison.compare("Summarize", [{'name': 'notes.txt'}], ['model-a', 'model-b'])
+
+    file_service.process_files.assert_called_once()
+    prompts = [call.args[0][0]['content'] for call in llm_service.measure_llm.call_args_list]
+    assert all("File: notes.txt\nContent: file body" in prompt for prompt in prompts)
+
+def test_attachment_refs_are_resolved():
+    llm_service = _fake_llm({'model-a': 0})
+    file_service = MagicMock()
+    file_service.process_files.return_value = [{'type': 'text', 'name': 'new.txt', 'text': 'new body'}]
+    stored = {'abc': {'type': 'text', 'name': 'old.txt', 'text': 'old body'}}
+    comparison = ModelComparison(llm_service, file_service, stored.__getitem__)
+
+    comparison.compare("Summarize", [{'name': 'old.txt', 'ref': 'abc'}, {'name': 'new.txt', 'data': 'bmV3'}], ['model-a'])
+
+    file_service.process_files.assert_called_once_with([{'name': 'new.txt', 'data': 'bmV3'}])
+    prompt = llm_service.measure_llm.call_args.args[0][0]['content']
+    assert prompt.index("File: old.txt\nContent: old body") < prompt.index("File: new.txt\nContent: new body")
+
+def test_attachment_refs_without_resolver_conflict():
+    comparison = ModelComparison(_fake_llm({'model-a': 0}), MagicMock())
+    with pytest.raises(Conflict):
+        comparison.compare("Hi", [{'name': 'old.txt', 'ref': 'abc'}], ['model-a'])
+
+def test_failing_model_does_not_fail_comparison():
+    llm_service = _fake_llm({'model-a': 0, 'model-b': -1})
+    comparison = ModelComparison(llm_service, MagicMock())
+
+    result = comparison.compare("Hi", [], ['model-a', 'model-b'])
+
+    assert result['results'][0]['response'] == "answer from model-a"
+    assert result['results'][1] == {'model': 'model-b', 'error': 'provider down'}
+
+def test_duplicate_and_missing_models():
+    comparison = ModelComparison(_fake_llm({}), MagicMock())
+    assert comparison.resolve_models(['model-a', 'model-a']) == ['model-a']
+    with pytest.raises(ValueError):
+        comparison.resolve_models([])
+
+def test_stream_compare_emits_deltas_and_results():
+    llm_service = _fake_llm({'model-a': 0, 'model-b': 0.1})
+    comparison = ModelComparison(llm_service, MagicMock())
+
+    events = list(comparison.stream_compare("Hi", [], ['model-a', 'model-b']))
+
+    assert {'model': 'model-a', 'delta': 'answer from model-a'} in events
+    assert [event['model'] for event in events if 'result' in event] == ['model-a', 'model-b']
+    assert events[-1]['done'] is True
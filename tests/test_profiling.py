@@ -0,0 +1,72 @@
+import threading
+import time
+import pytest
+from services.message import Message
+from services.profiling import MemoryProfiler, ProfilingTools, SamplingProfiler, deep_sizeof, module_for_filename
+
+def test_module_for_filename():
+    import services.file_service
+    assert module_for_filename(services.file_service.__file__) == 'services.file_service'
+
+def test_sampling_profiler_collects_folded_stacks():
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop, name='busy-worker')
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001)
+    try:
+        profiler.start()
+        time.sleep(0.2)
+        status = profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+    assert not status['running']
+    assert status['samples'] > 0
+    lines = profiler.folded().splitlines()
+    assert any(line.startswith('busy-worker;') and 'busy_loop' in line for line in lines)
+    assert not any('sampling-profiler' in line for line in lines)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+def test_sampling_profiler_stops_at_time_limit():
+    profiler = SamplingProfiler(interval=0.001, max_seconds=0.05)
+    profiler.start()
+    time.sleep(0.3)
+    assert not profiler.status()['running']
+
+def test_memory_profiler_diff_by_module():
+    profiler = MemoryProfiler()
+    try:
+        assert profiler.snapshot()['traced_bytes'] >= 0
+        retained = [bytearray(1024) for _ in range(200)]
+        profiler.snapshot()
+        modules = {entry['module']: entry for entry in profiler.diff()['modules']}
+        assert modules[__name__]['size_diff'] >= 200 * 1024
+    finally:
+        profiler.stop()
+    assert retained
+
+def test_memory_profiler_diff_requires_two_snapshots():
+    profiler = MemoryProfiler()
+    try:
+        profiler.snapshot()
+        with pytest.raises(ValueError):
+            profiler.diff()
+    finally:
+        profiler.stop()
+
+def test_deep_sizeof_follows_slots():
+    message = Message.from_dict({'role': 'user', 'content': [{'type': 'text', 'text': 'x' * 10000}]})
+    assert deep_sizeof(message) > 10000
+    assert deep_sizeof([message, message]) < 2 * deep_sizeof(message)
+
+def test_profiling_tools_authorized():
+    tools = ProfilingTools('secret')
+    assert tools.authorized('secret')
+    assert not tools.authorized('other')
+    assert not tools.authorized(None)
+    assert not tools.authorized('sécret')
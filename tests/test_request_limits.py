@@ -0,0 +1,53 @@
+import pytest
+import base64
+import io
+from flask import Flask, json, request, jsonify
+from PIL import Image
+from werkzeug.exceptions import RequestEntityTooLarge
+from services.request_limits import RequestLimits
+from services.file_service import FileService
+
+@pytest.fixture
+def limits():
+    return RequestLimits(max_content_length=1024, endpoint_limits={'small': 16}, max_attachments=2, max_attachment_bytes=30)
+
+@pytest.fixture
+def client(limits):
+    app = Flask(__name__)
+    limits.init_app(app)
+
+    @app.route('/small', methods=['POST'])
+    def small():
+        return jsonify(request.json)
+
+    @app.route('/large', methods=['POST'])
+    def large():
+        return jsonify(request.json)
+
+    with app.test_client() as client:
+        yield client
+
+def test_rejects_body_over_endpoint_limit(client):
+    response = client.post('/small', json={'message': 'x' * 100})
+    assert response.status_code == 413
+    assert 'error' in json.loads(response.data)
+
+def test_default_limit_applies_to_other_endpoints(client):
+    assert client.post('/large', json={'message': 'x' * 100}).status_code == 200
+    assert client.post('/large', json={'message': 'x' * 2000}).status_code == 413
+
+def test_check_attachments(limits):
+    limits.check_attachments([{'name': 'a.txt', 'data': 'a' * 40}])
+    with pytest.raises(RequestEntityTooLarge):
+        limits.check_attachments([{'name': 'a.txt', 'data': 'a' * 100}])
+    with pytest.raises(RequestEntityTooLarge):
+        limits.check_attachments([{'data': ''}, {'data': ''}, {'data': ''}])
+
+def test_process_image_rejects_too_many_pixels():
+    img = Image.new('RGB', (100, 100), color='red')
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+    assert FileService(max_image_pixels=5000).process_image(img_base64) is None
+    assert FileService(max_image_pixels=10000).process_image(img_base64) is not None
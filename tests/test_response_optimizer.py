@@ -0,0 +1,76 @@
+import gzip
+import zlib
+import pytest
+from flask import Flask, Response, jsonify, render_template_string, stream_with_context
+from services.response_optimizer import ResponseOptimizer, IMMUTABLE_CACHE_CONTROL
+
+@pytest.fixture
+def app(tmp_path):
+    (tmp_path / 'app.js').write_text('console.log("hello");\n' * 200)
+    app = Flask(__name__, static_folder=str(tmp_path), static_url_path='/static')
+    ResponseOptimizer(min_size=100, etag_endpoints=('models',)).init_app(app)
+
+    @app.route('/models')
+    def models():
+        return jsonify(['model-a', 'model-b'])
+
+    @app.route('/big')
+    def big():
+        return jsonify({'text': 'x' * 5000})
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/stream')
+    def stream():
+        def generate():
+            for index in range(3):
+                yield f"data: {index}\n\n"
+        return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
+    @app.route('/page')
+    def page():
+        return render_template_string("{{ url_for('static', filename='app.js') }}")
+
+    return app
+
+def test_large_json_is_gzipped(app):
+    response = app.test_client().get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert b'x' * 5000 in gzip.decompress(response.data)
+
+def test_small_or_unaccepted_responses_are_not_compressed(app):
+    client = app.test_client()
+    assert 'Content-Encoding' not in client.get('/small', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get('/big').headers
+
+def test_streamed_response_is_compressed_incrementally(app):
+    response = app.test_client().get('/stream', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    chunks = [decompressor.decompress(chunk) for chunk in response.response]
+    assert chunks[0] == b"data: 0\n\n"
+    assert b"".join(chunks) == b"data: 0\n\ndata: 1\n\ndata: 2\n\n"
+
+def test_etag_endpoint_returns_304(app):
+    client = app.test_client()
+    first = client.get('/models')
+    assert first.headers['ETag']
+    second = client.get('/models', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+
+def test_fingerprinted_static_assets_are_immutable(app):
+    client = app.test_client()
+    url = client.get('/page').get_data(as_text=True)
+    assert '?v=' in url
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].endswith('-gzip"')
+
+    revalidated = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert client.get('/static/app.js').headers['Cache-Control'] == 'no-cache'
@@ -69,4 +69,121 @@ def test_export_chat_route(mock_export_chat, client):
 
 def test_invalid_route(client):
     response = client.get('/invalid_route')
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_history_route(client):
+    response = client.get('/history?limit=10')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert 'messages' in data
+    assert 'next_before' in data
+
+@patch('services.conversation_service.ConversationService.get_history_page')
+def test_history_route_clamps_limit(mock_get_history_page, client):
+    mock_get_history_page.return_value = {'messages': [], 'next_before': None}
+    client.get('/history?limit=0')
+    client.get('/history?limit=-5')
+    client.get('/history?limit=10000')
+    assert [call.args[1] for call in mock_get_history_page.call_args_list] == [1, 1, 500]
+
+def test_export_chat_stream_route(client):
+    response = client.get('/export_chat/stream?format=json')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert 'messages' in json.loads(response.data)
+
+def test_export_chat_stream_invalid_format(client):
+    response = client.get('/export_chat/stream?format=xml')
+    assert response.status_code == 400
+
+def test_chat_route_rejects_oversized_attachment(client):
+    files = [{'type': 'code', 'name': 'big.txt', 'data': 'a' * (30 * 1024 * 1024)}]
+    response = client.post('/chat', json={'message': 'Test message', 'files': files})
+    assert response.status_code == 413
+
+@patch('services.conversation_service.ConversationService.stream_message')
+def test_chat_stream_route(mock_stream_message, client):
+    mock_stream_message.return_value = iter(['Hello', ' world'])
+    response = client.post('/chat/stream', json={'message': 'Test message'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert 'data: {"delta": "Hello"}' in body
+    assert 'data: {"done": true}' in body
+
+def test_metrics_route(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert 'coalesced' in json.loads(response.data)['single_flight']
+    assert 'hit_rate' in json.loads(response.data)['thread_pool']
+
+@patch('services.llm_service.LLMService.measure_llm')
+def test_chat_compare_route(mock_measure_llm, client):
+    mock_measure_llm.side_effect = lambda messages, files=None, model=None, **kwargs: {'model': model, 'response': 'ok'}
+    response = client.post('/chat/compare', json={'message': 'Hi', 'models': ['gpt-4-turbo', 'claude-3-sonnet-20240229']})
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [result['model'] for result in data['results']] == ['gpt-4-turbo', 'claude-3-sonnet-20240229']
+    assert 'wall_time_ms' in data
+
+def test_chat_compare_route_unknown_attachment_ref(client):
+    response = client.post('/chat/compare', json={'message': 'Hi', 'models': ['gpt-4-turbo'], 'files': [{'name': 'a.txt', 'type': 'text', 'ref': 'deadbeef'}]})
+    assert response.status_code == 409
+
+def test_chat_compare_route_rejects_unknown_model(client):
+    response = client.post('/chat/compare', json={'message': 'Hi', 'models': ['unknown-model']})
+    assert response.status_code == 400
+
+@patch('services.conversation_service.ConversationService.stream_message')
+def test_chat_route_async_job(mock_stream_message, client):
+    mock_stream_message.return_value = iter(['Hello', ' world'])
+    response = client.post('/chat', json={'message': 'Test message', 'async': True})
+    assert response.status_code == 202
+    job_id = json.loads(response.data)['job_id']
+
+    body = client.get(f'/jobs/{job_id}/events').get_data(as_text=True)
+    assert 'data: {"delta": "Hello"}' in body
+    assert '"result": "Hello world"' in body
+
+    job = json.loads(client.get(f'/jobs/{job_id}?wait=1').data)
+    assert job['status'] == 'completed'
+
+def test_unknown_job_route(client):
+    assert client.get('/jobs/missing').status_code == 404
+    assert client.post('/jobs/missing/cancel').status_code == 404
+
+def test_chat_route_sheds_load_with_retry_after():
+    from services.admission_controller import AdmissionController
+    admission = AdmissionController(default_limit=1, max_queue=0)
+    with patch('app.AdmissionController', lambda **kwargs: admission):
+        app = create_app()
+    admission.acquire('anthropic')
+    with app.test_client() as client:
+        response = client.post('/chat', json={'message': 'Test message'})
+        assert response.status_code == 503
+        assert int(response.headers['Retry-After']) >= 1
+        assert json.loads(client.get('/metrics').data)['admission']['anthropic']['shed_queue_full'] == 1
+
+def test_chat_route_unknown_attachment_ref(client):
+    response = client.post('/chat', json={'message': 'Hi', 'files': [{'name': 'a.png', 'type': 'image', 'ref': 'deadbeef'}]})
+    assert response.status_code == 409
+
+def test_upload_config_route(client):
+    response = client.get('/upload_config')
+    assert response.status_code == 200
+    assert 'max_image_dimension' in json.loads(response.data)
+
+def test_admin_routes_absent_by_default(client):
+    assert client.get('/admin/profile').status_code == 404
+
+def test_admin_routes_require_token(monkeypatch):
+    monkeypatch.setenv('ENABLE_PROFILING', '1')
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    app = create_app()
+    with app.test_client() as client:
+        assert client.get('/admin/profile').status_code == 403
+        assert client.get('/admin/profile', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+        assert client.post('/admin/memory/stop', headers={'X-Admin-Token': 'sécret'}).status_code == 403
+        response = client.get('/admin/memory/sessions', headers={'X-Admin-Token': 'secret'})
+        assert response.status_code == 200
+        assert 'history_bytes' in json.loads(response.data)
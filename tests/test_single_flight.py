@@ -0,0 +1,95 @@
+import pytest
+import threading
+import time
+from services.single_flight import SingleFlight
+
+def _run_concurrently(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+def test_concurrent_duplicates_share_one_call():
+    single_flight = SingleFlight()
+    calls = []
+
+    def slow_call():
+        calls.append(1)
+        time.sleep(0.2)
+        return "shared result"
+
+    results, errors = _run_concurrently(5, lambda: single_flight.do("key", slow_call))
+
+    assert results == ["shared result"] * 5
+    assert len(calls) == 1
+    stats = single_flight.stats()
+    assert stats['leaders'] == 1
+    assert stats['coalesced'] == 4
+    assert stats['in_flight'] == 0
+
+def test_errors_propagate_to_all_waiters():
+    single_flight = SingleFlight()
+
+    def failing_call():
+        time.sleep(0.2)
+        raise RuntimeError("provider down")
+
+    results, errors = _run_concurrently(3, lambda: single_flight.do("key", failing_call))
+
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert single_flight.stats()['errors'] == 1
+
+def test_sequential_calls_are_not_cached():
+    single_flight = SingleFlight()
+    assert single_flight.do("key", lambda: 1) == 1
+    assert single_flight.do("key", lambda: 2) == 2
+
+def test_concurrent_duplicate_streams_share_one_source():
+    single_flight = SingleFlight()
+    sources = []
+
+    def source():
+        sources.append(1)
+        for chunk in ["a", "b", "c"]:
+            time.sleep(0.05)
+            yield chunk
+
+    results, errors = _run_concurrently(4, lambda: list(single_flight.do_stream("key", source)))
+
+    assert results == [["a", "b", "c"]] * 4
+    assert len(sources) == 1
+    assert single_flight.stats()['stream_coalesced'] == 3
+
+def test_stream_continues_when_first_consumer_leaves():
+    single_flight = SingleFlight()
+
+    def source():
+        yield from ["a", "b", "c"]
+
+    first = single_flight.do_stream("key", source)
+    second = single_flight.do_stream("key", source)
+    assert next(first) == "a"
+    first.close()
+
+    assert list(second) == ["a", "b", "c"]
+
+def test_stream_errors_propagate():
+    single_flight = SingleFlight()
+
+    def source():
+        yield "a"
+        raise RuntimeError("stream broke")
+
+    with pytest.raises(RuntimeError):
+        list(single_flight.do_stream("key", source))
@@ -0,0 +1,72 @@
+import io
+import pytest
+from services.tabular import read_table, render_table, summarize_columns, table_kind
+
+CSV_DATA = b"Name,Age,City\nAlice,30,Paris\nBob,25,\nCarol,41,Paris\n"
+
+def test_table_kind_falls_back_to_extension():
+    assert table_kind('csv', 'data.txt') == 'csv'
+    assert table_kind('code', 'export.PARQUET') == 'parquet'
+    assert table_kind(None, 'report.xlsx') == 'xlsx'
+    assert table_kind('code', 'script.py') is None
+    assert table_kind('image', 'chart.csv') is None
+
+def test_read_delimited_is_column_major():
+    table = read_table(b"a\tb\n1\t2\n3\n", 'tsv', max_rows=10, max_columns=10)
+    assert table['columns'] == ['a', 'b']
+    assert table['data'] == [['1', '3'], ['2', '']]
+    assert table['total_rows'] == 2
+
+def test_read_delimited_stops_at_row_budget():
+    data = b"n\n" + b"".join(f"{i}\n".encode() for i in range(10000))
+    table = read_table(data, 'csv', max_rows=5, max_columns=10)
+    assert table['data'] == [['0', '1', '2', '3', '4']]
+    assert table['total_rows'] is None
+
+def test_read_delimited_projects_columns():
+    table = read_table(b"a,b,c\n1,2,3\n", 'csv', max_rows=10, max_columns=2)
+    assert table['columns'] == ['a', 'b']
+    assert table['data'] == [['1'], ['2']]
+
+def test_summarize_columns():
+    summaries = summarize_columns(read_table(CSV_DATA, 'csv', max_rows=10, max_columns=10))
+    name, age, city = summaries
+    assert name == {'name': 'Name', 'type': 'text', 'nulls': 0, 'distinct': 3}
+    assert age['type'] == 'int' and (age['min'], age['max']) == (25, 41)
+    assert city['nulls'] == 1 and city['top'] == 'Paris'
+
+def test_render_table_is_compact():
+    table = read_table(CSV_DATA + b'Dan,"multi\nline|cell",Rome\n', 'csv', max_rows=10, max_columns=10)
+    text = render_table('people.csv', 'csv', table, summarize_columns(table), max_cell_chars=8)
+    assert text.startswith("CSV Preview of people.csv (4 rows, 3 columns")
+    assert "- Age: mixed" in text
+    lines = text.splitlines()
+    assert lines[lines.index("Rows:") + 1:] == ["Name|Age|City", "Alice|30|Paris", "Bob|25|", "Carol|41|Paris", "Dan|multi l…|Rome"]
+
+def test_read_parquet_reads_first_batch():
+    pa = pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+    buffer = io.BytesIO()
+    pq.write_table(pa.table({'id': list(range(1000)), 'label': ['x'] * 1000, 'extra': [1.5] * 1000}), buffer, row_group_size=100)
+    table = read_table(buffer.getvalue(), 'parquet', max_rows=10, max_columns=2)
+    assert table['columns'] == ['id', 'label']
+    assert table['data'][0] == list(range(10))
+    assert table['total_rows'] == 1000
+    summary = summarize_columns(table)[0]
+    assert (summary['min'], summary['max'], summary['nulls']) == (0, 9, 0)
+
+def test_read_xlsx_streams_first_sheet():
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['Name', 'Score'])
+    for index in range(50):
+        sheet.append([f"user{index}", index * 1.5])
+    workbook.create_sheet('Other')
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    table = read_table(buffer.getvalue(), 'xlsx', max_rows=3, max_columns=10)
+    assert table['columns'] == ['Name', 'Score']
+    assert table['data'] == [['user0', 'user1', 'user2'], [0, 1.5, 3.0]]
+    assert table['total_rows'] == 50
+    assert table['sheets'] == ['Sheet', 'Other']
@@ -0,0 +1,73 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from services.thread_sync import ThreadSync
+
+def _page(data, has_more=False):
+    response = MagicMock()
+    response.json.return_value = {
+        'data': data,
+        'has_more': has_more,
+        'last_id': data[-1]['id'] if data else None
+    }
+    return response
+
+def _message(message_id, role, run_id, *content):
+    return {'id': message_id, 'role': role, 'run_id': run_id, 'content': list(content)}
+
+def _text(value):
+    return {'type': 'text', 'text': {'value': value, 'annotations': []}}
+
+@pytest.fixture
+def thread_sync():
+    return ThreadSync('https://api.openai.com/v1/threads', page_size=2)
+
+@patch('services.thread_sync.requests.get')
+def test_first_fetch_reads_newest_run_messages(mock_get, thread_sync):
+    mock_get.return_value = _page([
+        _message('msg_3', 'assistant', 'run_1', _text('Second part')),
+        _message('msg_2', 'assistant', 'run_1', _text('First part')),
+    ])
+
+    reply = thread_sync.fetch_run_reply({}, 'thread_1', 'run_1')
+
+    assert reply == 'First part\n\nSecond part'
+    params = mock_get.call_args[1]['params']
+    assert params['order'] == 'desc'
+    assert params['run_id'] == 'run_1'
+
+@patch('services.thread_sync.requests.get')
+def test_later_fetches_use_cursor_and_paginate(mock_get, thread_sync):
+    mock_get.return_value = _page([_message('msg_2', 'assistant', 'run_1', _text('Hi'))])
+    thread_sync.fetch_run_reply({}, 'thread_1', 'run_1')
+
+    mock_get.reset_mock()
+    mock_get.side_effect = [
+        _page([_message('msg_3', 'user', None, _text('Question')), _message('msg_4', 'assistant', 'run_2', _text('Answer'))], has_more=True),
+        _page([_message('msg_5', 'assistant', 'run_2', _text('More'))]),
+    ]
+
+    reply = thread_sync.fetch_run_reply({}, 'thread_1', 'run_2')
+
+    assert reply == 'Answer\n\nMore'
+    assert mock_get.call_count == 2
+    first_params = mock_get.call_args_list[0][1]['params']
+    assert first_params['order'] == 'asc'
+
+@patch('services.thread_sync.requests.get')
+def test_cursor_advances(mock_get, thread_sync):
+    mock_get.return_value = _page([_message('msg_2', 'assistant', 'run_1', _text('Hi'))])
+    thread_sync.fetch_run_reply({}, 'thread_1', 'run_1')
+
+    mock_get.return_value = _page([_message('msg_4', 'assistant', 'run_2', _text('Next'))])
+    thread_sync.fetch_run_reply({}, 'thread_1', 'run_2')
+    assert mock_get.call_args[1]['params']['after'] == 'msg_2'
+
+    thread_sync.fetch_run_reply({}, 'thread_1', 'run_3')
+    assert mock_get.call_args[1]['params']['after'] == 'msg_4'
+
+def test_render_multi_part_content():
+    message = _message('msg_1', 'assistant', 'run_1',
+                       _text('Here is a chart'),
+                       {'type': 'image_file', 'image_file': {'file_id': 'file_1'}},
+                       _text('And a summary'))
+    assert ThreadSync.render_content(message) == 'Here is a chart\n\n[Image file: file_1]\n\nAnd a summary'
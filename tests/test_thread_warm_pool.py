@@ -0,0 +1,93 @@
+import itertools
+import threading
+import time
+from services.thread_warm_pool import ThreadWarmPool
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out waiting for the pool"
+        time.sleep(0.01)
+
+def test_take_hands_out_prewarmed_threads_and_refills():
+    counter = itertools.count(1)
+    pool = ThreadWarmPool(lambda: f"thread_{next(counter)}", size=2)
+    pool.start()
+    _wait_for(lambda: pool.stats()['ready'] == 2)
+
+    assert pool.take() == 'thread_1'
+    _wait_for(lambda: pool.stats()['ready'] == 2)
+    assert pool.take() == 'thread_2'
+
+    stats = pool.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 0
+    assert stats['hit_rate'] == 1.0
+    assert stats['avg_refill_ms'] is not None
+    pool.shutdown()
+
+def test_empty_pool_misses_without_blocking():
+    release = threading.Event()
+
+    def slow_create():
+        release.wait()
+        return 'thread_slow'
+
+    pool = ThreadWarmPool(slow_create, size=1)
+    pool.start()
+    started = time.monotonic()
+    assert pool.take() is None
+    assert time.monotonic() - started < 0.5
+    assert pool.stats()['misses'] == 1
+    release.set()
+    _wait_for(lambda: pool.stats()['ready'] == 1)
+    pool.shutdown()
+
+def test_disabled_pool_never_creates():
+    pool = ThreadWarmPool(lambda: 1 / 0, size=0)
+    pool.start()
+    assert pool.take() is None
+    assert pool.stats()['misses'] == 0
+
+def test_stale_threads_are_discarded():
+    counter = itertools.count(1)
+    discarded = []
+    pool = ThreadWarmPool(lambda: f"thread_{next(counter)}", size=1, max_age=0.05, discard=discarded.append, check_interval=0.01)
+    pool.start()
+    _wait_for(lambda: len(discarded) >= 1)
+    assert discarded[0] == 'thread_1'
+    assert pool.stats()['discarded'] >= 1
+    pool.shutdown()
+
+def test_refill_failures_are_retried():
+    attempts = []
+
+    def flaky_create():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("API unavailable")
+        return 'thread_ok'
+
+    pool = ThreadWarmPool(flaky_create, size=1, retry_delay=0.01)
+    pool.start()
+    _wait_for(lambda: pool.stats()['ready'] == 1)
+    assert pool.stats()['refill_failures'] == 1
+    assert pool.take() == 'thread_ok'
+    pool.shutdown()
+
+def test_take_does_not_start_the_pool():
+    pool = ThreadWarmPool(lambda: 'thread_1', size=1)
+    assert pool.take() is None
+    time.sleep(0.05)
+    assert pool.stats()['ready'] == 0
+
+def test_shutdown_deletes_ready_threads():
+    counter = itertools.count(1)
+    discarded = []
+    pool = ThreadWarmPool(lambda: f"thread_{next(counter)}", size=2, discard=discarded.append)
+    pool.start()
+    _wait_for(lambda: pool.stats()['ready'] == 2)
+
+    pool.shutdown()
+
+    assert sorted(discarded) == ['thread_1', 'thread_2']
+    assert pool.stats()['ready'] == 0